@@ -0,0 +1,5 @@
+"""
+Benchmarks for tagtool
+
+\tpython -m benchmarks.run --help
+"""
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Throughput of tagging files one at a time, by running `tag` once per file,
+compared against a single `tag --batch` co-process.
+
+Usage:
+\tbench_batch.py [FILES]
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+
+
+TAG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bin", "tag")
+ENV = dict(os.environ, PYTHONPATH=os.path.join(os.path.dirname(TAG), ".."))
+
+
+def make_files(root, n):
+    open(os.path.join(root, ".tagdir"), "w").write("[tagdir]\nuse_dirs: True\n")
+    paths = []
+    for i in range(n):
+        d = os.path.join(root, "d%d" % (i % 10))
+        os.makedirs(d, exist_ok=True)
+        paths.append(os.path.join(d, "t%d_x%d.jpg" % (i % 7, i)))
+        open(paths[-1], "w").close()
+    return paths
+
+
+def per_call(paths):
+    for p in paths:
+        subprocess.check_call([sys.executable, TAG, "+new", p], env=ENV)
+
+
+def co_process(paths):
+    tag = subprocess.Popen([sys.executable, TAG, "--batch"], env=ENV,
+                           stdin=subprocess.PIPE, stdout=subprocess.PIPE, universal_newlines=True)
+    for p in paths:
+        tag.stdin.write(json.dumps({ "files": [p], "add": ["new"] }) + "\n")
+        tag.stdin.flush()
+        assert json.loads(tag.stdout.readline())["ok"]
+    tag.stdin.close()
+    tag.wait()
+
+
+def bench(name, fn, n):
+    with tempfile.TemporaryDirectory() as root:
+        paths = make_files(root, n)
+        start = time.perf_counter()
+        fn(paths)
+        elapsed = time.perf_counter() - start
+
+    print("%-10s %8.2f ms/file  %8.1f files/s" % (name, 1e3 * elapsed / n, n / elapsed))
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print("%d files" % n)
+    bench("per-call", per_call, n)
+    bench("co-process", co_process, n)
+
+
+if __name__ == "__main__":
+    main()
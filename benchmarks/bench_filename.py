@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Memory and construction time of Filename objects, compared against the
+original eager, dict-based representation.
+
+Usage:
+\tbench_filename.py [FILES]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+
+from tagtool import Filename, get_config
+
+
+class EagerFilename:
+    """ The original Filename representation, for comparison """
+
+    def __init__(self, filestr, overrides={}):
+        filestr = os.path.abspath(filestr)
+        self.filestr = filestr
+        self.dirs, filestr  = os.path.split(filestr)
+        self.name, self.ext = os.path.splitext(filestr)
+        self.config = get_config(self.dirs, overrides)
+        if self.config["use_dirs"]:
+            self.dirs = os.path.relpath(self.dirs, self.config["root_dir"])
+
+
+# paths spread over 1000 directories, two levels deep
+def make_paths(root, n):
+    return [ os.path.join(root, "d%d" % (i % 10), "e%d" % (i % 100), "t%d_x%d.jpg" % (i % 997, i))
+             for i in range(n) ]
+
+
+def bench(name, cls, paths):
+    tracemalloc.start()
+    start = time.perf_counter()
+    files = [ cls(p) for p in paths ]
+    elapsed = time.perf_counter() - start
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print("%-8s %6.2f us/file  %6.1f bytes/file" % \
+          (name, 1e6 * elapsed / len(paths), size / len(paths)))
+    return files
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+    with tempfile.TemporaryDirectory() as root:
+        open(os.path.join(root, ".tagdir"), "w").write("[tagdir]\nuse_dirs: True\n")
+        paths = make_paths(root, n)
+        print("%d files" % n)
+        bench("eager", EagerFilename, paths)
+        files = bench("slotted", Filename, paths)
+
+        start = time.perf_counter()
+        for f in files:
+            f.get_tags()
+        elapsed = time.perf_counter() - start
+        print("get_tags %6.2f us/file" % (1e6 * elapsed / n))
+
+
+if __name__ == "__main__":
+    main()
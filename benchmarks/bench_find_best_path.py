@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Placement latency of Filename._find_best_path(), on a tree that is
+thousands of directories wide and a dozen levels deep.
+
+Compares the original recursive search (re-listing every directory for
+every file) against the memoized DirTree, and a single placement through
+Filename (which searches directly when it has no snapshot to share).
+
+Usage:
+\tbench_find_best_path.py [WIDTH] [DEPTH] [FILES]
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+
+from tagtool import DirSnapshot, Filename, get_config, dirs_at
+
+
+# the original, unmemoized search
+def naive_find_best_path(config, path, tags):
+    best_path = path
+    best_tags_left = set(tags)
+
+    for d in dirs_at(os.path.join(config["root_dir"], path)):
+        d_tags = config["matcher"].tokenize(d)
+        if all([t in tags for t in d_tags]):
+            r = naive_find_best_path(config, os.path.join(path, d), set(tags).difference(d_tags))
+            if len(r[1]) < len(best_tags_left):
+                best_path, best_tags_left = r
+
+    return (best_path, best_tags_left)
+
+
+# builds a tree with WIDTH top-level directories, each with a few
+# subdirectories, and one branch that is DEPTH levels deep
+def build_tree(root, width, depth, fanout=4):
+    open(os.path.join(root, ".tagdir"), "w").write("[tagdir]\nuse_dirs: True\n")
+
+    for w in range(width):
+        for f in range(fanout):
+            os.makedirs(os.path.join(root, "w%d" % w, "x%d" % f))
+
+    path = root
+    for level in range(depth):
+        for f in range(fanout):
+            os.makedirs(os.path.join(path, "d%d_%d" % (level, f)))
+        path = os.path.join(path, "d%d_0" % level)
+
+
+def random_tagsets(n, width, depth, fanout=4):
+    rand = random.Random(0)
+    tagsets = []
+    for i in range(n):
+        tags = { "w%d" % rand.randrange(width), "x%d" % rand.randrange(fanout) }
+        tags.update("d%d" % l for l in range(depth))
+        tags.update("%d" % l for l in range(rand.randrange(2)))
+        tags.add("file%d" % i)
+        tagsets.append(tags)
+    return tagsets
+
+
+def bench(name, fn, tagsets):
+    start = time.perf_counter()
+    for tags in tagsets:
+        fn(tags)
+    elapsed = time.perf_counter() - start
+    print("%-10s %8.3f ms/file  (%d files)" % (name, 1000 * elapsed / len(tagsets), len(tagsets)))
+    return elapsed
+
+
+def main():
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    depth = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    files = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+    with tempfile.TemporaryDirectory() as root:
+        print("building tree (width=%d, depth=%d)..." % (width, depth))
+        build_tree(root, width, depth)
+        config = get_config(root)
+        tagsets = random_tagsets(files, width, depth)
+
+        snapshot = DirSnapshot()
+        tree = snapshot.tree(config)
+
+        # sanity check that both searches agree on the number of tags left
+        for tags in tagsets[:10]:
+            assert len(naive_find_best_path(config, root, tags)[1]) == len(tree.find_best_path(tags)[1])
+
+        naive = bench("naive", lambda tags: naive_find_best_path(config, root, tags), tagsets)
+        cold  = bench("cold", lambda tags: DirSnapshot().tree(config).find_best_path(tags), tagsets[:20])
+        f = Filename(os.path.join(root, "f"), config=config)
+        single = bench("single", lambda tags: f._find_best_path(config["root_dir"], tags), tagsets)
+        warm  = bench("snapshot", tree.find_best_path, tagsets)
+
+        print("speedup (shared snapshot): %.1fx" % (naive / warm))
+
+
+if __name__ == "__main__":
+    main()
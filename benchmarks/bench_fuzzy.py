@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Time to find the tags within one edit of a tag, with the trigram index,
+compared against checking the edit distance to every tag.
+
+Usage:
+\tbench_fuzzy.py [TAGS]
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+
+from tagtool import TrigramIndex, edit_distance
+
+
+def make_tags(n, seed=0):
+    rand = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return list(set("".join(rand.choice(letters) for i in range(rand.randint(4, 12)))
+                    for j in range(n)))
+
+
+def scan(tags, s, k):
+    return [ t for t in tags if edit_distance(s, t, k) <= k ]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    tags = make_tags(n)
+    queries = tags[:100]
+    print("%d tags" % len(tags))
+
+    start = time.perf_counter()
+    index = TrigramIndex(tags)
+    print("%-8s %8.2f s" % ("build", time.perf_counter() - start))
+
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "trigrams")
+        index.save(path)
+        start = time.perf_counter()
+        TrigramIndex.load(path)
+        print("%-8s %8.2f s" % ("load", time.perf_counter() - start))
+
+    start = time.perf_counter()
+    for q in queries:
+        index.search(q, 1)
+    print("%-8s %8.2f ms/query" % ("index", 1e3 * (time.perf_counter() - start) / len(queries)))
+
+    start = time.perf_counter()
+    for q in queries[:10]:
+        scan(tags, q, 1)
+    print("%-8s %8.2f ms/query" % ("scan", 1e3 * (time.perf_counter() - start) / 10))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Full tree scans through a stand-in network mount, which delays every
+directory listing by a fixed latency (see LatencyFS).
+
+Compares os.walk()-style serial reads against the asyncio walker at a
+few concurrency limits.
+
+Usage:
+\tbench_walker.py [LATENCY_MS] [WIDTH] [DEPTH]
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+from tagtool import LatencyFS, find_all_files
+
+
+# builds WIDTH top-level directories, each a chain DEPTH levels deep
+def build_tree(root, width, depth):
+    for w in range(width):
+        path = os.path.join(root, "w%d" % w)
+        for d in range(depth):
+            path = os.path.join(path, "d%d" % d)
+            os.makedirs(path)
+            open(os.path.join(path, "f%d" % w), "w").close()
+
+
+def bench(name, fn):
+    start = time.perf_counter()
+    n = len(fn())
+    elapsed = time.perf_counter() - start
+    print("%-16s %8.3f s  (%d files)" % (name, elapsed, n))
+    return elapsed
+
+
+def main():
+    latency = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.005
+    width   = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    depth   = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    with tempfile.TemporaryDirectory() as root:
+        build_tree(root, width, depth)
+        fs = LatencyFS(latency)
+
+        print("%d directories, %.1f ms per listing" % (width * (depth + 1) + 1, latency * 1000))
+
+        serial = bench("serial", lambda: find_all_files(root, concurrency=1, fs=fs))
+        for concurrency in [4, 16, 64]:
+            t = bench("concurrency %d" % concurrency, lambda: find_all_files(root, concurrency=concurrency, fs=fs))
+            print("%-16s %8.1fx" % ("", serial / t))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Deterministic generator for large, synthetic tag trees.
+
+Tags are drawn from a vocabulary of "t0" ... "tN", with Zipf distributed
+frequencies (t0 is the most common). Directories are named after the
+most common tags, and files are named after their remaining tags.
+"""
+
+import os
+import random
+
+
+DEFAULTS = {
+    "files"    : 10000, # number of files
+    "depth"    : 3,     # levels of tag directories
+    "fanout"   : 4,     # subdirectories per directory
+    "vocab"    : 1000,  # number of distinct tags
+    "zipf"     : 1.1,   # Zipf exponent of the tag frequencies
+    "min_tags" : 1,     # tags per filename
+    "max_tags" : 5,
+    "seed"     : 0,
+}
+
+
+# the mtime given to generated directories
+OLD_MTIME = 1000000000
+
+
+def tag_name(rank):
+    return "t%d" % rank
+
+
+# the probability weights for each tag, by rank
+def zipf_weights(vocab, s):
+    return [ 1.0 / (rank ** s) for rank in range(1, vocab + 1) ]
+
+
+# returns the relative paths of the tag directories
+def make_dirs(rand, depth, fanout, vocab):
+    dirs = [""]
+    level = [("", set())]
+
+    # directories use the most common tags, so files are likely to match them
+    pool = min(vocab, max(fanout * 4, 16))
+
+    for d in range(depth):
+        next_level = []
+        for path, used in level:
+            for name in rand.sample([ r for r in range(pool) if r not in used ], fanout):
+                child = os.path.join(path, tag_name(name))
+                next_level.append((child, used | {name}))
+                dirs.append(child)
+        level = next_level
+
+    return dirs
+
+
+# returns the relative paths of a generated tree, without touching the disk
+def generate_paths(**params):
+    p = dict(DEFAULTS, **params)
+    rand = random.Random(p["seed"])
+
+    dirs = make_dirs(rand, p["depth"], p["fanout"], p["vocab"])
+    weights = zipf_weights(p["vocab"], p["zipf"])
+    ranks = range(p["vocab"])
+
+    paths = []
+    for i in range(p["files"]):
+        d = rand.choice(dirs)
+        n = rand.randint(p["min_tags"], p["max_tags"])
+        tags = []
+        for r in rand.choices(ranks, weights, k=n):
+            if tag_name(r) not in tags:
+                tags.append(tag_name(r))
+
+        # the index keeps names unique
+        paths.append(os.path.join(d, "_".join(tags + [str(i)]) + ".jpg"))
+
+    return paths
+
+
+# writes a generated tree (of empty files) under root, with a .tagdir
+# returns the absolute paths of the files
+def generate_tree(root, **params):
+    with open(os.path.join(root, ".tagdir"), "w") as f:
+        f.write("[tagdir]\nuse_dirs: True\nuse_daemon: False\n")
+
+    paths = []
+    for rel in generate_paths(**params):
+        path = os.path.join(root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "w").close()
+        paths.append(path)
+
+    # backdate the directories, so that mtime based caches trust them
+    for d, subdirs, files in os.walk(root):
+        os.utime(d, (OLD_MTIME, OLD_MTIME))
+
+    return paths
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Usage:
+\tpython -m benchmarks.run [OPTION...]
+
+Generates a synthetic tag tree, times the core tagtool operations on it,
+and prints the results as JSON.
+
+Options:
+\t--files N       number of files in the tree (default 10000)
+\t--depth N       levels of tag directories (default 3)
+\t--fanout N      subdirectories per directory (default 4)
+\t--vocab N       number of distinct tags (default 1000)
+\t--zipf S        Zipf exponent of the tag frequencies (default 1.1)
+\t--seed N        seed for the generator (default 0)
+\t--repeat N      runs per benchmark, the fastest is kept (default 3)
+\t--output FILE   also writes the JSON results to FILE
+\t--compare FILE  prints the change against a previous JSON result
+\t--help          prints this help text and exits
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import tempfile
+
+import tagtool
+from tagtool import Filename, DirSnapshot, TagMatrix, Index, get_config, \
+                    walk_select, parse_operations, clear_config_cache
+
+from .generate import DEFAULTS, generate_tree
+
+
+# the selectors used for the select() benchmarks (t0 is the most common tag)
+SELECTORS = ["t0", "+t3", "-t1", "+t10"]
+
+
+def timed(fn, repeat):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        n = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return { "seconds": best, "items": n, "us_per_item": 1e6 * best / max(n, 1) }
+
+
+def bench_filename(paths):
+    clear_config_cache()
+    for p in paths:
+        Filename(p)
+    return len(paths)
+
+
+def bench_get_tags(files):
+    for f in files:
+        f.get_tags()
+    return len(files)
+
+
+def bench_add_remove_tags(paths, shared):
+    snapshot = DirSnapshot()
+    for p in paths:
+        f = Filename(p)
+        f.add_remove_tags(["t2"], ["t0"], snapshot if shared else DirSnapshot())
+    return len(paths)
+
+
+def bench_select(config):
+    n = 0
+    for f in walk_select(parse_operations(SELECTORS), config):
+        n += 1
+    return n
+
+
+def bench_index_select(config):
+    with Index(config) as index:
+        index.update()
+        return len(index.select(parse_operations(SELECTORS)))
+
+
+def bench_organize(paths):
+    matrix = TagMatrix()
+    for p in paths:
+        matrix.add(p, Filename(p).get_tags())
+    matrix.propose_hierarchy(lambda tag, count: count >= 20)
+    return len(paths)
+
+
+def run(params, repeat):
+    results = {}
+
+    with tempfile.TemporaryDirectory() as root:
+        start = time.perf_counter()
+        paths = generate_tree(root, **params)
+        results["generate"] = { "seconds": time.perf_counter() - start, "items": len(paths) }
+
+        config = get_config(root)
+        files = [ Filename(p) for p in paths ]
+        sample = paths[:1000]
+
+        results["filename"]               = timed(lambda: bench_filename(paths), repeat)
+        results["get_tags"]               = timed(lambda: bench_get_tags(files), repeat)
+        results["add_remove_tags"]        = timed(lambda: bench_add_remove_tags(sample, False), repeat)
+        results["add_remove_tags_shared"] = timed(lambda: bench_add_remove_tags(sample, True), repeat)
+        results["select"]                 = timed(lambda: bench_select(config), repeat)
+
+        # the first run builds the index, the rest only update it
+        results["index_build"]            = timed(lambda: bench_index_select(config), 1)
+        results["index_select"]           = timed(lambda: bench_index_select(config), repeat)
+        results["organize"]               = timed(lambda: bench_organize(paths), 1)
+
+    return results
+
+
+def compare(results, old):
+    for name, r in sorted(results.items()):
+        if name in old and old[name]["seconds"]:
+            ratio = r["seconds"] / old[name]["seconds"]
+            print("%-24s %10.4fs  %6.2fx" % (name, r["seconds"], ratio), file=sys.stderr)
+
+
+def main():
+    params = dict(DEFAULTS)
+    repeat = 3
+    output = ""
+    old = None
+
+    args = iter(sys.argv[1:])
+
+    for option in args:
+        if option == "--help":
+            print(__doc__)
+            return
+        elif option == "--repeat":
+            repeat = int(next(args))
+        elif option == "--output":
+            output = next(args)
+        elif option == "--compare":
+            with open(next(args)) as f:
+                old = json.load(f)
+        elif option.startswith("--") and option[2:] in params:
+            params[option[2:]] = type(params[option[2:]])(next(args))
+        else:
+            print("'%s' is not a valid option" % option)
+            return
+
+    report = {
+        "version" : tagtool.__version__,
+        "python"  : platform.python_version(),
+        "params"  : params,
+        "results" : run(params, repeat),
+    }
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    print(text)
+
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+
+    if old is not None:
+        compare(report["results"], old["results"])
+
+
+if __name__ == "__main__":
+    main()
@@ -28,5 +28,13 @@ setup(
         'bin/tag-list',
         'bin/tag-organize',
         'bin/tag-dialog',
+        'bin/tag-daemon',
+        'bin/tag-snapshot',
+        'bin/tag-diff',
     ],
+    entry_points={
+        'console_scripts': [
+            'tagtool = tagtool.cli:main',
+        ],
+    },
 )
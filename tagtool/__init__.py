@@ -1,7 +1,71 @@
 
 __version__ = "0.0.1"
 
-from .filename import *
-from .config import *
-from .select import *
-from .utils import *
+import sys
+import importlib
+from types import ModuleType
+
+
+# public name -> the submodule defining it
+# Submodules are only imported when one of their names is first used, so
+# that a command only pays for the parts of tagtool it actually needs.
+_NAMES = {
+    "filename"  : ["Filename"],
+    "config"    : ["DEFAULT_CONFIG", "TAGDIR_FILENAME", "TAGDIR_SECTION", "TAGSTATE_DIRNAME",
+                   "VIEW_SECTION_PREFIX", "clear_config_cache", "state_path", "find_roots",
+                   "get_config", "load_config"],
+    "select"    : ["Operation", "INTERSECTION", "INCLUSION", "EXCLUSION",
+                   "PlanNode", "TAG", "NOT", "AND", "OR", "EVERYTHING", "QueryPlan",
+                   "compile_operations", "match_tags", "match", "evaluate",
+                   "walk_select", "iter_select", "SELECT_JOBS", "select_roots",
+                   "explain_select", "select"],
+    "utils"     : ["MTIME_SLACK", "find_above", "dirs_at", "empty_links_dir", "sync_links_dir",
+                   "file_lock", "map_subtrees", "find_all_files"],
+    "index"     : ["Index", "TAGINDEX_FILENAME", "SCHEMA"],
+    "matcher"   : ["TagMatcher", "MATCHER_CACHE_SIZE"],
+    "batch"     : ["plan_retag", "apply_plan", "batch_retag", "BatchSession"],
+    "dirtree"   : ["DirSnapshot", "DirNode", "DirTree"],
+    "rename"    : ["TAGJOURNAL_FILENAME", "RENAME_JOBS", "RenameError", "RenameExecutor",
+                   "journal_path", "find_collisions", "read_journal"],
+    "analytics" : ["TagMatrix", "hierarchy_dirs", "scan_tags"],
+    "daemon"    : ["TAGDAEMON_SOCKET", "RECONCILE_INTERVAL", "WATCH_MASK", "EVENT_HEADER",
+                   "IN_CREATE", "IN_DELETE", "IN_DELETE_SELF", "IN_IGNORED", "IN_ISDIR",
+                   "IN_MOVED_FROM", "IN_MOVED_TO", "IN_ONLYDIR", "IN_Q_OVERFLOW",
+                   "TagState", "Inotify", "TagDaemon", "daemon_request", "daemon_select",
+                   "daemon_ping"],
+    "views"     : ["parse_operations", "link_name", "link_names", "View",
+                   "get_views", "get_view", "save_view", "update_views"],
+    "vocab"     : ["TAGVOCAB_FILENAME", "COMPLETIONS", "TagVocabulary", "vocab_path",
+                   "get_vocabulary", "update_vocabularies"],
+    "fuzzy"     : ["TAGTRIGRAMS_FILENAME", "FUZZY_DISTANCE", "trigrams", "edit_distance",
+                   "TrigramIndex", "get_trigram_index", "fuzzy_aliases", "merge_candidates"],
+    "snapshot"  : ["SNAPSHOT_MAGIC", "SNAPSHOT_HEADER", "FILE_ADDED", "FILE_REMOVED",
+                   "FILE_CHANGED", "FILE_MOVED", "TagSnapshot", "diff_snapshots", "snapshot_root"],
+    "dircache"  : ["TAGDIRCACHE_FILENAME", "DirCache"],
+    "walker"    : ["WALK_CONCURRENCY", "LocalFS", "LatencyFS", "read_dirs_async", "read_dirs", "walk"],
+}
+
+_MODULES = { name: module for module, names in _NAMES.items() for name in names }
+
+__all__ = list(_MODULES)
+
+
+def __getattr__(name):
+    if name not in _MODULES:
+        raise AttributeError("module 'tagtool' has no attribute '%s'" % name)
+
+    value = getattr(importlib.import_module("." + _MODULES[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+class _Package(ModuleType):
+    # tagtool.select is the select() function, as it always was, even once
+    # importing the tagtool.select module has tried to replace it
+    select = property(lambda self: __getattr__("select"), lambda self, value: None)
+
+sys.modules[__name__].__class__ = _Package
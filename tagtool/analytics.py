@@ -0,0 +1,299 @@
+
+import os
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import chain, combinations, compress, islice, repeat
+from operator import and_, eq, ne
+
+from .config import get_config
+from .utils import map_subtrees
+
+
+# bytes of postings and row arrays propose_hierarchy() may keep alive
+HIERARCHY_MEMORY = 256 << 20
+
+# rows whose tags postings() sorts at a time
+POSTINGS_CHUNK = 1 << 14
+
+# how many times longer than the other one of the rows and the posting
+# must be for _split() to look the shorter one up, rather than merge them
+SPLIT_LOOKUP = 3
+
+
+class TagMatrix:
+    """
+    Sparse files x tags incidence matrix, in compressed sparse row (CSR)
+    form. Each file is a row of integer tag IDs, stored back to back in
+    one flat array, so millions of files cost a few bytes per tag rather
+    than a Python set per file.
+    """
+
+    def __init__(self):
+        self.tags    = []           # tag ID -> tag
+        self.tag_ids = {}           # tag -> tag ID
+        self.paths   = []           # row -> file path
+        self.indptr  = array("Q", [0])
+        self.indices = array("I")
+
+
+    def __len__(self):
+        return len(self.paths)
+
+
+    def tag_id(self, tag):
+        if tag not in self.tag_ids:
+            self.tag_ids[tag] = len(self.tags)
+            self.tags.append(tag)
+        return self.tag_ids[tag]
+
+
+    def add(self, path, tags):
+        """ adds a row for the given file and tagset """
+        self.paths.append(path)
+        self.indices.extend(sorted(self.tag_id(t) for t in tags))
+        self.indptr.append(len(self.indices))
+
+
+    def row(self, r):
+        """ returns the tag IDs of a single file """
+        return self.indices[self.indptr[r]:self.indptr[r + 1]]
+
+
+    def counts(self, rows=None):
+        """ returns the number of files bearing each tag ID """
+        counts = array("Q", bytes(8 * len(self.tags)))
+
+        if rows is None:
+            ids = self.indices
+        else:
+            indptr, indices = self.indptr, self.indices
+            spans = map(slice, map(indptr.__getitem__, rows),
+                               map(indptr.__getitem__, map((1).__add__, rows)))
+            ids = chain.from_iterable(map(indices.__getitem__, spans))
+
+        for t, n in Counter(ids).items():
+            counts[t] = n
+
+        return counts
+
+
+    def cooccurrence(self, tag_ids):
+        """
+        returns a dict of (lower tag ID, higher tag ID) -> number of files
+        bearing both, for the given tag IDs (typically the most frequent few)
+        """
+
+        wanted = set(tag_ids)
+        pairs = Counter()
+
+        for r in range(len(self)):
+            pairs.update(combinations(filter(wanted.__contains__, self.row(r)), 2))
+
+        return dict(pairs)
+
+
+    def postings(self, tag_ids=None):
+        """
+        returns the inverted index: a list of tag ID -> sorted array of the
+        rows bearing that tag (or None for tags not in tag_ids). This costs
+        8 bytes per (file, tag) pair, on top of the 4 the matrix itself uses.
+        """
+
+        wanted = range(len(self.tags)) if tag_ids is None else sorted(set(tag_ids))
+        postings = [None] * len(self.tags)
+        for t in wanted:
+            postings[t] = array("Q")
+
+        # sorts (tag ID, row) keys a chunk of rows at a time, so the
+        # transient lists stay small, and slices each tag's rows out
+        n = len(self)
+        indptr, indices = self.indptr, self.indices
+
+        for first in range(0, n, POSTINGS_CHUNK):
+            last = min(first + POSTINGS_CHUNK, n)
+            lengths = map(int.__sub__, indptr[first + 1:last + 1], indptr[first:last])
+            rows = chain.from_iterable(map(repeat, range(first, last), lengths))
+            ids = indices[indptr[first]:indptr[last]]
+            keys = sorted(map(int.__add__, map(n.__mul__, ids), rows))
+
+            for t in wanted:
+                lo = bisect_left(keys, t * n)
+                hi = bisect_left(keys, (t + 1) * n, lo)
+                if lo < hi:
+                    postings[t].extend(map(int.__sub__, keys[lo:hi], repeat(t * n)))
+
+        return postings
+
+
+    def propose_hierarchy(self, allowed, max_depth=8, memory=HIERARCHY_MEMORY):
+        """
+        greedily partitions the files into directories. At each level, the
+        most common allowed tag becomes a directory holding every file that
+        bears it, and the rest of the files are partitioned by the next most
+        common tag, and so on. Each directory is then partitioned the same
+        way. allowed(tag, count) decides whether a tag may become a
+        directory, and must not accept a count lower than one it rejects.
+
+        Only the tags allowed at their overall count are candidates, and a
+        candidate can only go below another if they share enough files
+        (see cooccurrence()), so directories with no candidates left are
+        not counted at all. The files are sorted arrays of rows, split by
+        merging them with the postings() of the candidates. Those postings
+        and at most two arrays of rows per level stay alive, and the depth
+        is lowered (down to a single level) if they would not fit in memory
+        bytes.
+
+        returns a list of (tag, file count, children) tuples
+        """
+
+        counts = self.counts()
+        candidates = [ t for t in range(len(self.tags)) if allowed(self.tags[t], counts[t]) ]
+        if not candidates:
+            return []
+
+        postings = self.postings(candidates)
+
+        row_bytes = 8 * len(self)
+        spare = memory - 8 * sum(counts[t] for t in candidates)
+        max_depth = max(1, min(max_depth, spare // (2 * row_bytes)))
+
+        pairs = self.cooccurrence(candidates)
+        below = { t: frozenset(u for u in candidates if u != t and \
+                               allowed(self.tags[u], pairs.get((min(t, u), max(t, u)), 0)))
+                  for t in candidates }
+
+        rows = array("Q", range(len(self)))
+        return self._propose(allowed, rows, frozenset(candidates), max_depth, postings, below)
+
+
+    def _propose(self, allowed, rows, candidates, max_depth, postings, below):
+        if max_depth == 0 or not rows or not candidates:
+            return []
+
+        counts = self.counts(rows)
+        order = sorted(candidates, key=lambda t: (-counts[t], t))
+
+        plan = []
+        remaining = rows
+
+        for t in order:
+            if counts[t] == 0:
+                break
+            if not allowed(self.tags[t], counts[t]):
+                continue
+
+            inside, outside = _split(remaining, postings[t])
+
+            if not allowed(self.tags[t], len(inside)):
+                continue
+
+            remaining = outside
+            children = self._propose(allowed, inside, candidates & below[t], max_depth - 1, postings, below)
+            plan.append((self.tags[t], len(inside), children))
+
+        return plan
+
+
+
+# splits the sorted array rows into the rows found in the sorted array
+# posting and the rest. When one of them is much shorter, its items are
+# looked up in the other. Otherwise both are merged by sorted(), which
+# finds the two runs and merges them in one pass, so that the rows in
+# both end up side by side.
+def _split(rows, posting):
+    inside  = array("Q")
+    outside = array("Q")
+
+    if len(rows) * SPLIT_LOOKUP < len(posting):
+        lo = 0
+        for r in rows:
+            lo = bisect_left(posting, r, lo)
+            if lo < len(posting) and posting[lo] == r:
+                inside.append(r)
+            else:
+                outside.append(r)
+        return inside, outside
+
+    if len(posting) * SPLIT_LOOKUP < len(rows):
+        lo = done = 0
+        for r in posting:
+            lo = bisect_left(rows, r, lo)
+            if lo == len(rows):
+                break
+            if rows[lo] == r:
+                outside.extend(rows[done:lo])
+                inside.append(r)
+                lo = done = lo + 1
+        outside.extend(rows[done:])
+        return inside, outside
+
+    merged = sorted(chain(rows, posting))
+    inside.extend(compress(merged, map(eq, merged, islice(merged, 1, None))))
+
+    # the rows of inside now appear twice, and the others once
+    merged = sorted(chain(rows, inside))
+    once = map(and_, map(ne, merged, chain((None,), merged)),
+                     map(ne, merged, chain(islice(merged, 1, None), (None,))))
+    outside.extend(compress(merged, once))
+
+    return inside, outside
+
+
+
+# yields the directories (relative paths) of a proposed hierarchy
+def hierarchy_dirs(plan, path=""):
+    for tag, count, children in plan:
+        d = os.path.join(path, tag)
+        yield d
+        yield from hierarchy_dirs(children, d)
+
+
+
+# tokenizes every file of an os.walk()-like tree, as Filename.get_tags() would
+def _tag_rows(tree, overrides, recursive=True):
+    rows = []
+
+    for root, directories, filenames in tree:
+        config  = get_config(root, overrides)
+        matcher = config["matcher"]
+
+        dir_tags = frozenset()
+        if config["use_dirs"]:
+            dir_tags = matcher.tokenize(os.path.relpath(root, config["root_dir"]))
+
+        for f in filenames:
+            # leave .tagdir and friends alone
+            if not f.startswith("."):
+                tags = dir_tags | matcher.tokenize(os.path.splitext(f)[0])
+                rows.append((os.path.join(root, f), tags))
+
+        if not recursive:
+            break
+
+    return rows
+
+
+def _scan_subtree(top, recursive, overrides):
+    return _tag_rows(os.walk(top), overrides, recursive)
+
+
+# returns a sorted list of (path, tags) for every file under path. The
+# top-level subtrees are walked and tokenized by separate workers (see
+# map_subtrees()), and the results are the same for any number of jobs.
+# With a single job and a "walk_concurrency" above 1 in the .tagdir (or a
+# stand-in fs), the tree is read by the asyncio walker instead.
+def scan_tags(path, overrides={}, jobs=1, threads=False, fs=None):
+    path = os.path.abspath(path)
+    concurrency = get_config(path, overrides)["walk_concurrency"]
+
+    if jobs <= 1 and (concurrency > 1 or fs is not None):
+        from .walker import walk
+        rows = _tag_rows(walk(path, fs, concurrency), overrides)
+    else:
+        rows = []
+        for result in map_subtrees(_scan_subtree, path, (overrides,), jobs, threads):
+            rows.extend(result)
+
+    rows.sort()
+    return rows
@@ -0,0 +1,178 @@
+
+import os
+import json
+
+from .config import clear_config_cache
+from .filename import Filename
+from .dirtree import DirSnapshot
+from .rename import RenameExecutor, RenameError, RENAME_JOBS, journal_path
+from .views import update_views
+from .vocab import update_vocabularies
+
+
+# computes the new path of every file, without touching the filesystem
+# returns a list of (src, dst) pairs, for only the files that will move
+# A snapshot given by the caller isn't saved here: apply_plan() saves it
+# once the renames it was used to plan are done.
+def plan_retag(files, add_tags, remove_tags, overrides={}, snapshot=None):
+
+    owned = snapshot is None
+    if owned:
+        snapshot = DirSnapshot()
+
+    plan = []
+
+    for filestr in files:
+        f = Filename(filestr, overrides)
+        f.add_remove_tags(add_tags, remove_tags, snapshot)
+
+        dst = str(f)
+        if os.path.abspath(filestr) != dst:
+            plan.append((filestr, dst))
+
+    # keep the directory listings for the next run
+    if owned:
+        snapshot.save()
+
+    return plan
+
+
+# carries out the renames from plan_retag()
+# renames are journaled (see RenameExecutor) and run in parallel
+def apply_plan(plan, snapshot=None, journal=None, jobs=RENAME_JOBS):
+    if plan:
+        for dst_dir in set(os.path.dirname(dst) for src, dst in plan):
+            if not os.path.isdir(dst_dir):
+                os.makedirs(dst_dir)
+                if snapshot is not None:
+                    snapshot.add_dir(dst_dir)
+
+        if journal is None:
+            journal = journal_path(plan[0][0])
+
+        RenameExecutor(journal, jobs).execute(plan)
+
+    # keep the directory listings the plan was made with for the next run,
+    # now that nothing is left to rename
+    if snapshot is not None:
+        snapshot.save()
+
+
+# adds and removes tags on many files, listing each directory only once
+# returns the list of (src, dst) renames that were made
+def batch_retag(files, add_tags, remove_tags, overrides={}, journal=None, jobs=RENAME_JOBS):
+    snapshot = DirSnapshot()
+    plan = plan_retag(files, add_tags, remove_tags, overrides, snapshot)
+    apply_plan(plan, snapshot, journal, jobs)
+    return plan
+
+
+# returns request[key] as a list of strings, or raises ValueError
+def _string_list(request, key):
+    value = request.get(key, [])
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise ValueError("invalid request: '%s' must be a list of strings" % key)
+    return value
+
+
+class BatchSession:
+    """
+    Answers a stream of retag requests in a single process, for callers
+    that would otherwise run `tag` once per file. The configs and compiled
+    matchers (see get_config()), and the directory listings, are kept warm
+    between requests. Each request is one line of JSON:
+
+        {"files": [FILE...], "add": [TAG...], "remove": [TAG...], "nocase": false}
+
+    and is answered by one line of JSON:
+
+        {"ok": true, "renames": [[SRC, DST]...]}
+        {"ok": false, "error": MESSAGE, "renames": [[SRC, DST]...]}
+
+    {"reload": true} forgets the directory listings and the cached tag
+    roots, for when other processes have changed the tree.
+
+    A request whose renames fail part way through is rolled back, so that
+    its journal doesn't hold up the requests after it.
+    """
+
+    def __init__(self, overrides={}, journal=None, jobs=RENAME_JOBS):
+        self.overrides = overrides
+        self.journal   = journal
+        self.jobs      = jobs
+        self.snapshot  = DirSnapshot()
+
+
+    def retag(self, files, add_tags, remove_tags, overrides):
+        """ returns the list of (src, dst) renames that were made """
+        plan = plan_retag(files, add_tags, remove_tags, overrides, self.snapshot)
+        if not plan:
+            self.snapshot.save()
+            return plan
+
+        journal = self.journal or journal_path(plan[0][0])
+        existed = os.path.exists(journal)
+
+        try:
+            apply_plan(plan, self.snapshot, journal, self.jobs)
+        except OSError:
+            # a failed run leaves its journal behind, which would refuse
+            # every later request, so move its files back straight away
+            self.snapshot = DirSnapshot()
+            if not existed and os.path.exists(journal):
+                RenameExecutor(journal).rollback()
+            raise
+
+        update_views(plan, overrides)
+        update_vocabularies(plan)
+        return plan
+
+
+    def handle(self, request):
+        """ answers a single decoded request """
+
+        if not isinstance(request, dict):
+            return { "ok": False, "error": "invalid request: expected an object", "renames": [] }
+
+        if request.get("reload"):
+            self.snapshot = DirSnapshot()
+            clear_config_cache()
+            return { "ok": True, "renames": [] }
+
+        overrides = dict(self.overrides)
+        if request.get("nocase"):
+            overrides["case_sensitive"] = False
+
+        try:
+            files  = _string_list(request, "files")
+            add    = _string_list(request, "add")
+            remove = _string_list(request, "remove")
+
+            missing = [ f for f in files if not os.path.isfile(f) ]
+            if missing:
+                return { "ok": False, "error": "not a valid file: '%s'" % missing[0], "renames": [] }
+
+            renames = self.retag(files, add, remove, overrides)
+        except RenameError as e:
+            return { "ok": False, "error": str(e), "renames": e.renames }
+        except (OSError, ValueError) as e:
+            return { "ok": False, "error": str(e), "renames": [] }
+
+        return { "ok": True, "renames": renames }
+
+
+    def serve(self, infile, outfile):
+        """ answers requests from infile until it's closed """
+        for line in infile:
+            if not line.strip():
+                continue
+
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                response = { "ok": False, "error": "invalid request: %s" % e, "renames": [] }
+            else:
+                response = self.handle(request)
+
+            outfile.write(json.dumps(response) + "\n")
+            outfile.flush()
@@ -0,0 +1,64 @@
+
+import sys
+
+
+# command -> (module in tagtool.commands, name of the old standalone script)
+COMMANDS = {
+    "tag"      : ("tag",      "tag"),
+    "find"     : ("find",     "tag-find"),
+    "list"     : ("list",     "tag-list"),
+    "organize" : ("organize", "tag-organize"),
+    "dialog"   : ("dialog",   "tag-dialog"),
+    "daemon"   : ("daemon",   "tag-daemon"),
+    "snapshot" : ("snapshot", "tag-snapshot"),
+    "diff"     : ("diff",     "tag-diff"),
+}
+
+help_text = """
+Usage:
+\ttagtool COMMAND [OPTION...] [ARG...]
+
+Commands:
+\ttag       adds and removes tags on files                (tag)
+\tfind      selects files by their tags                   (tag-find)
+\tlist      lists the tags of files                       (tag-list)
+\torganize  proposes a directory hierarchy for the tree   (tag-organize)
+\tdialog    GUI dialog for tagging files                  (tag-dialog)
+\tdaemon    keeps the tags of a tree in memory            (tag-daemon)
+\tsnapshot  saves the tags of every file in the tree      (tag-snapshot)
+\tdiff      compares snapshots of the tree's tags         (tag-diff)
+
+Run `tagtool COMMAND --help` for the options of each command. The old
+script names in parentheses still work, and do the same thing.
+
+For issues and documentation: https://github.com/brendan-w/tag-tool
+"""
+
+
+# runs a single command, with sys.argv[1:] as its arguments
+# Only the modules that the command needs are imported
+def run_command(command):
+    from importlib import import_module
+    from . import stats
+
+    module, script = COMMANDS[command]
+
+    # the script name is what shows up in --profile dumps
+    sys.argv[0] = script
+
+    return stats.run(import_module(".commands." + module, __package__).main)
+
+
+# the `tagtool` entry point, or `tagtool COMMAND` for any of the old scripts
+def main(command=None):
+    if command is None:
+        if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+            if len(sys.argv) > 1 and sys.argv[1] not in ["--help", "help"]:
+                print("'%s' is not a tagtool command" % sys.argv[1])
+            print(help_text)
+            return
+
+        command = sys.argv[1]
+        sys.argv = sys.argv[:1] + sys.argv[2:]
+
+    return run_command(command)
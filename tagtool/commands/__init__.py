@@ -0,0 +1,2 @@
+
+# the code behind each command (see tagtool.cli), imported only when run
@@ -0,0 +1,59 @@
+
+
+import sys
+import errno
+
+from ..config import get_config
+from ..daemon import TagDaemon, RECONCILE_INTERVAL
+
+
+help_text = """
+Usage:
+\ttag-daemon [OPTION...]
+
+Watches the tag root of the current directory, and keeps its tags in
+memory. While it runs, tag-find and tag-organize query it instead of
+walking the tree.
+
+Options:
+\t--interval N  seconds between full rescans of the tree (default %d)
+\t--stats       prints call counts and timings of the hot spots to stderr
+\t--profile     writes a cProfile dump to tag-daemon.prof
+\t--help        prints this help text and exits
+
+For issues and documentation: https://github.com/brendan-w/tag-tool
+""" % RECONCILE_INTERVAL
+
+
+def main():
+    interval = RECONCILE_INTERVAL
+
+    args = iter(sys.argv[1:])
+
+    for option in args:
+        if option == "--help":
+            print(help_text)
+            return
+        elif option == "--interval":
+            interval = next(args, "")
+            if not interval.isdigit():
+                print("--interval requires a number of seconds")
+                return
+            interval = int(interval)
+        else:
+            print("'%s' is not a valid option" % option)
+            return
+
+    config = get_config()
+    daemon = TagDaemon(config, interval)
+
+    print("watching %s" % config["root_dir"])
+
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        if e.errno != errno.EADDRINUSE:
+            raise
+        print("a daemon is already running for %s" % config["root_dir"])
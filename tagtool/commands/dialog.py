@@ -0,0 +1,175 @@
+
+
+import os
+import sys
+
+from ..config import get_config
+from ..vocab import get_vocabulary
+
+# GTK is only loaded once the dialog is about to be shown (see load_gtk())
+Gtk = None
+Gdk = None
+
+
+help_text = """
+Usage:
+\ttag-dialog [FILE...] [INITIAL COMMAND]
+
+Simple GUI dialog for the tagging files. Intended to be used in
+"Custom Actions" provided by most file management/preview applications.
+
+Commands:
+\t+[TAG]   adds a tag to the given files
+\t-[TAG]   removes a tag from the given files
+
+Options:
+\t--stats    prints call counts and timings of the hot spots to stderr
+\t--profile  writes a cProfile dump to tag-dialog.prof
+\t--help     prints this help text and exits
+
+For issues and documentation: https://github.com/brendanwhitfield/tag-tool
+"""
+
+
+CSS = b"""
+
+    GtkWindow
+    {
+        background:black;
+        color:white;
+    }
+
+    GtkEntry
+    {
+        color:inherit;
+        background: #333;
+        border:none;
+        font-family:monospace;
+    }
+
+"""
+
+
+def load_gtk():
+    global Gtk, Gdk
+
+    import gi
+    gi.require_version("Gtk", "3.0")
+    from gi.repository import Gtk, Gdk
+
+    provider = Gtk.CssProvider()
+    provider.load_from_data(CSS)
+    Gtk.StyleContext.add_provider_for_screen(Gdk.Screen.get_default(), provider,
+        Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION)
+
+
+class Window:
+
+    def __init__(self, files, init_str=""):
+        self.files = files
+        self.commands = None # set once the user hits Return
+        self.window = Gtk.Window(Gtk.WindowType.TOPLEVEL)
+    
+        self.window.connect("delete_event", lambda w,e: False)
+        self.window.connect("destroy", Gtk.main_quit)
+    
+        self.window.set_border_width(10)
+        self.window.set_title("Tag-Tool")
+        self.window.set_default_size(400, -1)
+        self.window.set_resizable(True)
+        self.window.set_modal(True)
+        self.window.set_position(Gtk.WindowPosition.CENTER)
+
+        self.entry = Gtk.Entry()
+        self.window.add(self.entry)
+
+        self.entry.set_text(init_str)
+        self.entry.connect("key-release-event", self.on_key_release)
+        self.entry.connect("key-press-event", self.on_key_press)
+
+        # tag counts for Tab completion, loaded on the first Tab
+        self.vocab = None
+        self.completions = []   # the candidates being cycled through
+        self.completed = None   # the entry text after the last completion
+
+        self.entry.show()
+        self.window.show()
+
+        # put the cursor at the end of the text
+        # needs to happen AFTER the window is shown
+        l = len(self.entry.get_text())
+        self.entry.grab_focus()
+        self.entry.select_region(l,l)
+
+
+    def on_key_release(self, widget, data=None):
+        if data.keyval == Gdk.KEY_Return:
+            self.tag()
+        elif data.keyval == Gdk.KEY_Escape:
+            Gtk.main_quit()
+
+
+    def on_key_press(self, widget, data=None):
+        # Tab completes the last word, instead of moving the focus
+        if data.keyval == Gdk.KEY_Tab:
+            self.complete()
+            return True
+        return False
+
+
+    def complete(self):
+        text = self.entry.get_text()
+        head, space, word = text.rpartition(" ")
+
+        if text == self.completed and self.completions:
+            # pressing Tab again cycles through the other candidates
+            self.completions = self.completions[1:] + self.completions[:1]
+        else:
+            if self.vocab is None:
+                config = get_config(os.path.dirname(os.path.abspath(self.files[0])))
+                self.vocab = get_vocabulary(config)
+
+            sign = word[:1] if word[:1] in ["+", "-"] else ""
+            self.completions = [ sign + t for t in self.vocab.complete(word[len(sign):]) ]
+
+        if not self.completions:
+            return
+
+        self.completed = head + space + self.completions[0]
+        self.entry.set_text(self.completed)
+        self.entry.set_position(-1)
+
+
+    def tag(self):
+        # the tag command runs once the window is gone (see main())
+        self.commands = self.entry.get_text().split()
+        Gtk.main_quit()
+
+
+
+def main():
+    files = []
+    init_str = ""
+
+    for arg in sys.argv[1:]:
+        if arg == "--help":
+            print(help_text)
+            return
+        elif os.path.isfile(arg):
+            files.append(arg)
+        else:
+            init_str = arg
+
+    if len(files) == 0:
+        print("Please enter one or more files to be tagged")
+        sys.exit(1)
+
+    load_gtk()
+    window = Window(files, init_str)
+    Gtk.main()
+
+    # run the tag command in this process, rather than starting another
+    if window.commands is not None:
+        from . import tag
+        sys.argv = ["tag"] + files + window.commands
+        tag.main()
@@ -0,0 +1,102 @@
+
+import os
+import sys
+
+from ..snapshot import FILE_ADDED, FILE_REMOVED, TagSnapshot, diff_snapshots
+
+
+help_text = """
+Usage:
+\ttag-diff [OPTION...] OLD [NEW]
+
+Compares two snapshots saved by tag-snapshot, or a snapshot against the
+live tree it was taken of when NEW is left out. Prints a line
+for every file whose tags differ:
+
+\t~ FILE  +TAG -TAG...         the file gained and lost these tags
+\t> OLD -> NEW  +TAG -TAG...   the file was retagged (renamed)
+\t- FILE  TAG...               the file is gone, along with these tags
+\t+ FILE  TAG...               the file is new, with these tags
+
+Options:
+\t--nocase    with no NEW snapshot, treats tags case insensitively
+\t--jobs N    with no NEW snapshot, walks the tree with N worker processes
+\t--threads   with --jobs, uses threads instead (for network mounts)
+\t--stats     prints call counts and timings of the hot spots to stderr
+\t--profile   writes a cProfile dump to tag-diff.prof
+\t--help      prints this help text and exits
+
+For issues and documentation: https://github.com/brendan-w/tag-tool
+"""
+
+
+# formats a difference from diff_snapshots() as a line of output
+def format_change(kind, old_path, new_path, added, removed):
+    if kind == FILE_ADDED:
+        return "%s %s  %s" % (kind, new_path, " ".join(added))
+    if kind == FILE_REMOVED:
+        return "%s %s  %s" % (kind, old_path, " ".join(removed))
+
+    tags = " ".join([ "+" + t for t in added ] + [ "-" + t for t in removed ])
+    if old_path != new_path:
+        return "%s %s -> %s  %s" % (kind, old_path, new_path, tags)
+    return "%s %s  %s" % (kind, new_path, tags)
+
+
+def main():
+    paths = []
+    jobs = 1
+    threads = False
+
+    # config params that will override the .tagdir params
+    overrides = {}
+
+    args = iter(sys.argv[1:])
+
+    for option in args:
+        if option == "--help":
+            print(help_text)
+            return
+        elif option == "--nocase":
+            overrides["case_sensitive"] = False
+        elif option == "--jobs":
+            jobs = next(args, "")
+            if not jobs.isdigit():
+                print("--jobs requires a number of workers")
+                return
+            jobs = int(jobs)
+        elif option == "--threads":
+            threads = True
+        elif len(paths) < 2:
+            paths.append(option)
+        else:
+            print("'%s' is not a valid option" % option)
+            return
+
+    if not paths:
+        print("please give a snapshot to compare against")
+        return
+
+    snapshots = []
+    for path in paths:
+        try:
+            snapshots.append(TagSnapshot.open(path))
+        except (OSError, ValueError) as e:
+            print("%s: %s" % (path, e))
+            return
+
+    # compare against the tree the snapshot was taken of, wherever the
+    # command is run from, leaving out the snapshot files themselves
+    if len(snapshots) == 1:
+        root = snapshots[0].root
+        if not os.path.isdir(root):
+            print("%s: the snapshot's root '%s' is not a directory" % (paths[0], root))
+            return
+        snapshots.append(TagSnapshot.scan(root, overrides, jobs, threads, exclude=paths))
+
+    old, new = snapshots
+    for change in diff_snapshots(old, new):
+        print(format_change(*change))
+
+    for snapshot in snapshots:
+        snapshot.close()
@@ -0,0 +1,233 @@
+
+import os
+import sys
+import itertools
+
+from ..config import TAGDIR_FILENAME, get_config, find_roots, _find_root
+from ..select import SELECT_JOBS, iter_select, select_roots, explain_select
+from ..utils import sync_links_dir
+from ..views import parse_operations, link_names, get_view, save_view
+from ..fuzzy import FUZZY_DISTANCE, get_trigram_index, fuzzy_aliases
+
+
+help_text = """
+Usage:
+\ttag-find [OPTION...] [SELECTOR...]
+
+Selectors:
+\t[TAG]    filters tagged files for this tag         ("AND")
+\t+[TAG]   adds tagged files to the selection        ("OR")
+\t-[TAG]   removes tagged files from the selection   ("NOT")
+
+Options:
+\t--nocase   performs a case insensitive search
+\t--index    answers the selection from the .tagindex (built on first use)
+\t--limit N  stops after the first N results
+\t--symlink  links the results into the symlink_dir, instead of printing them
+\t--explain  prints the query plan instead of running it
+\t--fuzzy    also selects files bearing tags similar to the given ones
+\t--distance N  with --fuzzy, the most edits between two tags (default %d)
+\t--atomic   with --symlink, swaps in the new links all at once
+\t--save NAME  saves the selectors as a view, kept up to date by `tag`
+\t--view NAME  refreshes the links of a saved view
+\t--root DIR   searches the tag root of DIR (may be given several times)
+\t--discover   also searches every tag root nested below the --root
+\t             directories (or below the current directory)
+\t--jobs N     with several roots, how many to search at once (default %d)
+\t--stats    prints call counts and timings of the hot spots to stderr
+\t--profile  writes a cProfile dump to tag-find.prof
+\t--help     prints this help text and exits
+
+For issues and documentation: https://github.com/brendan-w/tag-tool
+""" % (FUZZY_DISTANCE, SELECT_JOBS)
+
+
+
+# re-runs a saved view
+def refresh_view(name, overrides):
+    config = get_config(overrides=overrides)
+    view = get_view(config, name)
+
+    if view is None:
+        print("no view named '%s' in %s" % (name, os.path.join(config["root_dir"], TAGDIR_FILENAME)))
+        return
+
+    n = view.refresh(config)
+    print("Symlinked %d files into %s" % (n, view.link_dir))
+
+
+# runs the selection against several tag roots at once, printing the files
+# as they arrive and the time each root took to stderr
+def find_in_roots(operations, roots, overrides, aliases, limit, jobs):
+    timings = {}
+    found = select_roots(operations, roots, overrides, aliases, timings, jobs)
+
+    for root, f in itertools.islice(found, limit or None):
+        print(str(f))
+    found.close() # stops the roots still being searched
+
+    for root in roots:
+        if root in timings:
+            seconds, n = timings[root]
+            print("%s: %d files in %.3fs" % (root, n, seconds), file=sys.stderr)
+        else:
+            print("%s: stopped early" % root, file=sys.stderr)
+
+
+def main():
+    selectors = []
+    symlink = False
+    atomic = False
+    explain = False
+    fuzzy = False
+    distance = FUZZY_DISTANCE
+    limit = 0
+    save = ""
+    dirs = []
+    discover = False
+    jobs = SELECT_JOBS
+
+    # config params that will override the .tagdir params
+    overrides = {}
+
+    args = iter(sys.argv[1:])
+
+    for option in args:
+        if option == "--help":
+            print(help_text)
+            return
+        elif option == "--symlink":
+            symlink = True
+        elif option == "--atomic":
+            atomic = True
+        elif option == "--explain":
+            explain = True
+        elif option == "--fuzzy":
+            fuzzy = True
+        elif option == "--distance":
+            distance = next(args, "")
+            if not distance.isdigit():
+                print("--distance requires a number of edits")
+                return
+            distance = int(distance)
+        elif option == "--save":
+            save = next(args, "")
+        elif option == "--view":
+            refresh_view(next(args, ""), overrides)
+            return
+        elif option == "--nocase":
+            overrides["case_sensitive"] = False
+        elif option == "--index":
+            overrides["use_index"] = True
+        elif option == "--limit":
+            limit = next(args, "")
+            if not limit.isdigit():
+                print("--limit requires a number of results")
+                return
+            limit = int(limit)
+        elif option == "--root":
+            d = next(args, "")
+            if not os.path.isdir(d):
+                print("'%s' is not a directory" % d)
+                return
+            dirs.append(d)
+        elif option == "--discover":
+            discover = True
+        elif option == "--jobs":
+            jobs = next(args, "")
+            if not jobs.isdigit() or int(jobs) < 1:
+                print("--jobs requires a number of roots")
+                return
+            jobs = int(jobs)
+        else:
+            selectors.append(option)
+
+    operations = parse_operations(selectors)
+
+    # check that the user entered something
+    if len(operations) == 0:
+        print("please give tag selectors")
+        return
+
+    # check for delimeters in the tags
+    # if not all([ valid_tag(op.tag) for op in operations ]):
+    #     print("tags cannot be empty strings, or contain delimeters")
+    #     return
+
+    if discover:
+        roots = find_roots(dirs or ["."])
+    elif dirs:
+        # get_config() would fall back to the CWD for a dir outside any root
+        roots = [ _find_root(os.path.abspath(d)) for d in dirs ]
+        for d, root in zip(dirs, roots):
+            if not root:
+                print("'%s' is not in a tag root (no %s file found)" % (d, TAGDIR_FILENAME))
+                return
+        roots = sorted(set(roots))
+    else:
+        roots = [ get_config(overrides=overrides)["root_dir"] ]
+
+    if not roots:
+        print("no %s files found" % TAGDIR_FILENAME)
+        return
+
+    if len(roots) > 1 and (symlink or save):
+        print("--symlink and --save only work within a single tag root")
+        return
+
+    # look for similarly spelled tags, and accept any of them in place of each tag
+    aliases = None
+    if fuzzy:
+        aliases = {}
+        for root in roots:
+            vocab, index = get_trigram_index(get_config(root, overrides))
+            for tag, similar in fuzzy_aliases(operations, index, distance).items():
+                aliases.setdefault(tag, [tag])
+                aliases[tag] += [ t for t in similar if t not in aliases[tag] ]
+
+        for tag, similar in aliases.items():
+            if len(similar) > 1:
+                print("%s: also selecting %s" % (tag, " ".join(similar[1:])), file=sys.stderr)
+
+    if explain:
+        for root in roots:
+            if len(roots) > 1:
+                print("%s:" % root)
+            for line in explain_select(operations, get_config(root, overrides), aliases):
+                print(line)
+        return
+
+    if len(roots) > 1:
+        find_in_roots(operations, roots, overrides, aliases, limit, jobs)
+        return
+
+    config = get_config(roots[0], overrides)
+
+    if save:
+        try:
+            view = save_view(config, save, selectors)
+        except ValueError as e:
+            print(e)
+            return
+
+        n = view.refresh(config)
+        print("Saved view '%s' with %d files in %s" % (view.name, n, view.link_dir))
+        return
+
+    # run the selection
+    files = iter_select(operations, config, aliases)
+
+    if limit:
+        files = itertools.islice(files, limit)
+
+    if not symlink:
+        for f in files:
+            print(str(f))
+    else:
+        # only the links that changed are touched
+        try:
+            n = sync_links_dir(config["symlink_dir"], link_names(files, config), atomic)
+        except ValueError as e:
+            print(e)
+            return
+        print("Symlinked %d files into %s" % (n, config["symlink_dir"]))
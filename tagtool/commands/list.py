@@ -0,0 +1,91 @@
+
+import os
+import sys
+
+from ..config import get_config
+from ..filename import Filename
+from ..batch import apply_plan
+from ..fuzzy import FUZZY_DISTANCE, get_trigram_index, merge_candidates
+
+
+help_text = """
+Usage:
+\ttag-list [OPTION...] [FILE...]
+\ttag-list --similar [--distance N]
+
+Options:
+\t--nocase     performs case insensitive tag removal
+\t--similar    lists the tags of the whole tree that look like misspellings
+\t             of more common tags, with their file counts
+\t--distance N  with --similar, the most edits between two tags (default %d)
+\t--stats     prints call counts and timings of the hot spots to stderr
+\t--profile   writes a cProfile dump to tag-list.prof
+\t--help      prints this help text and exits
+
+For issues and documentation: https://github.com/brendan-w/tag-tool
+""" % FUZZY_DISTANCE
+
+
+def run(files, overrides):
+
+    tags = set()
+    renames = []
+
+    for filestr in files:
+        f = Filename(filestr, overrides)
+        tags.update(f.get_tags())
+        if os.path.abspath(filestr) != str(f):
+            renames.append((filestr, str(f)))
+
+    apply_plan(renames)
+
+    for tag in tags:
+        print(tag)
+
+
+# prints the tags that should probably be merged into others
+def similar(overrides, distance):
+    vocab, index = get_trigram_index(get_config(overrides=overrides))
+
+    for tag, count, targets in merge_candidates(vocab, distance, index):
+        print("%s (%d)  ->  %s" % (tag, count, ", ".join("%s (%d)" % (t, n) for t, n, d in targets)))
+
+
+def main():
+    files = set()
+    similar_tags = False
+    distance = FUZZY_DISTANCE
+
+    overrides = {}
+
+    args = iter(sys.argv[1:])
+
+    for option in args:
+        if option == "--help":
+            print(help_text)
+            return
+        elif option == "--nocase":
+            overrides["case_sensitive"] = False
+        elif option == "--similar":
+            similar_tags = True
+        elif option == "--distance":
+            distance = next(args, "")
+            if not distance.isdigit():
+                print("--distance requires a number of edits")
+                return
+            distance = int(distance)
+        elif os.path.isfile(option):
+            files.add(option)
+        else:
+            print("'%s' is not a valid file" % option)
+
+    if similar_tags:
+        similar(overrides, distance)
+        return
+
+    if len(files) == 0:
+        print("please specify files to list")
+        return        
+
+    # run the tagger
+    run(files, overrides)
@@ -0,0 +1,111 @@
+
+
+import os
+import sys
+
+from ..config import get_config
+from ..filename import Filename
+from ..analytics import TagMatrix, hierarchy_dirs, scan_tags
+from ..batch import plan_retag, apply_plan
+from ..dirtree import DirSnapshot
+from ..daemon import daemon_request
+
+help_text = """
+Usage:
+\ttag-organize [OPTION...]
+
+Options:
+\t--nocase    performs a case insensitive search
+\t--apply     creates the proposed directories, and moves files into them
+\t--jobs N    walks and tokenizes the tree with N worker processes
+\t--threads   with --jobs, uses threads instead (for network mounts)
+\t--stats     prints call counts and timings of the hot spots to stderr
+\t--profile   writes a cProfile dump to tag-organize.prof
+\t--help      prints this help text and exits
+
+For issues and documentation: https://github.com/brendan-w/tag-tool
+"""
+
+
+# if there are only N files bearing a tag, DON'T make a directory
+MIN_FILES_FOR_DIRECTORY = 20
+
+# custom logic for ignoring certain tags
+def allowed_tag(tag, count):
+    return count >= MIN_FILES_FOR_DIRECTORY and \
+           not tag.isdigit() and \
+           len(tag) > 1
+
+
+# prints the proposed hierarchy as an indented tree
+def print_plan(plan, indent=0):
+    for tag, count, children in plan:
+        print("%s%s/ (%d)" % ("    " * indent, tag, count))
+        print_plan(children, indent + 1)
+
+
+# partitions the files in the given directory
+def run(path, overrides, apply=False, jobs=1, threads=False):
+
+    matrix = TagMatrix()
+
+    print("discovering files...")
+
+    # ask a running tag-daemon before walking the tree
+    # (only for the files under path, since it holds the whole root)
+    config = get_config(path, overrides)
+    under = os.path.relpath(os.path.abspath(path), config["root_dir"] or ".")
+    files = daemon_request(config, { "files": True, "under": under })
+    if files is None:
+        for f, tags in scan_tags(path, overrides, jobs, threads):
+            matrix.add(f, tags)
+    else:
+        for f in files:
+            # leave .tagdir and friends alone
+            if not os.path.basename(f).startswith("."):
+                matrix.add(f, Filename(f, overrides).get_tags())
+
+    print("proposing directories...")
+    plan = matrix.propose_hierarchy(allowed_tag)
+
+    print_plan(plan)
+
+    if apply:
+        print("creating directories...")
+        for d in hierarchy_dirs(plan):
+            os.makedirs(os.path.join(config["root_dir"], d), exist_ok=True)
+
+        # sink every file into the new directories
+        print("moving files...")
+        snapshot = DirSnapshot()
+        apply_plan(plan_retag(matrix.paths, [], [], overrides, snapshot), snapshot)
+
+
+def main():
+    overrides = {}
+    apply = False
+    jobs = 1
+    threads = False
+
+    args = iter(sys.argv[1:])
+
+    for option in args:
+        if option == "--help":
+            print(help_text)
+            return
+        elif option == "--nocase":
+            overrides["case_sensitive"] = False
+        elif option == "--apply":
+            apply = True
+        elif option == "--threads":
+            threads = True
+        elif option == "--jobs":
+            jobs = next(args, "")
+            if not jobs.isdigit():
+                print("--jobs requires a number of workers")
+                return
+            jobs = int(jobs)
+        else:
+            print("'%s' is not a valid file" % option)
+
+    run("./", overrides, apply, jobs, threads)
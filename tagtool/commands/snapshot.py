@@ -0,0 +1,63 @@
+
+import sys
+
+from ..snapshot import snapshot_root
+
+
+help_text = """
+Usage:
+\ttag-snapshot [OPTION...] FILE
+
+Saves the tags of every file in the tag root of the current directory to
+FILE, for comparing against later with tag-diff.
+
+Options:
+\t--nocase    treats tags case insensitively
+\t--jobs N    walks and tokenizes the tree with N worker processes
+\t--threads   with --jobs, uses threads instead (for network mounts)
+\t--stats     prints call counts and timings of the hot spots to stderr
+\t--profile   writes a cProfile dump to tag-snapshot.prof
+\t--help      prints this help text and exits
+
+For issues and documentation: https://github.com/brendan-w/tag-tool
+"""
+
+
+def main():
+    path = ""
+    jobs = 1
+    threads = False
+
+    # config params that will override the .tagdir params
+    overrides = {}
+
+    args = iter(sys.argv[1:])
+
+    for option in args:
+        if option == "--help":
+            print(help_text)
+            return
+        elif option == "--nocase":
+            overrides["case_sensitive"] = False
+        elif option == "--jobs":
+            jobs = next(args, "")
+            if not jobs.isdigit():
+                print("--jobs requires a number of workers")
+                return
+            jobs = int(jobs)
+        elif option == "--threads":
+            threads = True
+        elif not path:
+            path = option
+        else:
+            print("'%s' is not a valid option" % option)
+            return
+
+    if not path:
+        print("please give a file to save the snapshot to")
+        return
+
+    # an earlier snapshot saved to the same file isn't part of the tree
+    snapshot = snapshot_root(overrides=overrides, jobs=jobs, threads=threads, exclude=[path])
+    snapshot.save(path)
+    print("Saved %d files and %d tags of %s to %s" % (len(snapshot), snapshot.n_tags, snapshot.root, path))
@@ -0,0 +1,138 @@
+
+
+import os
+import sys
+
+from ..config import get_config, state_path
+from ..batch import batch_retag, BatchSession
+from ..rename import RenameExecutor, RenameError, TAGJOURNAL_FILENAME
+from ..views import update_views
+from ..vocab import update_vocabularies, get_vocabulary
+
+
+verbose = False
+
+help_text = """
+Usage:
+\ttag [OPTION...] [COMMAND...] [FILE...]
+
+Commands:
+\t+[TAG]   adds a tag to the given files
+\t-[TAG]   removes a tag from the given files
+
+Options:
+\t--nocase    performs case insensitive tag removal
+\t--verbose   prints the new filepath for each renamed file
+\t--resume    finishes the renames of an interrupted run
+\t--rollback  undoes the renames of an interrupted run
+\t--complete PREFIX  prints the most used tags starting with PREFIX, for
+\t            shell completion (+PREFIX and -PREFIX are completed too)
+\t--batch     reads JSON requests from stdin, one per line, answering each
+\t            with a line of JSON on stdout (see tagtool.BatchSession)
+\t--stats     prints call counts and timings of the hot spots to stderr
+\t--profile   writes a cProfile dump to tag.prof
+\t--help      prints this help text and exits
+
+For issues and documentation: https://github.com/brendan-w/tag-tool
+"""
+
+
+def run(files, add_tags, remove_tags, config):
+    # plan every rename against one snapshot of the tree, then apply them
+    try:
+        renames = batch_retag(files, add_tags, remove_tags, config)
+    except RenameError as e:
+        print(e)
+        for src, dst in e.renames:
+            print("\t‘%s’ -> ‘%s’" % (src, dst))
+        return
+
+    # keep any saved views, and the tag counts, up to date with the renamed files
+    update_views(renames, config)
+    update_vocabularies(renames)
+
+    if verbose:
+        for src, dst in renames:
+            print("‘%s’ -> ‘%s’" % (src, dst))
+
+
+# prints the tags starting with the given prefix, one per line
+def complete(prefix, config):
+    sign = prefix[:1] if prefix[:1] in ["+", "-"] else ""
+    vocab = get_vocabulary(get_config(overrides=config))
+
+    for tag in vocab.complete(prefix[len(sign):]):
+        print(sign + tag)
+
+
+# finishes or undoes the renames recorded in the journal
+def recover(option, config):
+    journal = state_path(get_config(overrides=config)["root_dir"], TAGJOURNAL_FILENAME)
+
+    if not os.path.exists(journal):
+        print("no rename journal found at '%s'" % journal)
+        return
+
+    executor = RenameExecutor(journal)
+
+    if option == "--resume":
+        for src, dst in executor.resume():
+            print("skipped '%s': the file no longer exists" % src)
+    else:
+        executor.rollback()
+
+
+def main():
+    global verbose
+
+    add_tags    = set()
+    remove_tags = set()
+    files       = set()
+    batch       = False
+
+    # config params that will override the .tagdir params
+    config = {}
+
+    args = iter(sys.argv[1:])
+
+    for option in args:
+        if option == "--help":
+            print(help_text)
+            return
+        elif option == "--verbose":
+            verbose = True
+        elif option == "--complete":
+            complete(next(args, ""), config)
+            return
+        elif option == "--batch":
+            batch = True
+        elif option in ["--resume", "--rollback"]:
+            recover(option, config)
+            return
+        elif option == "--nocase":
+            config["case_sensitive"] = False
+        else:
+            if option[0] == "+":
+                add_tags.add(option[1:]);
+            elif option[0] == "-":
+                remove_tags.add(option[1:]);
+            elif os.path.isfile(option):
+                files.add(option)
+            else:
+                print("'%s' is not a valid file or command line option" % option)
+
+    # keep one process open for many requests
+    if batch:
+        BatchSession(config).serve(sys.stdin, sys.stdout)
+        return
+
+    if len(files) == 0:
+        print("please specify files to be tagged")
+        return        
+
+    if (len(add_tags) + len(remove_tags)) == 0:
+        print("please specify a tag operation")
+        return
+
+    # run the tagger
+    run(files, add_tags, remove_tags, config)
@@ -1,9 +1,9 @@
 
 import re
 import os
-import configparser
 
 from .utils import *
+from .matcher import TagMatcher
 
 
 
@@ -17,6 +17,16 @@ TAGDIR_FILENAME = ".tagdir"
 # the config section containing settings
 TAGDIR_SECTION = "tagdir"
 
+# the directory next to the .tagdir file that holds tagtool's own working
+# files (the rename journal, tag counts and indexes, and their locks).
+# Files come and go in there without changing the mtime of the root itself,
+# which the root's DirCache entry depends on.
+TAGSTATE_DIRNAME = ".tagtool"
+
+# the prefix of the config sections containing saved queries
+# for example: [view holidays]
+VIEW_SECTION_PREFIX = "view "
+
 
 
 """
@@ -30,12 +40,95 @@ DEFAULT_CONFIG = {
     "default_delim"    : "_",
     "no_tags_filename" : "unknown",
     "case_sensitive"   : True,
-    "symlink_dir"      : "/tmp/tags"
+    "symlink_dir"      : "/tmp/tags",
+    "use_index"        : False, # answer selections from the .tagindex file
+    "use_daemon"       : True,  # answer selections from a running tag-daemon
+    "walk_concurrency" : 1,     # directory reads kept in flight (raise for network mounts)
+    "use_dir_cache"    : False, # keep directory listings in the .tagdircache file
+    "views"            : (),    # saved queries, as (name, selectors, link_dir, nocase)
 }
 
 
+# cache of absolute directory -> root_dir (memoized find_above() results)
+_root_cache = {}
+
+# cache of (root_dir, overrides) -> (.tagdir mtime, config)
+_config_cache = {}
+
+
+# forgets all cached roots and configs
+def clear_config_cache():
+    _root_cache.clear()
+    _config_cache.clear()
+
+
+# returns the path of one of the working files of the tag root at root_dir
+# (see TAGSTATE_DIRNAME), making their directory the first time
+def state_path(root_dir, filename):
+    state_dir = os.path.join(root_dir, TAGSTATE_DIRNAME)
+    os.makedirs(state_dir, exist_ok=True)
+    return os.path.join(state_dir, filename)
+
+
+# memoized version of find_above(path, TAGDIR_FILENAME)
+# every directory visited on the way up shares the result
+def _find_root(path):
+    # relative paths depend on the CWD, so aren't worth caching
+    if not os.path.isabs(path):
+        return find_above(path, TAGDIR_FILENAME)
+
+    visited = []
+
+    while path not in _root_cache:
+        visited.append(path)
+        if os.path.isfile(os.path.join(path, TAGDIR_FILENAME)):
+            root_dir = path
+            break
+        elif not path or path == "/":
+            root_dir = ""
+            break
+        path = os.path.dirname(path)
+    else:
+        root_dir = _root_cache[path]
+
+    for p in visited:
+        _root_cache[p] = root_dir
+
+    return root_dir
+
+
+# returns every tag root found for the given directories, sorted:
+# the root each one is in, and all the roots nested anywhere below it
+def find_roots(paths):
+    roots = set()
+
+    for path in paths:
+        path = os.path.abspath(path)
+        root_dir = _find_root(path)
+        if root_dir:
+            roots.add(root_dir)
+
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = [ d for d in dirnames if not d.startswith(".") ]
+            if TAGDIR_FILENAME in filenames:
+                roots.add(dirpath)
+
+    return sorted(roots)
+
+
+# returns the mtime of the .tagdir file in root_dir, or None if there isn't one
+def _tagdir_mtime(root_dir):
+    try:
+        return os.stat(os.path.join(root_dir, TAGDIR_FILENAME)).st_mtime_ns
+    except OSError:
+        return None
+
+
+# returns the config for the given path
+# Configs are cached per root directory and set of overrides, and are only
+# re-read when the .tagdir file changes. The returned dict is shared between
+# callers, and must be treated as read-only.
 def get_config(path="", overrides={}):
-    config = DEFAULT_CONFIG.copy()
 
     # pick a root directory
     # if no path is specified, use the CWD
@@ -43,16 +136,44 @@ def get_config(path="", overrides={}):
     if not path:
         path = os.path.abspath(".")
 
-    config["root_dir"] = find_above(path, TAGDIR_FILENAME)
+    root_dir = _find_root(path)
+    mtime = _tagdir_mtime(root_dir) if root_dir else None
+
+    # the .tagdir file went away, so the cached roots can't be trusted
+    if root_dir and mtime is None:
+        _root_cache.clear()
+        root_dir = _find_root(path)
+        mtime = _tagdir_mtime(root_dir) if root_dir else None
+
+    if not root_dir:
+        root_dir = os.path.abspath(".")
 
-    if not config["root_dir"]:
-        config["root_dir"] = os.path.abspath(".")
+    try:
+        key = (root_dir, frozenset(overrides.items()))
+    except TypeError:
+        key = None # unhashable overrides, skip the cache
 
+    if key in _config_cache and _config_cache[key][0] == mtime:
+        return _config_cache[key][1]
+
+    config = load_config(root_dir, overrides)
+
+    if key is not None:
+        _config_cache[key] = (mtime, config)
+
+    return config
+
+
+# reads the .tagdir file in root_dir, and applies the given overrides
+def load_config(root_dir, overrides={}):
+    config = DEFAULT_CONFIG.copy()
+    config["root_dir"] = root_dir
 
     if config["root_dir"] != "":
         # load the config
+        import configparser
 
-        parser = configparser.SafeConfigParser()
+        parser = configparser.ConfigParser()
         parser.read(os.path.join(config["root_dir"], TAGDIR_FILENAME))
 
         if TAGDIR_SECTION in parser:
@@ -63,6 +184,19 @@ def get_config(path="", overrides={}):
             config["default_delim"]    = c.get("default_delim",         config["default_delim"])
             config["no_tags_filename"] = c.get("no_tags_filename",      config["no_tags_filename"])
             config["case_sensitive"]   = c.getboolean("case_sensitive", config["case_sensitive"])
+            config["use_index"]        = c.getboolean("use_index",      config["use_index"])
+            config["use_daemon"]       = c.getboolean("use_daemon",     config["use_daemon"])
+            config["walk_concurrency"] = c.getint("walk_concurrency",   config["walk_concurrency"])
+            config["use_dir_cache"]    = c.getboolean("use_dir_cache",  config["use_dir_cache"])
+
+        views = []
+        for section in parser.sections():
+            if section.startswith(VIEW_SECTION_PREFIX):
+                name = section[len(VIEW_SECTION_PREFIX):].strip()
+                c = parser[section]
+                link_dir = c.get("link_dir", os.path.join(config["symlink_dir"], name))
+                views.append((name, c.get("selectors", ""), link_dir, c.getboolean("nocase", False)))
+        config["views"] = tuple(views)
 
     # process any commandline overrides we were given
     config.update(overrides)
@@ -72,4 +206,7 @@ def get_config(path="", overrides={}):
     # make tag_delims an actual regex
     config["tag_delims"] = "[" + re.escape(config["tag_delims"]) + "]"
 
+    # compiled tag matching, shared by everything using this config
+    config["matcher"] = TagMatcher(config["tag_delims"], config["case_sensitive"])
+
     return config
@@ -0,0 +1,441 @@
+
+import os
+import json
+import errno
+import time
+import socket
+import selectors
+import struct
+import threading
+
+from .config import TAGDIR_FILENAME, clear_config_cache
+from .matcher import TagMatcher
+from .select import Operation, evaluate
+
+
+# the name of the daemon's socket, stored next to the .tagdir file
+TAGDAEMON_SOCKET = ".tagdaemon"
+
+# seconds between full rescans of the tree (the fallback for when inotify
+# is unavailable, or has dropped events)
+RECONCILE_INTERVAL = 300
+
+# inotify constants, from <sys/inotify.h>
+IN_MOVED_FROM  = 0x00000040
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_DELETE      = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW  = 0x00004000
+IN_IGNORED     = 0x00008000
+IN_ONLYDIR     = 0x01000000
+IN_ISDIR       = 0x40000000
+
+WATCH_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_ONLYDIR
+
+EVENT_HEADER = struct.Struct("iIII") # wd, mask, cookie, len
+
+
+
+class TagState:
+    """
+    In-memory tag -> files map for a tree, which can be updated one file
+    or directory at a time. Like the Index, tags are stored case sensitively,
+    and directory tags are kept apart from filename tags.
+    """
+
+    def __init__(self, root_dir, tag_delims):
+        self.root_dir = root_dir
+        self.matcher  = TagMatcher(tag_delims, case_sensitive=True)
+        self.nocase   = TagMatcher(tag_delims, case_sensitive=False)
+        self.clear()
+
+
+    def clear(self):
+        self.dirs          = {} # relative dir -> tags of the whole path
+        self.files         = {} # relative dir -> set of filenames
+        self.name_postings = {} # tag -> set of relative file paths
+        self.dir_postings  = {} # tag -> set of relative dirs
+        self.lower         = {} # lowercased tag -> set of tags
+
+
+    def _post(self, postings, tag, item):
+        postings.setdefault(tag, set()).add(item)
+        self.lower.setdefault(tag.lower(), set()).add(tag)
+
+
+    def _unpost(self, postings, tag, item):
+        s = postings.get(tag)
+        if s is not None:
+            s.discard(item)
+            if not s:
+                del postings[tag]
+
+
+    def add_file(self, rel_dir, name):
+        if rel_dir not in self.files or name.startswith("."):
+            return
+        self.files[rel_dir].add(name)
+        for tag in self.matcher.tokenize(os.path.splitext(name)[0]):
+            self._post(self.name_postings, tag, os.path.join(rel_dir, name))
+
+
+    def remove_file(self, rel_dir, name):
+        if name not in self.files.get(rel_dir, ()):
+            return
+        self.files[rel_dir].discard(name)
+        for tag in self.matcher.tokenize(os.path.splitext(name)[0]):
+            self._unpost(self.name_postings, tag, os.path.join(rel_dir, name))
+
+
+    def add_dir(self, rel, on_dir=None):
+        """
+        adds a directory, and everything under it. on_dir(rel) is called
+        for each directory before it is listed (to set up watches).
+        """
+
+        name = os.path.basename(rel)
+        if name.startswith("."):
+            return
+
+        parent = self.dirs.get(os.path.dirname(rel), frozenset()) if rel else frozenset()
+        tags = parent | self.matcher.tokenize(name)
+
+        self.dirs[rel] = tags
+        self.files.setdefault(rel, set())
+        for tag in tags:
+            self._post(self.dir_postings, tag, rel)
+
+        if on_dir is not None:
+            on_dir(rel)
+
+        try:
+            entries = list(os.scandir(os.path.join(self.root_dir, rel)))
+        except OSError:
+            return
+
+        for e in entries:
+            if e.is_dir(follow_symlinks=False):
+                self.add_dir(os.path.join(rel, e.name), on_dir)
+            elif e.is_file(follow_symlinks=False):
+                self.add_file(rel, e.name)
+
+
+    def remove_dir(self, rel):
+        """ removes a directory, and everything under it """
+        prefix = rel + os.sep
+        for d in [ d for d in self.dirs if d == rel or d.startswith(prefix) ]:
+            for name in list(self.files.get(d, ())):
+                self.remove_file(d, name)
+            for tag in self.dirs[d]:
+                self._unpost(self.dir_postings, tag, d)
+            del self.dirs[d]
+            del self.files[d]
+
+
+    def _spanning_postings(self, tag, case_sensitive, use_dirs):
+        # such tags are never tokenized into the postings, so every file
+        # name (and directory path) is checked, as Filename.has_tag() would
+        has_tag = (self.matcher if case_sensitive else self.nocase).has_tag
+        files = set()
+
+        for d, names in self.files.items():
+            if use_dirs and has_tag(d, tag):
+                files.update(os.path.join(d, name) for name in names)
+            else:
+                files.update(os.path.join(d, name) for name in names
+                                                   if has_tag(os.path.splitext(name)[0], tag))
+
+        return files
+
+
+    def postings(self, tag, case_sensitive=True, use_dirs=True):
+        """ returns the set of relative file paths bearing the given tag """
+        if self.matcher.split_re.search(tag):
+            return self._spanning_postings(tag, case_sensitive, use_dirs)
+
+        tags = [tag] if case_sensitive else self.lower.get(tag.lower(), ())
+        files = set()
+
+        for t in tags:
+            files.update(self.name_postings.get(t, ()))
+            if use_dirs:
+                for d in self.dir_postings.get(t, ()):
+                    files.update(os.path.join(d, name) for name in self.files[d])
+
+        return files
+
+
+    def count(self, tag, case_sensitive=True, use_dirs=True):
+        """ returns the number of files bearing the given tag, without collecting them """
+        if self.matcher.split_re.search(tag):
+            return len(self._spanning_postings(tag, case_sensitive, use_dirs))
+
+        tags = [tag] if case_sensitive else self.lower.get(tag.lower(), ())
+        n = 0
+
+        for t in tags:
+            n += len(self.name_postings.get(t, ()))
+            if use_dirs:
+                n += sum(len(self.files[d]) for d in self.dir_postings.get(t, ()))
+
+        return n
+
+
+    def total(self):
+        """ returns the number of files """
+        return sum(len(names) for names in self.files.values())
+
+
+    def universe(self, under=""):
+        """ returns the set of all relative file paths, or only those in the given relative dir """
+        if under in ("", "."):
+            dirs = self.files.items()
+        else:
+            prefix = under + os.sep
+            dirs = [ (d, names) for d, names in self.files.items() if d == under or d.startswith(prefix) ]
+        return set(os.path.join(d, name) for d, names in dirs for name in names)
+
+
+    def select(self, operations, case_sensitive=True, use_dirs=True, aliases=None):
+        return evaluate(operations,
+                        lambda tag: self.postings(tag, case_sensitive, use_dirs),
+                        self.universe,
+                        lambda tag: self.count(tag, case_sensitive, use_dirs),
+                        self.total(),
+                        aliases)
+
+
+
+class Inotify:
+    """ Minimal ctypes binding to Linux inotify """
+
+    def __init__(self):
+        # only the daemon itself needs ctypes, the clients don't
+        import ctypes, ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1() failed")
+
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.fd, selectors.EVENT_READ)
+
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        import ctypes
+
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_add_watch() failed", path)
+        return wd
+
+
+    def read_events(self, timeout):
+        """ yields (wd, mask, name) for every event within the timeout """
+        if not self.selector.select(timeout):
+            return
+
+        try:
+            buf = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return
+
+        i = 0
+        while i < len(buf):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(buf, i)
+            i += EVENT_HEADER.size
+            name = os.fsdecode(buf[i:i + length].rstrip(b"\0"))
+            i += length
+            yield (wd, mask, name)
+
+
+    def close(self):
+        self.selector.close()
+        os.close(self.fd)
+
+
+
+class TagDaemon:
+    """
+    Keeps a TagState up to date for a tag root, and answers queries for it
+    over a Unix socket. Changes are picked up through inotify, with a full
+    rescan every reconcile_interval seconds as a fallback.
+    """
+
+    def __init__(self, config, reconcile_interval=RECONCILE_INTERVAL):
+        self.config   = config
+        self.root_dir = os.path.abspath(config["root_dir"])
+        self.socket   = os.path.join(self.root_dir, TAGDAEMON_SOCKET)
+        self.state    = TagState(self.root_dir, config["tag_delims"])
+        self.lock     = threading.Lock()
+        self.running  = False
+        self.reconcile_interval = reconcile_interval
+
+        try:
+            self.inotify = Inotify()
+        except (OSError, AttributeError):
+            self.inotify = None # no inotify on this platform, rescan only
+
+        self.watches = {} # wd -> relative dir
+
+
+    def _watch(self, rel):
+        if self.inotify is not None:
+            try:
+                self.watches[self.inotify.add_watch(os.path.join(self.root_dir, rel))] = rel
+            except OSError:
+                pass
+
+
+    def reconcile(self):
+        """ rebuilds the state from a full scan of the tree """
+        state = TagState(self.root_dir, self.config["tag_delims"])
+        self.watches.clear()
+        state.add_dir("", self._watch)
+        with self.lock:
+            self.state = state
+
+
+    def handle_event(self, wd, mask, name):
+        if mask & IN_Q_OVERFLOW:
+            self.reconcile()
+            return
+
+        if mask & IN_IGNORED:
+            self.watches.pop(wd, None)
+            return
+
+        rel_dir = self.watches.get(wd)
+        if rel_dir is None or not name:
+            return
+
+        # a .tagdir coming or going moves the dirs below it to another root,
+        # which get_config() would otherwise keep answering from its cache
+        if name == TAGDIR_FILENAME:
+            clear_config_cache()
+
+        rel = os.path.join(rel_dir, name)
+
+        with self.lock:
+            if mask & IN_ISDIR:
+                if mask & (IN_DELETE | IN_MOVED_FROM):
+                    self.state.remove_dir(rel)
+                elif mask & (IN_CREATE | IN_MOVED_TO):
+                    self.state.add_dir(rel, self._watch)
+            else:
+                if mask & (IN_DELETE | IN_MOVED_FROM):
+                    self.state.remove_file(rel_dir, name)
+                elif mask & (IN_CREATE | IN_MOVED_TO):
+                    self.state.add_file(rel_dir, name)
+
+
+    def query(self, request):
+        """ answers a single request (see daemon_request()) """
+        if request.get("ping"):
+            return { "files": [] }
+
+        with self.lock:
+            if "select" in request:
+                ops = [ Operation(tag, type) for tag, type in request["select"] ]
+                files = self.state.select(ops,
+                                          request.get("case_sensitive", True),
+                                          request.get("use_dirs", True),
+                                          request.get("aliases"))
+            else:
+                files = self.state.universe(request.get("under", ""))
+
+        return { "files": sorted(files) }
+
+
+    def watch_loop(self):
+        last = time.monotonic()
+        while self.running:
+            if self.inotify is not None:
+                for event in self.inotify.read_events(0.5):
+                    self.handle_event(*event)
+            else:
+                time.sleep(0.5)
+
+            if time.monotonic() - last > self.reconcile_interval:
+                self.reconcile()
+                last = time.monotonic()
+
+
+    def serve_forever(self):
+        import socketserver
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    response = daemon.query(json.loads(line.decode()))
+                    self.wfile.write(json.dumps(response).encode() + b"\n")
+
+        # a socket left behind by a crashed daemon is replaced,
+        # but a live daemon keeps its socket
+        if os.path.exists(self.socket):
+            if daemon_ping(self.config):
+                raise OSError(errno.EADDRINUSE, "a daemon is already running", self.socket)
+            os.unlink(self.socket)
+
+        self.reconcile()
+        self.running = True
+        watcher = threading.Thread(target=self.watch_loop, daemon=True)
+        watcher.start()
+
+        self.server = socketserver.ThreadingUnixStreamServer(self.socket, Handler)
+        self.server.daemon_threads = True
+
+        try:
+            self.server.serve_forever()
+        finally:
+            self.running = False
+            self.server.server_close()
+            os.unlink(self.socket)
+
+
+    def shutdown(self):
+        self.server.shutdown()
+
+
+
+# sends a request to the daemon for the given config's root
+# returns the absolute paths in the response, or None if no daemon is running
+def daemon_request(config, request):
+    root_dir = os.path.abspath(config["root_dir"])
+    path = os.path.join(root_dir, TAGDAEMON_SOCKET)
+
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.connect(path)
+            s.sendall(json.dumps(request).encode() + b"\n")
+            with s.makefile("rb") as f:
+                response = json.loads(f.readline().decode())
+    except (OSError, ValueError):
+        return None
+
+    return [ os.path.join(root_dir, f) for f in response["files"] ]
+
+
+# selects files through the daemon, or returns None if no daemon is running
+def daemon_select(operations, config, aliases=None):
+    return daemon_request(config, {
+        "select"         : [ list(op) for op in operations ],
+        "case_sensitive" : config["case_sensitive"],
+        "use_dirs"       : config["use_dirs"],
+        "aliases"        : aliases or {},
+    })
+
+
+# returns whether a daemon is answering for the given config's root
+# (without having it send back any files)
+def daemon_ping(config):
+    return daemon_request(config, { "ping": True }) is not None
@@ -0,0 +1,116 @@
+
+import os
+import json
+import time
+import fcntl
+
+from .utils import dirs_at, MTIME_SLACK
+
+
+# the name of the directory cache file, stored next to the .tagdir file
+TAGDIRCACHE_FILENAME = ".tagdircache"
+
+
+
+class DirCache:
+    """
+    On-disk cache of the subdirectory names of the directories under a tag
+    root, along with the tags of each name. An entry is used for as long as
+    its directory keeps the same inode and mtime, so looking a directory up
+    costs one stat, rather than listing every file in it.
+
+    The tags are only kept for the tag_delims and case_sensitive settings
+    they were tokenized with. Directories modified within MTIME_SLACK of
+    being listed aren't trusted to keep their mtime, and aren't cached.
+    """
+
+    def __init__(self, config, list_dirs=dirs_at):
+        self.root_dir  = config["root_dir"]
+        self.path      = os.path.join(self.root_dir, TAGDIRCACHE_FILENAME)
+        self.matcher   = config["matcher"]
+        self.settings  = [config["tag_delims"], config["case_sensitive"]]
+        self.list_dirs = list_dirs
+        self.entries   = {} # relative path -> [inode, mtime, names, tags]
+        self.listed    = 0  # directories listed (rather than found in the cache)
+        self.dirty     = False
+
+        try:
+            with open(self.path) as f:
+                fcntl.flock(f, fcntl.LOCK_SH) # not while save() is writing it
+                data = json.load(f)
+            if data["settings"] == self.settings:
+                self.entries = data["dirs"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass # missing or unreadable, so start over
+
+
+    def _entry(self, path):
+        """ returns the valid cache entry for a directory, listing it if need be """
+        rel = os.path.relpath(path, self.root_dir)
+        st = os.stat(path)
+
+        entry = self.entries.get(rel)
+        if entry is not None and entry[0] == st.st_ino and entry[1] == st.st_mtime_ns:
+            return entry
+
+        names = self.list_dirs(path)
+        self.listed += 1
+
+        # forget the subtrees of the directories that have gone away
+        if entry is not None:
+            for d in set(entry[2]).difference(names):
+                self._forget(os.path.normpath(os.path.join(rel, d)))
+
+        entry = [st.st_ino, st.st_mtime_ns, names, [ sorted(self.matcher.tokenize(d)) for d in names ]]
+
+        # don't trust mtimes that might still change within their tick
+        if time.time() - st.st_mtime > MTIME_SLACK:
+            self.entries[rel] = entry
+            self.dirty = True
+        elif rel in self.entries:
+            del self.entries[rel]
+            self.dirty = True
+
+        return entry
+
+
+    def _forget(self, rel):
+        prefix = rel + os.sep
+        for r in [ r for r in list(self.entries) if r == rel or r.startswith(prefix) ]:
+            del self.entries[r]
+            self.dirty = True
+
+
+    def dirs_at(self, path):
+        """ lists only directories at the given path """
+        return list(self._entry(path)[2])
+
+
+    def listdir(self, path):
+        """ the walker's view of a directory (see walker.LocalFS), without its files """
+        return self.dirs_at(path), [], []
+
+
+    def tags(self, path, names):
+        """ returns the tagsets of the given subdirectory names of path """
+        entry = self.entries.get(os.path.relpath(path, self.root_dir))
+        if entry is None or entry[2] != names:
+            return [ self.matcher.tokenize(d) for d in names ]
+        return [ frozenset(tags) for tags in entry[3] ]
+
+
+    def save(self):
+        """ writes the cache back, if anything in it changed """
+        if not self.dirty:
+            return
+
+        # rewritten in place: renaming a new file over it would change the
+        # mtime of the root, and throw away its own entry every time. The
+        # file is locked first, so concurrent taggers take turns writing it,
+        # and readers never see it half written.
+        with open(self.path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            f.truncate()
+            json.dump({ "settings": self.settings, "dirs": self.entries }, f)
+        self.dirty = False
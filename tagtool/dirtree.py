@@ -0,0 +1,220 @@
+
+import os
+
+from .utils import dirs_at
+
+
+class DirSnapshot:
+    """
+    In-memory snapshot of the directory tree. Each directory is listed at
+    most once, no matter how many files are placed into it.
+
+    With a "walk_concurrency" above 1, the directories a DirTree is about to
+    search are listed all at once by the asyncio walker (through fs, if
+    given), rather than one round trip after another.
+
+    With "use_dir_cache", directories are looked up in the root's DirCache,
+    and only listed if they changed since they were cached. Call save() to
+    write the caches back.
+    """
+
+    def __init__(self, list_dirs=dirs_at, fs=None):
+        self.list_dirs = list_dirs
+        self.fs     = fs
+        self.dirs   = {} # absolute path -> list of subdirectory names
+        self.trees  = {} # (root_dir, matcher) -> DirTree
+        self.caches = {} # (root_dir, matcher) -> DirCache
+
+
+    def dirs_at(self, path, cache=None):
+        """ lists only directories at the given path """
+        path = os.path.normpath(path)
+        if path not in self.dirs:
+            list_dirs = self.list_dirs if cache is None else cache.dirs_at
+            self.dirs[path] = list_dirs(path)
+        return self.dirs[path]
+
+
+    def cache(self, config):
+        """ returns the DirCache of the config's root, or None if it isn't used """
+        if not config["use_dir_cache"]:
+            return None
+
+        from .dircache import DirCache
+
+        key = (config["root_dir"], config["matcher"])
+        if key not in self.caches:
+            self.caches[key] = DirCache(config, self.list_dirs)
+        return self.caches[key]
+
+
+    def save(self):
+        """ writes back the DirCaches that changed """
+        for cache in self.caches.values():
+            cache.save()
+
+
+    def prefetch(self, paths, concurrency, cache=None):
+        """ lists the given directories at once, ahead of dirs_at() asking for them """
+        paths = set(os.path.normpath(p) for p in paths)
+        paths = [ p for p in paths if p not in self.dirs ]
+
+        if len(paths) < 2:
+            return # nothing to overlap
+
+        from .walker import read_dirs
+        fs = self.fs if cache is None else cache
+        for path, (dirs, files, links) in read_dirs(paths, fs, concurrency, recursive=False).items():
+            self.dirs[path] = dirs
+
+
+    def prefetcher(self, config):
+        """ returns the prefetch function for a DirTree, or None to list lazily """
+        concurrency = config["walk_concurrency"]
+        if concurrency <= 1:
+            return None
+        cache = self.cache(config)
+        return lambda paths: self.prefetch(paths, concurrency, cache)
+
+
+    def add_dir(self, path):
+        """ records a directory that was created after the snapshot was taken """
+        path = os.path.normpath(path)
+        parent, name = os.path.split(path)
+
+        if parent in self.dirs and name not in self.dirs[parent]:
+            self.dirs[parent].append(name)
+
+        self.dirs.setdefault(path, [])
+
+        # the tag trees are built from the listings, and need rebuilding
+        self.trees.clear()
+
+
+    def subtree(self, config, path):
+        """ returns a new DirTree of the directories under path, built from this snapshot """
+        cache = self.cache(config)
+        list_dirs = self.dirs_at if cache is None else (lambda p: self.dirs_at(p, cache))
+        return DirTree(path, config["matcher"], list_dirs, self.prefetcher(config), cache)
+
+
+    def tree(self, config):
+        """ returns the DirTree for the given config, built from this snapshot """
+        key = (config["root_dir"], config["matcher"])
+        if key not in self.trees:
+            self.trees[key] = self.subtree(config, config["root_dir"])
+        return self.trees[key]
+
+
+
+class DirNode:
+    """ A single directory, annotated with the tags in its name """
+
+    __slots__ = ("path", "tags", "order", "_children", "_by_tag", "_untagged")
+
+    def __init__(self, path, tags, order=0):
+        self.path      = path
+        self.tags      = tags  # frozenset
+        self.order     = order # position in the parent's directory listing
+        self._children = None
+
+
+    def load(self, tree):
+        """ lists the subdirectories of this node (only once) """
+        if self._children is not None:
+            return
+
+        self._children = []
+        self._by_tag   = {} # tag -> children bearing that tag
+        self._untagged = [] # children whose names carry no tags
+
+        names = tree.list_dirs(self.path)
+
+        if tree.cache is not None:
+            tags = tree.cache.tags(self.path, names)
+        else:
+            tags = [ tree.matcher.tokenize(d) for d in names ]
+
+        for i, d in enumerate(names):
+            child = DirNode(os.path.join(self.path, d), tags[i], i)
+            self._children.append(child)
+
+            if not child.tags:
+                self._untagged.append(child)
+
+            for t in child.tags:
+                self._by_tag.setdefault(t, []).append(child)
+
+
+    def candidates(self, tree, tags):
+        """ returns the children whose tags are all in the given tagset """
+        self.load(tree)
+
+        found = list(self._untagged)
+        seen = set()
+
+        # only look at the children that share at least one tag
+        for t in tags:
+            for child in self._by_tag.get(t, ()):
+                if child not in seen and child.tags <= tags:
+                    seen.add(child)
+                    found.append(child)
+
+        # keep the order of the directory listing
+        found.sort(key=lambda c: c.order)
+
+        # read the directories that are about to be searched all at once
+        if tree.prefetch is not None:
+            tree.prefetch([ c.path for c in found if c._children is None ])
+
+        return found
+
+
+
+class DirTree:
+    """
+    Trie of the directories under a root, each annotated with its tagset.
+    Directories are listed lazily, and best-path results are memoized on
+    (directory, remaining tags), so placing many files with similar tags
+    only explores each relevant subtree once.
+    """
+
+    def __init__(self, root_dir, matcher, list_dirs=dirs_at, prefetch=None, cache=None):
+        self.matcher   = matcher
+        self.list_dirs = list_dirs
+        self.prefetch  = prefetch  # lists several directories at once, ahead of list_dirs
+        self.cache     = cache     # DirCache with the tags of the directory names
+        self.root      = DirNode(root_dir, frozenset())
+        self.memo      = {} # (DirNode, frozenset) -> (path, frozenset)
+
+
+    def find_best_path(self, tags, node=None):
+        """
+        determines the directory path that encodes the most of the given
+        tagset. Returns the path, and the tags that weren't encoded.
+        """
+
+        if node is None:
+            node = self.root
+
+        tags = frozenset(tags)
+        key = (node, tags)
+
+        if key in self.memo:
+            return self.memo[key]
+
+        best = (node.path, tags) # goal is to minimize len() of the tags
+
+        if tags:
+            # only directories containing just the tags we're looking for
+            for child in node.candidates(self, tags):
+                r = self.find_best_path(tags - child.tags, child)
+
+                # check to see if a better score was achieved
+                if len(r[1]) < len(best[1]):
+                    best = r
+                    if not best[1]:
+                        break # can't do any better
+
+        self.memo[key] = best
+        return best
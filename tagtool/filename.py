@@ -1,32 +1,66 @@
 
-import re
 import os
+import sys
 from .config import get_config
 from .utils import *
 
 
 class Filename:
-    """ Class for manipulating filenames in a tag-based fashion """
+    """
+    Class for manipulating filenames in a tag-based fashion
 
-    def __init__(self, filestr, overrides={}):
-        # ensure that paths are always absolute
+    Kept small, since there can be one of these for every file in a tree.
+    The config, and the path relative to the root dir, are only looked up
+    the first time they're needed.
+    """
+
+    __slots__ = ("filestr", "name", "ext", "_parent", "_overrides", "_config", "_dirs")
+
+    # a config already loaded for the file's tag root can be given instead of
+    # overrides, and is used as-is
+    def __init__(self, filestr, overrides={}, config=None):
+        # ensure that paths are always absolute, and normalized
+        # (abspath also collapses ".." and "//" in absolute paths)
         filestr = os.path.abspath(filestr)
 
         # save a copy of the original path
         self.filestr = filestr
 
         # split out the dirs, the filename, and the extension
-        self.dirs, filestr  = os.path.split(filestr)
+        # many files share a parent dir, so only keep one copy of it
+        parent, filestr     = os.path.split(filestr)
+        self._parent        = sys.intern(parent)
         self.name, self.ext = os.path.splitext(filestr)
 
+        self._overrides = overrides
+        self._config    = config
+        self._dirs      = None
+
+
+    @property
+    def config(self):
         # load the config for this file
         # considers .tagdir rules, and then any overrides given in "overrides"
-        self.config = get_config(self.dirs, overrides)
+        if self._config is None:
+            self._config = get_config(self._parent, self._overrides)
+        return self._config
 
-        # if dirs are being used, do NOT consider the path
-        # to the root tag directory
-        if self.config["use_dirs"]:
-            self.dirs = os.path.relpath(self.dirs, self.config["root_dir"])
+
+    @property
+    def dirs(self):
+        if self._dirs is None:
+            # if dirs are being used, do NOT consider the path
+            # to the root tag directory
+            if self.config["use_dirs"]:
+                self._dirs = os.path.relpath(self._parent, self.config["root_dir"])
+            else:
+                self._dirs = self._parent
+        return self._dirs
+
+
+    @dirs.setter
+    def dirs(self, dirs):
+        self._dirs = dirs
 
 
     def __str__(self):
@@ -67,7 +101,9 @@ class Filename:
         return False
 
 
-    def add_remove_tags(self, add_tags, remove_tags):
+    # a DirSnapshot can be given, to share directory listings and placement
+    # results between many files
+    def add_remove_tags(self, add_tags, remove_tags, snapshot=None):
         # remove the requested tags
         for tag in remove_tags:
             self._remove(tag)
@@ -79,7 +115,7 @@ class Filename:
         # reposition the file in the tree, favoring tags
         # in the form of directory names
         if self.config["use_dirs"]:
-            self._resolve_dirs()
+            self._resolve_dirs(snapshot)
 
         if self.name == "":
             self.name = self.config["no_tags_filename"]
@@ -93,24 +129,12 @@ class Filename:
 
     # searches for a tag in an arbitrary string
     def _raw_has_tag(self, s, tag):
-
-        flags = 0 if self.config["case_sensitive"] else re.IGNORECASE
-
-        #           (^|[ .,_-])tag($|[ .,_-])
-        pattern  = "(^|" + self.config["tag_delims"] + ")" + \
-                    tag + \
-                    "($|" + self.config["tag_delims"] + ")"
-        return re.search(pattern, s, flags) != None
+        return self.config["matcher"].has_tag(s, tag)
 
 
     # returns the tagset for an arbitrary string
     def _raw_get_tags(self, s):
-        tags = set(re.split(self.config["tag_delims"], s))
-
-        if not self.config["case_sensitive"]:
-            tags = set([x.lower() for x in tags])
-
-        return set(filter(bool, tags)) # strain out empty strings
+        return set(self.config["matcher"].tokenize(s))
 
 
     def _add(self, tag):
@@ -131,35 +155,14 @@ class Filename:
     def _remove(self, tag):
         """ remove tags from the file """
 
-        flags = 0 if self.config["case_sensitive"] else re.IGNORECASE
-
-        if not self.config["case_sensitive"]:
-            tag = tag.lower()
-
-        # Hard to combine these into one regex because python complains about not
-        # having fixed a length look-behind. Look-behind is necessary to prevent
-        # the leading delimeter from being eaten.
-
-        # WARNING: the order here is important. Deleting tags from the front or the
-        # back will cause inner tags to become front or back tags. This causes
-        # problems if there are two of the same tag adjacent to one-another.
-        mid_pattern   = ("(?<=%s)" % self.config["tag_delims"]) + \
-                        tag + \
-                        self.config["tag_delims"]
-
-        #                (^|[ .,_-])tag($|[ .,_-])
-        edge_pattern  = "(^|" + self.config["tag_delims"] + ")" + \
-                        tag + \
-                        "($|" + self.config["tag_delims"] + ")"
+        matcher = self.config["matcher"]
 
         # erase any tag instances from the name
-        self.name = re.sub(mid_pattern, "", self.name, flags=flags)
-        self.name = re.sub(edge_pattern, "", self.name, flags=flags)
+        self.name = matcher.remove(self.name, tag)
 
         # remove tags from the dirs
         if self.config["use_dirs"]:
-            self.dirs = re.sub(mid_pattern, "", self.dirs, flags=flags)
-            self.dirs = re.sub(edge_pattern, "", self.dirs, flags=flags)
+            self.dirs = matcher.remove(self.dirs, tag)
 
 
 
@@ -167,11 +170,11 @@ class Filename:
     # Sinks a file back down the directory tree, according to its tags
     # Directories are favored as tag storage. Also handles deletion of tags
     # from dir names carrying multiple tags
-    def _resolve_dirs(self):
+    def _resolve_dirs(self, snapshot=None):
         tags = self.get_tags()
 
         # recurse to find the best directory path for this tagset
-        path, remaining_tags = self._find_best_path(self.config["root_dir"], tags)
+        path, remaining_tags = self._find_best_path(self.config["root_dir"], tags, snapshot)
 
         # find out which tags were handled by directories
         # and remove them from the filename
@@ -188,9 +191,16 @@ class Filename:
             self._add(tag)
 
 
-    # recursive function that determines the filepath that encodes the most
-    # of the given tagset.
-    def _find_best_path(self, path, tags):
+    # determines the filepath that encodes the most of the given tagset.
+    # A shared snapshot answers from its memoized DirTree (see
+    # DirTree.find_best_path()). A single placement searches the
+    # directories directly, which is cheaper than building a tree for it.
+    def _find_best_path(self, path, tags, snapshot=None):
+
+        if snapshot is not None:
+            if path == self.config["root_dir"]:
+                return snapshot.tree(self.config).find_best_path(tags)
+            return snapshot.subtree(self.config, path).find_best_path(tags)
 
         best_path = path
         best_tags_left = set(tags) # goal is to minimize len() for this
@@ -203,7 +213,7 @@ class Filename:
             # if the tags of the directory name are all tags that we're looking for
             if all([t in tags for t in d_tags]):
                 # we've found a valid dir to put the file in
-                
+
                 # prepare to recurse by removing the tags consumed by this dir name
                 next_tags = set(tags).difference(d_tags)
 
@@ -215,6 +225,6 @@ class Filename:
                     best_path      = r[0]
                     best_tags_left = r[1]
 
-            # skip directories that contain tags we AREN'T looking for 
+            # skip directories that contain tags we AREN'T looking for
 
         return (best_path, best_tags_left)
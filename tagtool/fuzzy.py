@@ -0,0 +1,266 @@
+
+import os
+import json
+from array import array
+
+from .config import state_path
+from .vocab import get_vocabulary, vocab_path
+
+
+# the name of the trigram index file, stored in the root's .tagtool directory
+TAGTRIGRAMS_FILENAME = ".tagtrigrams"
+
+# the edit distance used when none is given
+FUZZY_DISTANCE = 1
+
+# pads the ends of a tag, so that every character is in three trigrams
+PAD = "\0\0"
+
+
+def trigrams(s):
+    """ returns the set of trigrams of a (padded) string """
+    s = PAD + s + PAD
+    return set(s[i:i + 3] for i in range(len(s) - 2))
+
+
+def edit_distance(a, b, k):
+    """
+    returns the Levenshtein distance between a and b, or k + 1 as soon as
+    it's certain to be larger than k. Only a band of width 2k + 1 around the
+    diagonal of the table is filled in.
+    """
+
+    if abs(len(a) - len(b)) > k:
+        return k + 1
+
+    big = k + 1
+    prev = [ j if j <= k else big for j in range(len(b) + 1) ]
+
+    for i in range(1, len(a) + 1):
+        lo = max(1, i - k)
+        hi = min(len(b), i + k)
+
+        row = [big] * (len(b) + 1)
+        row[0] = i if i <= k else big
+
+        for j in range(lo, hi + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            row[j] = min(prev[j - 1] + cost, prev[j] + 1, row[j - 1] + 1, big)
+
+        if min(row[lo - 1:hi + 1]) > k:
+            return big
+
+        prev = row
+
+    return prev[len(b)]
+
+
+
+class TrigramIndex:
+    """
+    Finds the tags within a small edit distance of a given string, without
+    comparing it against every tag. Each of k edits can destroy at most 3
+    of a string's trigrams, so only the tags sharing one of its 3k + 1
+    rarest trigrams need their edit distance checked. Strings too short for
+    that to rule anything out are compared against the tags of a similar
+    length instead.
+
+    Tags are compared case insensitively, so Vacation and vacation are at
+    distance 0 from each other.
+
+    Once built, the posting lists of every trigram are packed back to back
+    in one flat array, which is what gets saved to disk.
+    """
+
+    def __init__(self, tags=()):
+        self.keys     = []  # key ID -> lowercased tag
+        self.tags     = {}  # lowercased tag -> list of tags
+        self.grams    = {}  # trigram -> key IDs (a list, or a slice of self.postings)
+        self.lengths  = {}  # length -> list of key IDs
+        self.postings = array("I")
+
+        for tag in tags:
+            self.add(tag)
+
+        self.pack()
+
+
+    def __len__(self):
+        return sum(len(tags) for tags in self.tags.values())
+
+
+    def add(self, tag):
+        key = tag.lower()
+
+        if key in self.tags:
+            if tag not in self.tags[key]:
+                self.tags[key].append(tag)
+            return
+
+        self.tags[key] = [tag]
+        n = len(self.keys)
+        self.keys.append(key)
+        self.lengths.setdefault(len(key), []).append(n)
+
+        grams = self.grams
+        for g in trigrams(key):
+            ids = grams.get(g)
+            if ids is None:
+                grams[g] = [n]
+            elif type(ids) is list:
+                ids.append(n)
+            else:
+                grams[g] = list(ids) + [n] # a packed slice
+
+
+    def pack(self):
+        """ moves every posting list into self.postings """
+        postings = array("I")
+        for g, ids in self.grams.items():
+            start = len(postings)
+            postings.extend(ids)
+            self.grams[g] = (start, len(postings))
+
+        self.postings = postings
+        view = memoryview(postings)
+        self.grams = { g: view[start:end] for g, (start, end) in self.grams.items() }
+
+
+    def save(self, path):
+        grams   = sorted(self.grams)
+        offsets = [0]
+        for g in grams:
+            offsets.append(offsets[-1] + len(self.grams[g]))
+
+        tags = "\n".join("\t".join(self.tags[key]) for key in self.keys).encode()
+        header = { "grams": grams, "offsets": offsets, "tags_size": len(tags) }
+
+        # written to a temporary file first, so readers never see half of it
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(json.dumps(header).encode() + b"\n")
+            f.write(tags)
+            for g in grams:
+                f.write(self.grams[g].tobytes())
+        os.replace(tmp, path)
+
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+
+        with open(path, "rb") as f:
+            header = json.loads(f.readline().decode())
+            tags = f.read(header["tags_size"]).decode()
+            index.postings.frombytes(f.read())
+
+        for n, line in enumerate(tags.split("\n") if tags else []):
+            variants = line.split("\t")
+            key = variants[0].lower()
+            index.keys.append(key)
+            index.tags[key] = variants
+            index.lengths.setdefault(len(key), []).append(n)
+
+        view = memoryview(index.postings)
+        offsets = header["offsets"]
+        for i, g in enumerate(header["grams"]):
+            index.grams[g] = view[offsets[i]:offsets[i + 1]]
+
+        return index
+
+
+    def _candidates(self, key, k):
+        grams = trigrams(key)
+        needed = len(grams) - 3 * k
+
+        if needed <= 0:
+            for length in range(max(len(key) - k, 0), len(key) + k + 1):
+                yield from self.lengths.get(length, ())
+            return
+
+        # a tag sharing at least `needed` of the trigrams must share at least
+        # one of any len(grams) - needed + 1 of them, so only the rarest few
+        # posting lists need to be read
+        rarest = sorted(grams, key=lambda g: len(self.grams.get(g, ())))
+        candidates = set()
+        for g in rarest[:len(grams) - needed + 1]:
+            candidates.update(self.grams.get(g, ()))
+
+        yield from candidates
+
+
+    def search(self, s, k=FUZZY_DISTANCE):
+        """
+        returns a list of (tag, distance) for the tags within distance k of s,
+        closest first. Numbers, and strings of 3k characters or fewer, only
+        match themselves in a different case: one edit turns 2019 into 2018,
+        and "cat" into "car", without either being a typo.
+        """
+
+        key = s.lower()
+        results = []
+
+        if len(key) <= 3 * k or key.isdigit():
+            k = 0
+
+        for n in self._candidates(key, k):
+            d = edit_distance(key, self.keys[n], k)
+            if d <= k:
+                results.extend((tag, d) for tag in self.tags[self.keys[n]])
+
+        return sorted(results, key=lambda r: (r[1], r[0]))
+
+
+
+# returns the tag vocabulary and its trigram index for the given config
+# The index is saved in the root's .tagtool directory, and rebuilt whenever the
+# vocabulary has changed since.
+def get_trigram_index(config):
+    vocab = get_vocabulary(config)
+    path = state_path(config["root_dir"], TAGTRIGRAMS_FILENAME)
+
+    try:
+        if os.path.getmtime(path) >= os.path.getmtime(vocab_path(config)):
+            return vocab, TrigramIndex.load(path)
+    except (OSError, ValueError):
+        pass # missing or unreadable, so build it again
+
+    index = TrigramIndex(vocab.tags)
+    index.save(path)
+    return vocab, index
+
+
+# returns { tag: [tag, similar tags...] } for the tags of the operations,
+# for use as the aliases of a selection (see iter_select())
+def fuzzy_aliases(operations, index, k=FUZZY_DISTANCE):
+    aliases = {}
+    for op in operations:
+        similar = [ t for t, d in index.search(op.tag, k) if t != op.tag ]
+        aliases[op.tag] = [op.tag] + similar
+    return aliases
+
+
+# finds the tags that are probably misspellings of more common tags
+# returns a list of (tag, count, [(similar tag, count, distance)...]) for
+# each tag with a more common tag within distance k, most common first
+def merge_candidates(vocab, k=FUZZY_DISTANCE, index=None):
+    if index is None:
+        index = TrigramIndex(vocab.tags)
+
+    counts = vocab.counts
+    candidates = []
+
+    for tag in vocab.tags:
+        targets = [ (t, counts[t], d) for t, d in index.search(tag, k)
+                    if (counts[t], t) > (counts[tag], tag) ]
+
+        # a tie is only worth reporting if there is nothing more common
+        if any(n > counts[tag] for t, n, d in targets):
+            targets = [ (t, n, d) for t, n, d in targets if n > counts[tag] ]
+
+        if targets:
+            targets.sort(key=lambda t: (-t[1], t[2], t[0]))
+            candidates.append((tag, counts[tag], targets))
+
+    candidates.sort(key=lambda c: (-c[2][0][1], c[0]))
+    return candidates
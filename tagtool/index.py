@@ -0,0 +1,280 @@
+
+import os
+import time
+import sqlite3
+
+from .config import state_path
+from .select import INTERSECTION, INCLUSION, EXCLUSION, QueryPlan
+from .matcher import TagMatcher
+from .utils import MTIME_SLACK
+
+
+# the name of the index file, stored in the root's .tagtool directory
+TAGINDEX_FILENAME = ".tagindex"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    id     INTEGER PRIMARY KEY,
+    path   TEXT UNIQUE NOT NULL,
+    parent INTEGER,
+    mtime  INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    id   INTEGER PRIMARY KEY,
+    dir  INTEGER NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tags (
+    id   INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS file_tags (
+    tag  INTEGER NOT NULL,
+    file INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dir_tags (
+    tag INTEGER NOT NULL,
+    dir INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS dirs_parent     ON dirs(parent);
+CREATE INDEX IF NOT EXISTS files_dir       ON files(dir);
+CREATE INDEX IF NOT EXISTS tags_nocase     ON tags(name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS file_tags_tag   ON file_tags(tag);
+CREATE INDEX IF NOT EXISTS file_tags_file  ON file_tags(file);
+CREATE INDEX IF NOT EXISTS dir_tags_tag    ON dir_tags(tag);
+CREATE INDEX IF NOT EXISTS dir_tags_dir    ON dir_tags(dir);
+"""
+
+
+class Index:
+    """
+    Persistent inverted index of tag -> files, stored in a SQLite database
+    in the root's .tagtool directory (with the journals SQLite keeps next
+    to it). Tags are always stored case sensitively, and
+    directory tags are kept separately from filename tags, so that the same
+    index can answer queries for any "case_sensitive" or "use_dirs" setting.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.root_dir = os.path.abspath(config["root_dir"])
+        self.path = state_path(self.root_dir, TAGINDEX_FILENAME)
+        self.db = sqlite3.connect(self.path)
+        self.db.executescript(SCHEMA)
+
+        # the index always stores tags case sensitively
+        self.matcher = TagMatcher(config["tag_delims"], case_sensitive=True)
+
+        # for the tags spanning delimiters, which are matched against the paths
+        self.path_matcher = TagMatcher(config["tag_delims"], config["case_sensitive"])
+
+
+    def close(self):
+        self.db.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    def update(self):
+        """
+        Brings the index up to date with the tree. Every directory is stat()ed,
+        but only directories whose mtime changed since the last update are
+        actually listed and re-tokenized.
+        """
+
+        known = {}
+        for (id, path, mtime) in self.db.execute("SELECT id, path, mtime FROM dirs"):
+            known[path] = (id, mtime)
+
+        seen = set()
+        now = time.time()
+        stack = [("", None, set())] # (relative dir path, parent id, path tags)
+
+        with self.db:
+            while stack:
+                rel, parent, path_tags = stack.pop()
+                abs_path = os.path.join(self.root_dir, rel)
+
+                try:
+                    st = os.stat(abs_path)
+                except OSError:
+                    continue
+
+                # don't trust mtimes that might still change within their tick
+                mtime = st.st_mtime_ns if (now - st.st_mtime) > MTIME_SLACK else 0
+
+                if rel in known and known[rel][1] == mtime and mtime != 0:
+                    id = known[rel][0]
+                    children = [ r[0] for r in self.db.execute("SELECT path FROM dirs WHERE parent=?", (id,)) ]
+                    children = [ os.path.basename(c) for c in children ]
+                else:
+                    id = self._scan_dir(rel, parent, mtime, path_tags, known.get(rel))
+                    children = None
+
+                seen.add(rel)
+
+                if children is None:
+                    children = self._subdirs(abs_path)
+
+                for d in children:
+                    stack.append((os.path.join(rel, d), id, path_tags | self.matcher.tokenize(d)))
+
+            # forget directories that no longer exist
+            for path in set(known).difference(seen):
+                self._drop_dir(known[path][0])
+
+
+    # lists the (non-hidden) subdirectories of the given path
+    def _subdirs(self, path):
+        try:
+            return [ e.name for e in os.scandir(path)
+                     if e.is_dir(follow_symlinks=False) and not e.name.startswith(".") ]
+        except OSError:
+            return []
+
+
+    # (re)reads the files of a single directory into the index
+    def _scan_dir(self, rel, parent, mtime, path_tags, row):
+        if row is None:
+            cur = self.db.execute("INSERT INTO dirs (path, parent, mtime) VALUES (?, ?, ?)",
+                                  (rel, parent, mtime))
+            id = cur.lastrowid
+        else:
+            id = row[0]
+            self._drop_files(id)
+            self.db.execute("DELETE FROM dir_tags WHERE dir=?", (id,))
+            self.db.execute("UPDATE dirs SET parent=?, mtime=? WHERE id=?", (parent, mtime, id))
+
+        for tag in path_tags:
+            self.db.execute("INSERT INTO dir_tags (tag, dir) VALUES (?, ?)", (self._tag_id(tag), id))
+
+        try:
+            entries = list(os.scandir(os.path.join(self.root_dir, rel)))
+        except OSError:
+            entries = []
+
+        for e in entries:
+            if e.name.startswith(".") or not e.is_file(follow_symlinks=False):
+                continue
+
+            cur = self.db.execute("INSERT INTO files (dir, name) VALUES (?, ?)", (id, e.name))
+            file_id = cur.lastrowid
+
+            name = os.path.splitext(e.name)[0]
+            for tag in self.matcher.tokenize(name):
+                self.db.execute("INSERT INTO file_tags (tag, file) VALUES (?, ?)",
+                                (self._tag_id(tag), file_id))
+
+        return id
+
+
+    def _drop_files(self, dir_id):
+        self.db.execute("DELETE FROM file_tags WHERE file IN (SELECT id FROM files WHERE dir=?)", (dir_id,))
+        self.db.execute("DELETE FROM files WHERE dir=?", (dir_id,))
+
+
+    def _drop_dir(self, dir_id):
+        self._drop_files(dir_id)
+        self.db.execute("DELETE FROM dir_tags WHERE dir=?", (dir_id,))
+        self.db.execute("DELETE FROM dirs WHERE id=?", (dir_id,))
+
+
+    def _tag_id(self, tag):
+        r = self.db.execute("SELECT id FROM tags WHERE name=?", (tag,)).fetchone()
+        if r is not None:
+            return r[0]
+        return self.db.execute("INSERT INTO tags (name) VALUES (?)", (tag,)).lastrowid
+
+
+    def _spanning_postings(self, tag):
+        # such tags are never tokenized into the tables, so every file name
+        # (and directory path) is checked, as Filename.has_tag() would
+        files = set()
+        has_tag = self.path_matcher.has_tag
+
+        for id, path, name in self.db.execute("SELECT files.id, dirs.path, files.name FROM files " +
+                                              "JOIN dirs ON files.dir = dirs.id"):
+            if has_tag(os.path.splitext(name)[0], tag) or \
+               (self.config["use_dirs"] and has_tag(path, tag)):
+                files.add(id)
+
+        return files
+
+
+    def postings(self, tag):
+        """ returns the set of file IDs bearing the given tag """
+
+        if self.matcher.split_re.search(tag):
+            return self._spanning_postings(tag)
+
+        collate = "" if self.config["case_sensitive"] else " COLLATE NOCASE"
+        tag_ids = "SELECT id FROM tags WHERE name=?" + collate
+
+        files = set(r[0] for r in self.db.execute(
+            "SELECT file FROM file_tags WHERE tag IN (%s)" % tag_ids, (tag,)))
+
+        if self.config["use_dirs"]:
+            files.update(r[0] for r in self.db.execute(
+                "SELECT files.id FROM files JOIN dir_tags ON files.dir = dir_tags.dir " +
+                "WHERE dir_tags.tag IN (%s)" % tag_ids, (tag,)))
+
+        return files
+
+
+    def count(self, tag):
+        """
+        returns an estimate of the number of files bearing the given tag,
+        without fetching them. Files bearing the tag in both their name and
+        a directory are counted twice.
+        """
+
+        if self.matcher.split_re.search(tag):
+            return len(self._spanning_postings(tag))
+
+        collate = "" if self.config["case_sensitive"] else " COLLATE NOCASE"
+        tag_ids = "SELECT id FROM tags WHERE name=?" + collate
+
+        n = self.db.execute("SELECT COUNT(*) FROM file_tags WHERE tag IN (%s)" % tag_ids, (tag,)).fetchone()[0]
+
+        if self.config["use_dirs"]:
+            n += self.db.execute(
+                "SELECT COUNT(*) FROM files JOIN dir_tags ON files.dir = dir_tags.dir " +
+                "WHERE dir_tags.tag IN (%s)" % tag_ids, (tag,)).fetchone()[0]
+
+        return n
+
+
+    def total(self):
+        """ returns the number of files in the index """
+        return self.db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+
+    def universe(self):
+        """ returns the set of all file IDs """
+        return set(r[0] for r in self.db.execute("SELECT id FROM files"))
+
+
+    def paths(self, file_ids):
+        """ yields the absolute paths for the given file IDs """
+        for id in file_ids:
+            r = self.db.execute("SELECT dirs.path, files.name FROM files " +
+                                "JOIN dirs ON files.dir = dirs.id WHERE files.id=?", (id,)).fetchone()
+            if r is not None:
+                yield os.path.join(self.root_dir, r[0], r[1])
+
+
+    def plan(self, operations, aliases=None):
+        """ returns a QueryPlan for the operations, ordered by the tag counts """
+        return QueryPlan(operations, self.count, self.total(), aliases)
+
+
+    def select(self, operations, aliases=None):
+        """ returns the absolute paths of all files matching the given operations """
+        ids = self.plan(operations, aliases).evaluate(self.postings, self.universe)
+        return sorted(self.paths(ids))
@@ -0,0 +1,81 @@
+
+import re
+from functools import lru_cache
+
+
+# the number of compiled tag patterns and tokenized strings to keep around
+MATCHER_CACHE_SIZE = 4096
+
+
+class TagMatcher:
+    """
+    Precompiled tag matching for a single set of delimiters. Strings are
+    tokenized once into (cached) tag sets, and the patterns used to remove
+    tags from strings are compiled once per tag.
+    """
+
+    def __init__(self, tag_delims, case_sensitive=True, cache_size=MATCHER_CACHE_SIZE):
+        self.tag_delims     = tag_delims # a regex character class
+        self.case_sensitive = case_sensitive
+        self.flags          = 0 if case_sensitive else re.IGNORECASE
+        self.split_re       = re.compile(tag_delims)
+
+        # bounded LRU caches, per matcher
+        self.tokenize = lru_cache(maxsize=cache_size)(self._tokenize)
+        self.patterns = lru_cache(maxsize=cache_size)(self._patterns)
+
+
+    def normalize(self, tag):
+        """ returns the tag as it would appear in a tokenized set """
+        return tag if self.case_sensitive else tag.lower()
+
+
+    def has_tag(self, s, tag):
+        """ checks for a tag in an arbitrary string """
+
+        # tags spanning delimiters can't be found in the token set
+        if self.split_re.search(tag):
+            return self.patterns(tag)[0].search(s) is not None
+
+        return self.normalize(tag) in self.tokenize(s)
+
+
+    def remove(self, s, tag):
+        """ returns the string with all instances of the tag removed """
+
+        if not self.has_tag(s, tag):
+            return s
+
+        edge_re, mid_re = self.patterns(tag)
+
+        # WARNING: the order here is important. Deleting tags from the front or the
+        # back will cause inner tags to become front or back tags. This causes
+        # problems if there are two of the same tag adjacent to one-another.
+        s = mid_re.sub("", s)
+        s = edge_re.sub("", s)
+        return s
+
+
+    # returns the (frozen) tagset for an arbitrary string
+    def _tokenize(self, s):
+        tags = self.split_re.split(s)
+
+        if not self.case_sensitive:
+            tags = [ x.lower() for x in tags ]
+
+        return frozenset(filter(bool, tags)) # strain out empty strings
+
+
+    # compiles the (edge, mid) patterns for a tag
+    def _patterns(self, tag):
+        tag = re.escape(self.normalize(tag))
+
+        #           (^|[ .,_-])tag($|[ .,_-])
+        edge = "(^|" + self.tag_delims + ")" + tag + "($|" + self.tag_delims + ")"
+
+        # Hard to combine these into one regex because python complains about not
+        # having fixed a length look-behind. Look-behind is necessary to prevent
+        # the leading delimeter from being eaten.
+        mid = ("(?<=%s)" % self.tag_delims) + tag + self.tag_delims
+
+        return (re.compile(edge, self.flags), re.compile(mid, self.flags))
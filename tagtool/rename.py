@@ -0,0 +1,153 @@
+
+import os
+import json
+import threading
+
+from .config import get_config, state_path
+
+
+# the name of the rename journal, stored in the root's .tagtool directory
+TAGJOURNAL_FILENAME = ".tagjournal"
+
+# the number of renames kept in flight at once
+RENAME_JOBS = 8
+
+
+class RenameError(Exception):
+    """ Raised when a set of renames can't be carried out safely """
+
+    def __init__(self, message, renames=None):
+        Exception.__init__(self, message)
+        if renames is None:
+            renames = []
+        self.renames = renames # the offending (src, dst) pairs
+
+
+
+# returns the journal path for renames of the given file
+def journal_path(filestr):
+    config = get_config(os.path.dirname(os.path.abspath(filestr)))
+    return state_path(config["root_dir"], TAGJOURNAL_FILENAME)
+
+
+# returns the (src, dst) pairs that would clobber another file
+def find_collisions(plan):
+    collisions = []
+    seen = set()
+
+    for src, dst in plan:
+        dst = os.path.abspath(dst)
+        if dst in seen or os.path.lexists(dst):
+            collisions.append((src, dst))
+        seen.add(dst)
+
+    return collisions
+
+
+# reads the planned renames, and the indices of the completed ones
+def read_journal(path):
+    plan = []
+    done = set()
+
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break # a torn write at the end of the journal
+
+            if "done" in entry:
+                done.add(entry["done"])
+            else:
+                plan.append((entry["src"], entry["dst"]))
+
+    return plan, done
+
+
+class RenameExecutor:
+    """
+    Carries out a set of renames on a thread pool, to overlap filesystem
+    latency. The planned renames are written to an append-only journal
+    before anything is touched, so that an interrupted run can be resumed
+    or rolled back.
+    """
+
+    def __init__(self, journal, jobs=RENAME_JOBS):
+        self.journal = journal
+        self.jobs    = jobs
+        self.lock    = threading.Lock()
+        self.missing = [] # (src, dst) pairs whose file was gone from both
+
+
+    def execute(self, plan):
+        """ renames every (src, dst) pair in the plan """
+
+        if os.path.exists(self.journal):
+            raise RenameError("an unfinished rename journal exists at '%s'" % self.journal)
+
+        collisions = find_collisions(plan)
+        if collisions:
+            raise RenameError("%d renames would overwrite existing files" % len(collisions), collisions)
+
+        with open(self.journal, "w") as f:
+            for src, dst in plan:
+                f.write(json.dumps({ "src": src, "dst": dst }) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._run(plan, set())
+
+
+    def resume(self):
+        """
+        finishes the renames of an interrupted run. Files deleted since
+        are skipped, and returned as a list of (src, dst) pairs
+        """
+        plan, done = read_journal(self.journal)
+        self._run(plan, done)
+        return self.missing
+
+
+    def rollback(self):
+        """ moves the files of an interrupted run back to where they were """
+        plan, done = read_journal(self.journal)
+
+        for src, dst in reversed(plan):
+            if os.path.lexists(dst) and not os.path.lexists(src):
+                os.rename(dst, src)
+
+        os.unlink(self.journal)
+
+
+    def _run(self, plan, done):
+        from concurrent.futures import ThreadPoolExecutor
+
+        todo = [ (i, src, dst) for i, (src, dst) in enumerate(plan) if i not in done ]
+
+        # create any missing directories up front
+        for dst_dir in set(os.path.dirname(dst) for i, src, dst in todo):
+            os.makedirs(dst_dir, exist_ok=True)
+
+        with open(self.journal, "a") as log:
+            with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+                list(pool.map(lambda r: self._rename(log, *r), todo))
+
+        os.unlink(self.journal)
+
+
+    def _rename(self, log, i, src, dst):
+        # a resumed rename may already have happened, or its file may have
+        # been deleted since
+        if os.path.lexists(src):
+            os.rename(src, dst)
+        elif not os.path.lexists(dst):
+            with self.lock:
+                self.missing.append((src, dst))
+
+        # synced like the plan, so the journal on disk keeps up with the renames
+        with self.lock:
+            log.write(json.dumps({ "done": i }) + "\n")
+            log.flush()
+            os.fsync(log.fileno())
+
+        return i
@@ -1,9 +1,10 @@
 
 
-import subprocess
+import os
 from collections import namedtuple
 
 from .filename import Filename
+from .config import get_config
 
 
 # Tag operation struct with slots for the tag (string) and the
@@ -15,93 +16,453 @@ INTERSECTION = 0
 INCLUSION    = 1
 EXCLUSION    = 2
 
+# the most tag roots select_roots() searches at once
+SELECT_JOBS = 8
 
 
 
-# constructs a find command based on the operations given
-# Note: The result of this command will contain several falsely selected
-# files, since it will also match substrings of tags.
-def build_command(operations, config):
 
-    find_flags = ""
+# three-valued logic for partially known tagsets
+# True/False are known answers, None is "can't tell yet"
+def _and(a, b):
+    if a is False or b is False:
+        return False
+    return True if (a and b) else None
 
-    # chooses one of the following:
-    # -name -iname -path -ipath
-    flag = " -"
-    flag += "i" if not config["case_sensitive"] else ""
-    flag += "path" if config["use_dirs"] else "name"
+def _or(a, b):
+    if a is True or b is True:
+        return True
+    return False if (a is False and b is False) else None
 
-    for op in operations:
-        if op.type == INCLUSION:
-            if not find_flags:
-                find_flags += " %s *%s*" % (flag, op.tag)
-            else:
-                find_flags = "( " + find_flags + " ) -o %s *%s*" % (flag, op.tag)
-        elif op.type == EXCLUSION:
-            find_flags += " ! %s *%s*" % (flag, op.tag)
+def _not(a):
+    return None if a is None else not a
+
+
+# nodes of a compiled QueryPlan
+# value is the tag for TAG nodes, the negated node for NOT nodes,
+# and a tuple of child nodes for AND and OR nodes
+PlanNode = namedtuple('PlanNode', 'type value')
+
+TAG = "tag"
+NOT = "not"
+AND = "and"
+OR  = "or"
+
+# an AND without any terms selects every file
+EVERYTHING = PlanNode(AND, ())
+
+
+def _join(type, node, term):
+    if node.type == type:
+        if term in node.value:
+            return node # a AND a == a, a OR a == a
+        return PlanNode(type, node.value + (term,))
+    return PlanNode(type, (node, term))
+
+
+# builds a boolean expression from the operations, keeping their left to
+# right meaning: each operation applies to the selection so far, and a
+# leading INCLUSION starts a new selection, rather than adding to every file
+# aliases may map a tag to a list of tags, any of which will do in its place
+def compile_operations(operations, aliases=None):
+
+    node = EVERYTHING
+
+    for i, op in enumerate(operations):
+        term = PlanNode(TAG, op.tag)
+
+        if aliases and len(aliases.get(op.tag, ())) > 1:
+            term = PlanNode(OR, tuple(PlanNode(TAG, t) for t in aliases[op.tag]))
+
+        if i == 0 and op.type != EXCLUSION:
+            node = term
         elif op.type == INTERSECTION:
-            find_flags += " %s *%s*" % (flag, op.tag)
+            node = _join(AND, node, term)
+        elif op.type == INCLUSION:
+            node = _join(OR, node, term)
+        elif op.type == EXCLUSION:
+            node = _join(AND, node, PlanNode(NOT, term))
 
-    # insert the selection flags into the main find command
+    return node
 
-    #                 root_dir          find_flags
-    find_cmd = ["find"]
-    find_cmd += [config["root_dir"]]
-    find_cmd += ["-type", "f"]
-    find_cmd += find_flags.split()
-    find_cmd += ["!", "(", "-path", "*/.*", "-perm", "-o=x", ")"]
 
-    return find_cmd
+class QueryPlan:
+    """
+    A compiled selection. The terms of each AND and OR are independent of
+    each other, so they may be evaluated in any order. Given frequency(tag)
+    (the number of files bearing a tag) and the total number of files, the
+    rarest terms of an AND, and the most common terms of an OR, are tried
+    first, so that evaluation can stop as early as possible.
+    """
 
+    def __init__(self, operations, frequency=None, total=None, aliases=None):
+        self.operations = list(operations)
+        self.total      = total
+        self.estimates  = {}
+        self.root       = compile_operations(self.operations, aliases)
 
-# function that uses `find` to retrieve a basic list of files matching
-# the given tag selectors.
-# Note: see note for build_command()
-def find_base_files(operations, config):
+        if frequency is not None:
+            self.frequency = frequency
+            self.root = self._order(self.root)
 
-    cmd = build_command(operations, config)
 
-    # run the find
-    try:
-        b = subprocess.check_output(cmd, universal_newlines=True)
-        return b.splitlines()
-    except subprocess.CalledProcessError:
-        print("Failed to execute 'find'")
-        return []
+    def estimate(self, node):
+        """ returns the estimated number of files selected by a node, or None if unknown """
+        return self.estimates.get(node)
+
+
+    def _order(self, node):
+        if node.type == TAG:
+            n = self.frequency(node.value)
+        elif node.type == NOT:
+            child = self._order(node.value)
+            node = PlanNode(NOT, child)
+            n = None if self.total is None else max(self.total - self.estimates[child], 0)
+        else:
+            children = [ self._order(c) for c in node.value ]
+            known = [ self.estimates[c] for c in children if self.estimates[c] is not None ]
+
+            # unknown estimates sort as the least selective, and the NOT terms
+            # of an AND go last, since they are subtracted from the others
+            if node.type == AND:
+                children.sort(key=lambda c: (c.type == NOT, self.estimates[c] is None, self.estimates[c] or 0))
+                n = min(known) if known else self.total
+            else:
+                children.sort(key=lambda c: (self.estimates[c] is not None, -(self.estimates[c] or 0)))
+                n = sum(known) if len(known) == len(children) else None
+                if n is not None and self.total is not None:
+                    n = min(n, self.total)
+
+            node = PlanNode(node.type, tuple(children))
+
+        self.estimates[node] = n
+        return node
+
+
+    def matches(self, has, node=None):
+        """
+        evaluates the plan for a single file, given has(tag), which returns
+        True/False, or None when it isn't yet known whether the file bears
+        the tag. Returns None if the selection can't be decided.
+        """
+
+        node = self.root if node is None else node
+
+        if node.type == TAG:
+            return has(node.value)
+        elif node.type == NOT:
+            return _not(self.matches(has, node.value))
+        elif node.type == AND:
+            matched = True
+            for c in node.value:
+                matched = _and(matched, self.matches(has, c))
+                if matched is False:
+                    return False
+            return matched
+        else:
+            matched = False
+            for c in node.value:
+                matched = _or(matched, self.matches(has, c))
+                if matched is True:
+                    return True
+            return matched
+
+
+    def evaluate(self, postings, universe):
+        """
+        evaluates the plan over whole sets of files at once. postings(tag)
+        must return the set of files bearing that tag, and universe() the
+        set of all files (both are only called when actually needed).
+        """
+
+        cache = {}
+
+        def cached_postings(tag):
+            if tag not in cache:
+                cache[tag] = set(postings(tag))
+            return cache[tag]
+
+        def cached_universe():
+            if None not in cache:
+                cache[None] = set(universe())
+            return cache[None]
+
+        return self._evaluate(self.root, cached_postings, cached_universe)
+
+
+    def _evaluate(self, node, postings, universe):
+        if node.type == TAG:
+            return postings(node.value)
+
+        elif node.type == NOT:
+            return universe().difference(self._evaluate(node.value, postings, universe))
+
+        elif node.type == AND:
+            positive = [ c for c in node.value if c.type != NOT ]
+            negative = [ c.value for c in node.value if c.type == NOT ]
+
+            if positive:
+                selected = set(self._evaluate(positive[0], postings, universe))
+            else:
+                selected = set(universe())
+
+            for c in positive[1:]:
+                if not selected:
+                    return selected
+                selected.intersection_update(self._evaluate(c, postings, universe))
+
+            for c in negative:
+                if not selected:
+                    return selected
+                selected.difference_update(self._evaluate(c, postings, universe))
+
+            return selected
+
+        else:
+            selected = set()
+            for c in node.value:
+                selected.update(self._evaluate(c, postings, universe))
+                if self.total is not None and len(selected) >= self.total:
+                    break # already holds every file
+            return selected
+
+
+    def tags(self, node=None):
+        """ returns the set of every tag in the plan """
+        node = self.root if node is None else node
+
+        if node.type == TAG:
+            return { node.value }
+        elif node.type == NOT:
+            return self.tags(node.value)
+        else:
+            return set().union(*[ self.tags(c) for c in node.value ])
+
+
+    def explain(self, node=None, depth=0):
+        """ returns the plan as a list of indented lines, in evaluation order """
+
+        node = self.root if node is None else node
+
+        if node.type == TAG:
+            text = "tag %s" % node.value
+        elif node == EVERYTHING:
+            text = "all files"
+        else:
+            text = node.type
+
+        n = self.estimate(node)
+        if n is not None:
+            text += "  (~%d files)" % n
+
+        lines = [ "    " * depth + text ]
+
+        if node.type == NOT:
+            lines += self.explain(node.value, depth + 1)
+        elif node.type in (AND, OR):
+            for c in node.value:
+                lines += self.explain(c, depth + 1)
+
+        return lines
+
+
+
+# evaluates the operations for a single file, given has(tag), which
+# returns True/False, or None when it isn't yet known whether the file
+# bears the tag. A leading INCLUSION starts a new selection, rather than
+# adding to every file. Returns None if the selection can't be decided.
+def match_tags(has, operations):
+    return QueryPlan(operations).matches(has)
 
 
 # function to refine the selection based on the users instructions
 # returns boolean for whether the file was selected
 def match(f, operations, config):
+    return match_tags(f.has_tag, operations)
 
-    matched = True
 
-    # unfortunately, we can't bail on the first unmatched operation
-    # since the file can always be included later with `+[TAG]`
-    for op in operations:
+# evaluates the operations over whole sets of files at once
+# postings(tag) must return the set of files bearing that tag, and
+# universe() the set of all files (only called when actually needed).
+# frequency(tag) and total, if given, are used to order the terms
+# A leading INCLUSION starts a new selection (see match_tags())
+def evaluate(operations, postings, universe, frequency=None, total=None, aliases=None):
+    return QueryPlan(operations, frequency, total, aliases).evaluate(postings, universe)
 
-        if op.type == INTERSECTION:
-            if not f.has_tag(op.tag):
-                matched = False
-        else:
-            # if the file has the tag for this operation
-            if f.has_tag(op.tag):
-                if op.type == INCLUSION:
-                    matched = True
-                elif op.type == EXCLUSION:
-                    matched = False
 
-    return matched
+# walks the tree in-process, yielding the paths of the selected files
+# Directory tags are tokenized once per directory, and whole subtrees are
+# skipped when the tags of a directory already rule out every file in it.
+# Hidden files and directories are never selected.
+def walk_select(operations, config, aliases=None, skip=()):
+
+    matcher  = config["matcher"]
+    use_dirs = config["use_dirs"]
+    plan     = QueryPlan(operations, aliases=aliases)
+
+    # tags containing delimiters can only be found by searching the strings
+    spanning = set(tag for tag in plan.tags() if matcher.split_re.search(tag))
+
+    def dir_has(tag, dir_tags, rel):
+        if tag in spanning:
+            return True if matcher.has_tag(rel, tag) else None
+        return True if matcher.normalize(tag) in dir_tags else None
+
+    def file_has(tag, tags, name, rel):
+        if tag in spanning:
+            return matcher.has_tag(name, tag) or (use_dirs and matcher.has_tag(rel, tag))
+        return matcher.normalize(tag) in tags
+
+    stack = [(config["root_dir"], "", frozenset())]
+
+    while stack:
+        path, rel, dir_tags = stack.pop()
+
+        decided = None
+        if use_dirs:
+            decided = plan.matches(lambda t: dir_has(t, dir_tags, rel))
+            if decided is False:
+                continue # nothing in this subtree can be selected
+
+        try:
+            entries = list(os.scandir(path))
+        except OSError:
+            continue
+
+        for e in entries:
+            if e.name.startswith("."):
+                continue
+
+            if e.is_dir(follow_symlinks=False):
+                if e.path in skip:
+                    continue
+                child_tags = dir_tags | matcher.tokenize(e.name) if use_dirs else dir_tags
+                stack.append((e.path, os.path.join(rel, e.name), child_tags))
+
+            elif e.is_file(follow_symlinks=False):
+                if decided:
+                    yield e.path
+                    continue
+
+                name = os.path.splitext(e.name)[0]
+                tags = dir_tags | matcher.tokenize(name)
+
+                if plan.matches(lambda t: file_has(t, tags, name, rel)):
+                    yield e.path
+
+
+# streaming selector function
+# yields a Filename for each selected file, as soon as it's discovered
+# if "use_index" is set, the .tagindex is updated and queried instead, and
+# if "use_daemon" is set, a running tag-daemon is asked before walking the tree
+# aliases may map a tag to a list of tags, any of which will do in its place
+# skip lists directories (usually other tag roots) whose files are left out
+def iter_select(operations, config, aliases=None, skip=()):
+    skip = tuple(os.path.abspath(d) for d in skip)
+    skipped = tuple(d + os.sep for d in skip)
+
+    if config["use_index"]:
+        from .index import Index
+        with Index(config) as index:
+            index.update()
+            for f in index.select(operations, aliases):
+                if not (skipped and f.startswith(skipped)):
+                    yield Filename(f, config=config)
+        return
+
+    if config["use_daemon"]:
+        from .daemon import daemon_select
+        files = daemon_select(operations, config, aliases)
+        if files is not None:
+            for f in files:
+                if not (skipped and f.startswith(skipped)):
+                    yield Filename(f, config=config)
+            return
+
+    for f in walk_select(operations, config, aliases, skip):
+        yield Filename(f, config=config)
+
+
+# runs the selection against several tag roots at once, each in its own
+# thread and with its own config, and yields (root, Filename) for the
+# selected files in the order they're found
+# Roots nested inside one another are each left to answer for their own
+# files. If timings is given, it's filled with
+# root -> (seconds, number of files) as each root finishes.
+def select_roots(operations, roots, overrides={}, aliases=None, timings=None, jobs=SELECT_JOBS):
+    import time
+    import queue
+    import threading
+
+    roots = sorted(set(os.path.abspath(r) for r in roots))
+    results = queue.Queue()
+    stop = threading.Event()
+
+    def work(root):
+        start = time.perf_counter()
+        n = 0
+        try:
+            config = get_config(root, overrides)
+            nested = [ r for r in roots if r.startswith(root + os.sep) ]
+            for f in iter_select(operations, config, aliases, nested):
+                if stop.is_set():
+                    break
+                results.put((root, f))
+                n += 1
+        except Exception as e:
+            results.put((root, e))
+        results.put((root, (time.perf_counter() - start, n)))
+
+    # the roots are started in batches of jobs, since a thread per root
+    # would let dozens of walks fight over the same disk
+    pending = list(reversed(roots))
+    running = 0
+
+    try:
+        while pending or running:
+            while pending and running < jobs:
+                threading.Thread(target=work, args=(pending.pop(),), daemon=True).start()
+                running += 1
+
+            root, item = results.get()
+
+            if isinstance(item, Filename):
+                yield root, item
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                running -= 1
+                if timings is not None:
+                    timings[root] = item
+    finally:
+        stop.set()
+
+
+# describes how iter_select() would answer the operations, as a list of lines
+# With "use_index", the plan is ordered by the tag counts in the .tagindex
+def explain_select(operations, config, aliases=None):
+    if config["use_index"]:
+        from .index import Index
+        with Index(config) as index:
+            index.update()
+            plan = index.plan(operations, aliases)
+            source = "the .tagindex (%d files)" % index.total()
+    else:
+        plan = QueryPlan(operations, aliases=aliases)
+        source = "walking %s" % config["root_dir"]
+
+        if config["use_dirs"]:
+            source += ", skipping subtrees whose directory tags rule out every file"
+
+        if config["use_daemon"]:
+            from .daemon import daemon_ping
+            if daemon_ping(config):
+                source = "the running tag-daemon"
+
+    return [ "answered by " + source ] + plan.explain()
 
 
 # main selector function
-# runs a `find` command and then refines the search with tag matching
+# returns a list of Filenames for every selected file
 def select(operations, config):
-    base_files = find_base_files(operations, config)
-    results = []
-    for f in base_files:
-        f = Filename(f, config)
-        if match(f, operations, config):
-            results.append(f)
-
-    return results
+    return list(iter_select(operations, config))
@@ -0,0 +1,357 @@
+
+import os
+import sys
+import struct
+from array import array
+
+from .config import get_config
+from .utils import map_subtrees
+
+
+# identifies a snapshot file, and the version of its layout
+SNAPSHOT_MAGIC = b"TAGSNAP\x01"
+
+# magic, number of tags, number of files, the device of the root, and the
+# sizes of the root, the tag string table, the tag IDs and the path string table
+SNAPSHOT_HEADER = struct.Struct("<8sIIQIQQQ")
+
+# kinds of differences reported by diff_snapshots()
+FILE_ADDED   = "+"
+FILE_REMOVED = "-"
+FILE_CHANGED = "~"
+FILE_MOVED   = ">"
+
+
+# every section starts on an 8 byte boundary, so the arrays can be cast in place
+def _pad(n):
+    return -n % 8
+
+
+# returns the little endian bytes of an array
+def _le(a):
+    if sys.byteorder == "big":
+        a = array(a.typecode, a)
+        a.byteswap()
+    return a.tobytes()
+
+
+# returns an array of the given type over the bytes, without copying them
+# where the machine's byte order allows it
+def _cast(view, typecode):
+    if sys.byteorder == "big":
+        a = array(typecode, view.tobytes())
+        a.byteswap()
+        return memoryview(a)
+    return view.cast(typecode)
+
+
+# tokenizes every file in one subtree, as Filename.get_tags() would, and
+# returns a list of (path, inode, mtime, tags)
+# The absolute paths in exclude (snapshot files kept inside the tree) are
+# left out.
+def _snapshot_subtree(top, recursive, overrides, exclude=frozenset()):
+    rows = []
+    stack = [top]
+
+    while stack:
+        path = stack.pop()
+        config  = get_config(path, overrides)
+        matcher = config["matcher"]
+
+        dir_tags = frozenset()
+        if config["use_dirs"]:
+            dir_tags = matcher.tokenize(os.path.relpath(path, config["root_dir"]))
+
+        try:
+            entries = list(os.scandir(path))
+        except OSError:
+            continue
+
+        for e in entries:
+            # leave .tagdir and friends alone
+            if e.name.startswith("."):
+                continue
+
+            if e.is_dir(follow_symlinks=False):
+                if recursive:
+                    stack.append(e.path)
+            elif e.is_file(follow_symlinks=False):
+                if e.path in exclude:
+                    continue
+                try:
+                    mtime = e.stat(follow_symlinks=False).st_mtime_ns
+                except OSError:
+                    continue # gone already
+                tags = dir_tags | matcher.tokenize(os.path.splitext(e.name)[0])
+                rows.append((e.path, e.inode(), mtime, tags))
+
+    return rows
+
+
+# returns the string table for a sorted list of byte strings, as the
+# offsets of each string (plus the end of the last one) and the strings
+def _string_table(strings, typecode):
+    offsets = array(typecode, [0])
+    for s in strings:
+        offsets.append(offsets[-1] + len(s))
+    return offsets, b"".join(strings)
+
+
+
+class TagSnapshot:
+    """
+    The tags of every file of a tree at one point in time, in a compact
+    binary layout that is read in place rather than loaded:
+
+        header      see SNAPSHOT_HEADER
+        root        the directory the snapshot was taken of (utf-8)
+        tag table   uint32 offsets[tags + 1], then the tag strings
+        file tags   uint32 offsets[files + 1], then the uint32 tag IDs
+        path table  uint64 offsets[files + 1], then the relative paths
+        inodes      uint64 inodes[files]
+        mtimes      int64 mtimes[files], in nanoseconds
+
+    Tags and paths are sorted by their bytes, and so are the tag IDs of
+    each file, so two snapshots can be compared in a single merging pass.
+    Every section starts on an 8 byte boundary.
+
+    Retagging a file renames it, so the inodes and mtimes (and the device
+    of the root) are kept to tell a retagged file from a removed one and an
+    added one. The mtime guards against a new file reusing the inode of a
+    removed one, since renaming a file leaves its mtime alone.
+    """
+
+    def __init__(self, buf):
+        self.buf  = buf
+        self.view = view = memoryview(buf)
+
+        if len(view) < SNAPSHOT_HEADER.size:
+            raise ValueError("not a tag snapshot")
+
+        magic, n_tags, n_files, device, root_size, tags_size, n_ids, paths_size = \
+            SNAPSHOT_HEADER.unpack_from(buf)
+
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError("not a tag snapshot")
+
+        sections = [ ("root", root_size, None),
+                     ("tag_offsets", 4 * (n_tags + 1), "I"),
+                     ("tag_strings", tags_size, None),
+                     ("file_offsets", 4 * (n_files + 1), "I"),
+                     ("tag_ids", 4 * n_ids, "I"),
+                     ("path_offsets", 8 * (n_files + 1), "Q"),
+                     ("path_strings", paths_size, None),
+                     ("inodes", 8 * n_files, "Q"),
+                     ("mtimes", 8 * n_files, "q") ]
+
+        pos = SNAPSHOT_HEADER.size + _pad(SNAPSHOT_HEADER.size)
+        for name, size, typecode in sections:
+            if pos + size > len(view):
+                raise ValueError("truncated tag snapshot")
+            section = view[pos:pos + size]
+            setattr(self, name, _cast(section, typecode) if typecode else section)
+            pos += size + _pad(size)
+
+        self.root    = bytes(self.root).decode()
+        self.device  = device
+        self.n_tags  = n_tags
+        self.n_files = n_files
+
+
+    def __len__(self):
+        return self.n_files
+
+
+    @staticmethod
+    def build(rows, root, device=0):
+        """ returns the bytes of a snapshot of (relative path, inode, mtime, tags) rows """
+
+        rows = sorted(((os.fsencode(path), inode, mtime, tags) for path, inode, mtime, tags in rows),
+                      key=lambda r: r[0])
+
+        tags = set(t for row in rows for t in row[3])
+        tags = sorted(t.encode("utf-8", "surrogateescape") for t in tags)
+        ids  = { t.decode("utf-8", "surrogateescape"): n for n, t in enumerate(tags) }
+
+        tag_offsets, tag_strings   = _string_table(tags, "I")
+        path_offsets, path_strings = _string_table([ row[0] for row in rows ], "Q")
+        inodes = array("Q", [ row[1] for row in rows ])
+        mtimes = array("q", [ row[2] for row in rows ])
+
+        file_offsets = array("I", [0])
+        tag_ids      = array("I")
+        for path, inode, mtime, file_tags in rows:
+            tag_ids.extend(sorted(ids[t] for t in file_tags))
+            file_offsets.append(len(tag_ids))
+
+        root = root.encode()
+        header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, len(tags), len(rows), device, len(root),
+                                      len(tag_strings), len(tag_ids), len(path_strings))
+
+        sections = [ header, root, _le(tag_offsets), tag_strings, _le(file_offsets),
+                     _le(tag_ids), _le(path_offsets), path_strings, _le(inodes), _le(mtimes) ]
+
+        return b"".join(s + b"\0" * _pad(len(s)) for s in sections)
+
+
+    @classmethod
+    def scan(cls, path, overrides={}, jobs=1, threads=False, exclude=()):
+        """
+        takes a snapshot of the live tree, in memory. The top-level subtrees
+        are walked by separate workers, as in scan_tags(). The files in
+        exclude (such as snapshots saved inside the tree) are left out.
+        """
+        path = os.path.abspath(path)
+        exclude = frozenset(os.path.abspath(f) for f in exclude)
+        rows = []
+        for result in map_subtrees(_snapshot_subtree, path, (overrides, exclude), jobs, threads):
+            rows.extend((os.path.relpath(row[0], path),) + row[1:] for row in result)
+        return cls(cls.build(rows, path, os.stat(path).st_dev))
+
+
+    def save(self, path):
+        # written to a temporary file first, so readers never see half of it
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(self.view)
+        os.replace(tmp, path)
+
+
+    @classmethod
+    def open(cls, path):
+        """ maps a snapshot file into memory, rather than reading it """
+        import mmap
+
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise ValueError("not a tag snapshot")
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+    def close(self):
+        for name in ["tag_offsets", "tag_strings", "file_offsets", "tag_ids",
+                     "path_offsets", "path_strings", "inodes", "mtimes"]:
+            getattr(self, name).release()
+        self.view.release()
+        if hasattr(self.buf, "close"):
+            self.buf.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def tag_bytes(self, n):
+        return self.tag_strings[self.tag_offsets[n]:self.tag_offsets[n + 1]].tobytes()
+
+
+    def tag(self, n):
+        return self.tag_bytes(n).decode("utf-8", "surrogateescape")
+
+
+    def path_bytes(self, n):
+        return self.path_strings[self.path_offsets[n]:self.path_offsets[n + 1]].tobytes()
+
+
+    def path(self, n):
+        return os.fsdecode(self.path_bytes(n))
+
+
+    def file_tags(self, n):
+        """ returns the (sorted) tag IDs of the nth file """
+        return self.tag_ids[self.file_offsets[n]:self.file_offsets[n + 1]]
+
+
+    def tags(self, n):
+        return [ self.tag(t) for t in self.file_tags(n) ]
+
+
+
+# yields (kind, old path, new path, added tags, removed tags) for every
+# file whose tags differ between the old and new snapshots. The paths of
+# files that only exist on one side are None on the other.
+# Files whose tags changed in place come first, in path order, followed by
+# the retagged (renamed) files, then the removed and added ones. Files are
+# only turned into strings once they are known to differ, and when both
+# snapshots share a tag table, their tag IDs are compared as is.
+def diff_snapshots(old, new):
+
+    same_tags = old.tag_offsets.tobytes() == new.tag_offsets.tobytes() and \
+                old.tag_strings == new.tag_strings
+
+    if same_tags:
+        translate = None
+    else:
+        # old tag ID -> new tag ID, or -1 for the tags the new snapshot lacks
+        ids = { new.tag_bytes(n): n for n in range(new.n_tags) }
+        translate = [ ids.get(old.tag_bytes(n), -1) for n in range(old.n_tags) ]
+
+    def changes(i, j):
+        old_tags = old.tags(i)
+        new_tags = new.tags(j)
+        return [ t for t in new_tags if t not in old_tags ], \
+               [ t for t in old_tags if t not in new_tags ]
+
+    removed = []
+    added   = []
+    i = j = 0
+
+    while i < len(old) or j < len(new):
+        a = old.path_bytes(i) if i < len(old) else None
+        b = new.path_bytes(j) if j < len(new) else None
+
+        if b is None or (a is not None and a < b):
+            removed.append(i)
+            i += 1
+            continue
+
+        if a is None or b < a:
+            added.append(j)
+            j += 1
+            continue
+
+        old_ids = old.file_tags(i)
+        new_ids = new.file_tags(j)
+
+        if same_tags:
+            changed = old_ids.tobytes() != new_ids.tobytes()
+        else:
+            changed = [ translate[t] for t in old_ids ] != new_ids.tolist()
+
+        if changed:
+            yield (FILE_CHANGED, old.path(i), new.path(j)) + changes(i, j)
+
+        i += 1
+        j += 1
+
+    # inodes only identify a file within the same filesystem
+    if old.device and old.device == new.device:
+        inodes = { (new.inodes[j], new.mtimes[j]): j for j in added }
+        moved = {}
+        for i in removed:
+            j = inodes.pop((old.inodes[i], old.mtimes[i]), None)
+            if j is not None:
+                moved[i] = j
+
+        for i, j in moved.items():
+            yield (FILE_MOVED, old.path(i), new.path(j)) + changes(i, j)
+
+        matched = set(moved.values())
+        removed = [ i for i in removed if i not in moved ]
+        added   = [ j for j in added if j not in matched ]
+
+    for i in removed:
+        yield FILE_REMOVED, old.path(i), None, [], old.tags(i)
+
+    for j in added:
+        yield FILE_ADDED, None, new.path(j), new.tags(j), []
+
+
+# takes a snapshot of the tag root of the given path
+def snapshot_root(path="", overrides={}, jobs=1, threads=False, exclude=()):
+    config = get_config(path, overrides)
+    return TagSnapshot.scan(config["root_dir"], overrides, jobs, threads, exclude)
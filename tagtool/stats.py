@@ -0,0 +1,139 @@
+
+import os
+import sys
+import time
+import functools
+
+
+# name -> [calls, seconds]
+counters = {}
+
+# (object, attribute, original) for everything that was wrapped
+_patched = []
+
+
+def count(name, seconds=0.0):
+    c = counters.setdefault(name, [0, 0.0])
+    c[0] += 1
+    c[1] += seconds
+
+
+def _wrap(obj, attr, name):
+    original = getattr(obj, attr)
+
+    @functools.wraps(original)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            count(name, time.perf_counter() - start)
+
+    _patched.append((obj, attr, original))
+    setattr(obj, attr, wrapper)
+
+
+def enable():
+    """
+    starts counting calls to the hot spots of tagtool. Nothing is wrapped
+    until this is called, so there is no cost when stats are disabled.
+    Configs are forgotten, so that their matchers pick up the wrappers.
+    """
+
+    import subprocess
+    from . import config as _config
+    from .matcher import TagMatcher
+
+    if _patched:
+        return
+
+    _wrap(os, "stat",    "stat")
+    _wrap(os, "lstat",   "stat")
+    _wrap(os, "listdir", "dir listing")
+    _wrap(os, "scandir", "dir listing")
+    _wrap(os, "rename",  "rename")
+
+    _wrap(_config, "load_config", "config load")
+
+    _wrap(TagMatcher, "_patterns", "regex compile")
+    _wrap(TagMatcher, "_tokenize", "tokenize")
+    _wrap(TagMatcher, "has_tag",   "tag search")
+    _wrap(TagMatcher, "remove",    "tag removal")
+
+    _wrap(subprocess, "call",         "subprocess")
+    _wrap(subprocess, "check_output", "subprocess")
+    _wrap(subprocess, "run",          "subprocess")
+
+    _config.clear_config_cache()
+
+
+def disable():
+    """ removes every wrapper, and clears the counters """
+    from . import config as _config
+
+    while _patched:
+        obj, attr, original = _patched.pop()
+        setattr(obj, attr, original)
+    counters.clear()
+    _config.clear_config_cache()
+
+
+def report(as_json=False, file=None):
+    file = file or sys.stderr
+
+    if as_json:
+        import json
+        data = { name: { "calls": c[0], "seconds": c[1] } for name, c in counters.items() }
+        print(json.dumps(data, indent=2, sort_keys=True), file=file)
+        return
+
+    print("%-16s %10s %12s" % ("", "calls", "seconds"), file=file)
+    for name, c in sorted(counters.items(), key=lambda item: -item[1][1]):
+        print("%-16s %10d %12.6f" % (name, c[0], c[1]), file=file)
+
+
+# runs a command's main() function, handling the options shared by every
+# command, which are removed from sys.argv first:
+#     --stats         prints counts and times of the hot spots to stderr
+#     --stats=json    same, as JSON
+#     --profile       writes a cProfile dump to <command>.prof
+#     --profile=FILE  writes a cProfile dump to FILE
+def run(main):
+    stats   = None
+    profile = None
+    argv    = [ sys.argv[0] ]
+
+    for arg in sys.argv[1:]:
+        if arg == "--stats":
+            stats = "table"
+        elif arg == "--stats=json":
+            stats = "json"
+        elif arg == "--profile":
+            profile = os.path.basename(sys.argv[0]) + ".prof"
+        elif arg.startswith("--profile="):
+            profile = arg[len("--profile="):]
+        else:
+            argv.append(arg)
+
+    sys.argv = argv
+
+    if stats is not None:
+        enable()
+
+    start = time.perf_counter()
+
+    try:
+        if profile is not None:
+            import cProfile
+            profiler = cProfile.Profile()
+            try:
+                return profiler.runcall(main)
+            finally:
+                profiler.dump_stats(profile)
+                print("wrote profile to %s" % profile, file=sys.stderr)
+        else:
+            return main()
+    finally:
+        if stats is not None:
+            counters["total"] = [1, time.perf_counter() - start]
+            report(stats == "json")
@@ -1,6 +1,16 @@
 
 import os
-import shutil
+import errno
+import contextlib
+
+
+# directories modified this recently (in seconds) are not trusted to have
+# a stable mtime, and will be rescanned on the next update
+MTIME_SLACK = 2.0
+
+# from <fcntl.h> and <linux/fs.h>, for _exchange_paths()
+_AT_FDCWD        = -100
+_RENAME_EXCHANGE = 2
 
 
 # recursively finds the nearest .tagdir file denoting the limit for moving files
@@ -14,9 +24,26 @@ def find_above(path, filename):
             return find_above(os.path.dirname(path), filename)
 
 
-# lists only directories at the given path
+# lists only directories at the given path, leaving out hidden ones (such
+# as the .tagtool directory), which files are never placed in
+# The entry types come with the listing, so only symlinks need a stat
 def dirs_at(path):
-    return [ name for name in os.listdir(path) if os.path.isdir(os.path.join(path, name)) ]
+    with os.scandir(path) as entries:
+        return [ e.name for e in entries if not e.name.startswith(".") and e.is_dir() ]
+
+# holds an exclusive lock on path + ".lock" for the duration of a with
+# block, so that read-modify-write cycles of a file shared between
+# processes don't lose each other's changes
+@contextlib.contextmanager
+def file_lock(path):
+    import fcntl
+    with open(path + ".lock", "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
 
 # deletes all symlinks in the given directory [ USE WITH CAUTION ]
 def empty_links_dir(path):
@@ -25,9 +52,153 @@ def empty_links_dir(path):
         if os.path.islink(file_path):
             os.unlink(file_path)
 
-def find_all_files(path):
-    files = set()
-    for root, directories, filenames in os.walk(path):
+# makes the symlinks in the given directory match the (name, target) pairs
+# given, only creating and deleting the links that differ. Links are created
+# as the pairs arrive, and stale links are deleted at the end, so the
+# directory is never empty in between. Other files are left alone.
+# With atomic=True, the links are built in a fresh directory that then
+# replaces the old one in a single rename (path becomes a symlink to it).
+# A plain directory at path must hold only symlinks (or ValueError is
+# raised), and is updated in place where it can't be swapped atomically.
+# returns the number of links
+def sync_links_dir(path, links, atomic=False):
+    if atomic:
+        return _swap_links_dir(path, links)
+
+    os.makedirs(path, exist_ok=True)
+
+    existing = {}
+    for e in os.scandir(path):
+        if e.is_symlink():
+            existing[e.name] = os.readlink(e.path)
+
+    wanted = set()
+    for name, target in links:
+        if name in wanted:
+            continue # the first file with this name wins
+        wanted.add(name)
+        if existing.get(name) != target:
+            if name in existing:
+                os.unlink(os.path.join(path, name))
+            os.symlink(target, os.path.join(path, name))
+
+    for name in set(existing).difference(wanted):
+        os.unlink(os.path.join(path, name))
+
+    return len(wanted)
+
+
+# swaps two paths with a single renameat2(RENAME_EXCHANGE), which (unlike
+# a plain rename) can put a symlink where a directory was
+# returns False where the platform or filesystem doesn't support it
+def _exchange_paths(a, b):
+    import ctypes, ctypes.util
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        renameat2 = libc.renameat2
+    except (OSError, AttributeError):
+        return False
+
+    renameat2.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+    if renameat2(_AT_FDCWD, os.fsencode(a), _AT_FDCWD, os.fsencode(b), _RENAME_EXCHANGE) == 0:
+        return True
+
+    err = ctypes.get_errno()
+    if err in (errno.ENOSYS, errno.EINVAL):
+        return False
+    raise OSError(err, os.strerror(err), b)
+
+
+def _swap_links_dir(path, links):
+    import tempfile
+
+    path = os.path.abspath(path)
+    plain = os.path.isdir(path) and not os.path.islink(path)
+
+    # whatever isn't a link would vanish from path along with the old directory
+    if plain and not all(e.is_symlink() for e in os.scandir(path)):
+        raise ValueError("'%s' holds more than symlinks, so it can't be swapped out" % path)
+
+    old = os.path.realpath(path) if os.path.islink(path) else None
+
+    # everything is ready before path is touched
+    new = tempfile.mkdtemp(prefix=os.path.basename(path) + ".", dir=os.path.dirname(path))
+    os.chmod(new, 0o755)
+    n = sync_links_dir(new, links)
+
+    tmp_link = new + ".link"
+    os.symlink(new, tmp_link)
+
+    if not plain:
+        os.replace(tmp_link, path)
+    elif _exchange_paths(tmp_link, path):
+        old = tmp_link # the old directory, now out of the way
+    else:
+        # a directory can't be renamed over by a symlink, and moving it
+        # aside first would leave path missing for a moment, so update it
+        # in place instead
+        os.unlink(tmp_link)
+        empty_links_dir(new)
+        os.rmdir(new)
+        return sync_links_dir(path, links)
+
+    if old is not None and os.path.isdir(old) and not os.path.islink(old):
+        empty_links_dir(old)
+        try:
+            os.rmdir(old)
+        except OSError:
+            pass # it holds more than just links
+
+    return n
+
+
+# calls work(top, recursive, *args) for every top-level subtree of path, and
+# once for the files directly in path (with recursive=False), spread over
+# a pool of processes (or threads, for I/O bound mounts like NFS).
+# With jobs=1, work(path, True, *args) is called once, in this process.
+# returns the list of results, in a stable order
+def map_subtrees(work, path, args=(), jobs=1, threads=False):
+    if jobs <= 1:
+        return [ work(path, True, *args) ]
+
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    tops = sorted(e.path for e in os.scandir(path) if e.is_dir(follow_symlinks=False))
+    pool = ThreadPoolExecutor if threads else ProcessPoolExecutor
+
+    with pool(max_workers=jobs) as executor:
+        futures = [ executor.submit(work, path, False, *args) ]
+        futures += [ executor.submit(work, top, True, *args) for top in tops ]
+        return [ f.result() for f in futures ]
+
+
+def _walk_files(top, recursive):
+    files = []
+    for root, directories, filenames in os.walk(top):
         for f in filenames:
-            files.add(os.path.join(root, f))
+            files.append(os.path.join(root, f))
+        if not recursive:
+            break
+    return files
+
+
+# returns the set of every file under path, walked as in map_subtrees()
+# With a single job and a concurrency above 1 (or a stand-in fs), the tree
+# is read by the asyncio walker instead, keeping that many directory
+# listings in flight. The concurrency defaults to the "walk_concurrency"
+# of the .tagdir.
+def find_all_files(path, jobs=1, threads=False, concurrency=None, fs=None, overrides={}):
+    if concurrency is None:
+        from .config import get_config
+        concurrency = get_config(os.path.abspath(path), overrides)["walk_concurrency"]
+
+    if jobs <= 1 and (concurrency > 1 or fs is not None):
+        from .walker import walk
+        return set(os.path.join(root, f) for root, dirs, files in walk(path, fs, concurrency)
+                                          for f in files)
+
+    files = set()
+    for result in map_subtrees(_walk_files, path, (), jobs, threads):
+        files.update(result)
     return files
@@ -0,0 +1,121 @@
+
+import os
+
+from .config import TAGDIR_FILENAME, VIEW_SECTION_PREFIX, get_config, clear_config_cache
+from .filename import Filename
+from .select import Operation, INTERSECTION, INCLUSION, EXCLUSION, iter_select, match
+from .utils import sync_links_dir
+
+
+# builds a list of Operations from commandline style selectors
+# "TAG" for INTERSECTION, "+TAG" for INCLUSION and "-TAG" for EXCLUSION
+def parse_operations(selectors):
+    operations = []
+    for s in selectors:
+        if s[0] == "+":
+            operations.append(Operation(s[1:], INCLUSION))
+        elif s[0] == "-":
+            operations.append(Operation(s[1:], EXCLUSION))
+        else:
+            operations.append(Operation(s, INTERSECTION))
+    return operations
+
+
+# construct a pretty filename out of a file's path
+def link_name(filestr, config):
+    name = os.path.relpath(str(filestr), config["root_dir"])
+    return name.replace("/", config["default_delim"])
+
+
+# yields the (link name, target) pairs for the given files
+def link_names(files, config):
+    for f in files:
+        yield (link_name(f, config), str(f))
+
+
+class View:
+    """
+    A saved query, stored in the .tagdir file as:
+
+        [view NAME]
+        selectors: TAG +TAG -TAG
+        link_dir: /path/to/links     (optional)
+        nocase: true                 (optional)
+
+    The selected files are materialized as a folder of symlinks, which is
+    kept up to date one file at a time as files are renamed.
+    """
+
+    def __init__(self, name, selectors, link_dir, nocase=False):
+        self.name       = name
+        self.selectors  = selectors
+        self.link_dir   = link_dir
+        self.nocase     = nocase
+        self.operations = parse_operations(selectors.split())
+
+
+    def refresh(self, config):
+        """ re-runs the whole query, and syncs the link folder to it """
+        return sync_links_dir(self.link_dir, link_names(iter_select(self.operations, config), config))
+
+
+    def update(self, src, dst, config):
+        """ updates the link folder for a single file that moved from src to dst """
+        os.makedirs(self.link_dir, exist_ok=True)
+
+        old = os.path.join(self.link_dir, link_name(src, config))
+        if os.path.islink(old) and os.readlink(old) == os.path.abspath(src):
+            os.unlink(old)
+
+        f = Filename(dst, config=config)
+        if match(f, self.operations, config):
+            new = os.path.join(self.link_dir, link_name(f, config))
+            if os.path.lexists(new):
+                os.unlink(new)
+            os.symlink(str(f), new)
+
+
+
+# returns the saved queries for the given config
+def get_views(config):
+    return [ View(*v) for v in config["views"] ]
+
+
+def get_view(config, name):
+    for view in get_views(config):
+        if view.name == name:
+            return view
+    return None
+
+
+# stores a new saved query in the .tagdir file of the given config
+def save_view(config, name, selectors):
+    if get_view(config, name) is not None:
+        raise ValueError("a view named '%s' already exists" % name)
+
+    nocase = not config["case_sensitive"]
+
+    with open(os.path.join(config["root_dir"], TAGDIR_FILENAME), "a") as f:
+        f.write("\n[%s%s]\nselectors: %s\n" % (VIEW_SECTION_PREFIX, name, " ".join(selectors)))
+        if nocase:
+            f.write("nocase: true\n")
+
+    # the .tagdir's mtime may not have moved on coarse filesystems, so the
+    # cached config can't be trusted to have the new view in it
+    clear_config_cache()
+
+    return View(name, " ".join(selectors), os.path.join(config["symlink_dir"], name), nocase)
+
+
+# re-evaluates every saved query for just the files that were renamed
+# (views saved with nocase are matched case insensitively, whatever the
+# overrides say)
+def update_views(renames, overrides={}):
+    for src, dst in renames:
+        path = os.path.dirname(os.path.abspath(dst))
+        config = get_config(path, overrides)
+        for view in get_views(config):
+            if view.nocase and config["case_sensitive"]:
+                view.update(src, dst, get_config(path, dict(overrides, case_sensitive=False)))
+            else:
+                view.update(src, dst, config)
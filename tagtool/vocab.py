@@ -0,0 +1,134 @@
+
+import os
+import heapq
+from bisect import bisect_left
+
+from .config import get_config, state_path
+from .filename import Filename
+from .analytics import scan_tags
+from .utils import file_lock
+
+
+# the name of the vocabulary file, stored in the root's .tagtool directory
+TAGVOCAB_FILENAME = ".tagvocab"
+
+# the number of completions returned by default
+COMPLETIONS = 10
+
+
+class TagVocabulary:
+    """
+    Every tag in a tree, with the number of files bearing it. The tags are
+    kept in one sorted list, so the tags starting with a prefix are a single
+    contiguous slice, found by binary search. Stored in the root's .tagtool
+    directory as one "COUNT TAG" line per tag.
+    """
+
+    def __init__(self, counts={}):
+        self.counts = dict(counts)
+        self.tags   = sorted(self.counts)
+
+
+    def __len__(self):
+        return len(self.tags)
+
+
+    def complete(self, prefix, limit=COMPLETIONS):
+        """ returns up to limit tags starting with prefix, most used first """
+        start = bisect_left(self.tags, prefix)
+        end   = bisect_left(self.tags, prefix + "\U0010ffff", start)
+        candidates = self.tags[start:end]
+
+        if len(candidates) > limit:
+            candidates = heapq.nlargest(limit, candidates, key=lambda t: (self.counts[t], t))
+
+        return sorted(candidates, key=lambda t: (-self.counts[t], t))
+
+
+    def add(self, tags, n=1):
+        """ counts n more files bearing each of the tags (n may be negative) """
+        for tag in tags:
+            count = self.counts.get(tag, 0) + n
+            if count > 0:
+                if tag not in self.counts:
+                    self.tags.insert(bisect_left(self.tags, tag), tag)
+                self.counts[tag] = count
+            elif tag in self.counts:
+                del self.counts[tag]
+                del self.tags[bisect_left(self.tags, tag)]
+
+
+    def save(self, path):
+        # written to a temporary file first, so readers never see half of it
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            for tag in self.tags:
+                f.write("%d %s\n" % (self.counts[tag], tag))
+        os.replace(tmp, path)
+
+
+    @classmethod
+    def load(cls, path):
+        # save() writes the tags in sorted order, so they're kept as read
+        vocab = cls()
+        with open(path) as f:
+            for line in f:
+                count, tag = line.rstrip("\n").split(" ", 1)
+                vocab.counts[tag] = int(count)
+                vocab.tags.append(tag)
+        return vocab
+
+
+    @classmethod
+    def scan(cls, path, overrides={}, jobs=1):
+        """ counts the tags of every file under path """
+        vocab = cls()
+        for f, tags in scan_tags(path, overrides, jobs):
+            for tag in tags:
+                vocab.counts[tag] = vocab.counts.get(tag, 0) + 1
+        vocab.tags = sorted(vocab.counts)
+        return vocab
+
+
+
+def vocab_path(config):
+    return state_path(config["root_dir"], TAGVOCAB_FILENAME)
+
+
+# returns the vocabulary for the given config, building it on first use
+def get_vocabulary(config):
+    path = vocab_path(config)
+
+    if os.path.isfile(path):
+        return TagVocabulary.load(path)
+
+    # shared by every caller, so built from the .tagdir settings alone (as
+    # update_vocabularies() keeps it), rather than from config's overrides
+    vocab = TagVocabulary.scan(config["root_dir"])
+    vocab.save(path)
+    return vocab
+
+
+# adjusts the counts of any existing vocabularies for files that were renamed
+def update_vocabularies(renames):
+    by_path = {}
+
+    for src, dst in renames:
+        config = get_config(os.path.dirname(os.path.abspath(dst)))
+        by_path.setdefault(vocab_path(config), []).append((src, dst))
+
+    for path, renames in by_path.items():
+        if not os.path.isfile(path):
+            continue # never built, so there is nothing to keep up to date
+
+        # locked, so concurrent taggers don't overwrite each other's counts
+        with file_lock(path):
+            vocab = TagVocabulary.load(path)
+
+            for src, dst in renames:
+                old = Filename(src).get_tags()
+                new = Filename(dst).get_tags()
+                vocab.add(old - new, -1)
+                vocab.add(new - old, 1)
+
+            vocab.save(path)
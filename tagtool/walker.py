@@ -0,0 +1,111 @@
+
+import os
+import time
+import asyncio
+
+
+# the most directory reads kept in flight at once, when none is given
+WALK_CONCURRENCY = 16
+
+
+
+class LocalFS:
+    """
+    The filesystem as the walker sees it: one call per directory listing,
+    which is one round trip on a network mount.
+    """
+
+    def listdir(self, path):
+        """
+        returns (subdirectory names, file names, symlinked subdirectory
+        names) of a directory, in listing order. Symlinked directories are
+        also among the subdirectories, but aren't walked into, as in os.walk()
+        """
+
+        dirs, files, links = [], [], []
+
+        with os.scandir(path) as entries:
+            for e in entries:
+                if e.is_dir():
+                    dirs.append(e.name)
+                    if e.is_symlink():
+                        links.append(e.name)
+                else:
+                    files.append(e.name)
+
+        return dirs, files, links
+
+
+
+class LatencyFS:
+    """
+    Stand-in for a network mount, for testing and benchmarking: every
+    directory listing of the wrapped filesystem is delayed by a fixed
+    number of seconds, as if it were a round trip to a server.
+    """
+
+    def __init__(self, latency, fs=None):
+        self.latency = latency
+        self.fs      = fs or LocalFS()
+
+
+    def listdir(self, path):
+        time.sleep(self.latency)
+        return self.fs.listdir(path)
+
+
+
+# lists the given directories (and with recursive, every directory below
+# them) keeping up to `concurrency` listings in flight. The listings are
+# run by a bounded pool of threads, and each directory is submitted as soon
+# as its parent's listing arrives, rather than level by level.
+# returns { path: (dirs, files, links) }, leaving out unreadable directories
+async def read_dirs_async(paths, fs=None, concurrency=WALK_CONCURRENCY, recursive=True):
+    from concurrent.futures import ThreadPoolExecutor
+
+    fs = fs or LocalFS()
+    loop = asyncio.get_running_loop()
+    listings = {}
+
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+
+        async def read(path):
+            try:
+                return path, await loop.run_in_executor(executor, fs.listdir, path)
+            except OSError:
+                return path, None
+
+        pending = set(asyncio.ensure_future(read(path)) for path in set(paths))
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                path, listing = task.result()
+                if listing is None:
+                    continue
+
+                listings[path] = listing
+
+                if recursive:
+                    dirs, files, links = listing
+                    for d in dirs:
+                        if d not in links:
+                            pending.add(asyncio.ensure_future(read(os.path.join(path, d))))
+
+    return listings
+
+
+# blocking version of read_dirs_async()
+def read_dirs(paths, fs=None, concurrency=WALK_CONCURRENCY, recursive=True):
+    return asyncio.run(read_dirs_async(paths, fs, concurrency, recursive))
+
+
+# the same (dirpath, dirnames, filenames) as os.walk(top), with many
+# directories read at once. Unreadable directories are skipped, and the
+# results come in sorted order once the whole tree has been read.
+def walk(top, fs=None, concurrency=WALK_CONCURRENCY):
+    listings = read_dirs([top], fs, concurrency)
+    for path in sorted(listings):
+        dirs, files, links = listings[path]
+        yield path, dirs, files
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import tagtool.analytics
+from tagtool import TagMatrix, hierarchy_dirs, scan_tags, Filename
+
+
+def make_matrix():
+    m = TagMatrix()
+    m.add("1", {"a", "b"})
+    m.add("2", {"a", "c"})
+    m.add("3", {"a", "b", "c"})
+    m.add("4", {"d"})
+    return m
+
+
+def test_counts():
+    m = make_matrix()
+    counts = m.counts()
+
+    assert( len(m) == 4 )
+    assert( { m.tags[t]: c for t, c in enumerate(counts) } == {"a": 3, "b": 2, "c": 2, "d": 1} )
+    assert( sorted(m.tags[t] for t in m.row(2)) == ["a", "b", "c"] )
+
+
+def test_postings(monkeypatch):
+    m = make_matrix()
+    by_tag = lambda postings: { m.tags[t]: list(p) for t, p in enumerate(postings) if p is not None }
+
+    assert( by_tag(m.postings()) == {"a": [0, 1, 2], "b": [0, 2], "c": [1, 2], "d": [3]} )
+    assert( by_tag(m.postings([m.tag_ids["c"]])) == {"c": [1, 2]} )
+
+    # the same, however many rows are sorted at a time
+    monkeypatch.setattr(tagtool.analytics, "POSTINGS_CHUNK", 1)
+    assert( by_tag(m.postings()) == {"a": [0, 1, 2], "b": [0, 2], "c": [1, 2], "d": [3]} )
+
+    counts = m.counts([1, 3])
+    assert( { m.tags[t]: c for t, c in enumerate(counts) if c } == {"a": 1, "c": 1, "d": 1} )
+
+
+def test_cooccurrence():
+    m = make_matrix()
+    ids = [ m.tag_ids[t] for t in "abc" ]
+    pairs = m.cooccurrence(ids)
+
+    # pairs are keyed (lower ID, higher ID)
+    pair = lambda x, y: pairs[tuple(sorted((m.tag_ids[x], m.tag_ids[y])))]
+
+    assert( pair("a", "b") == 2 )
+    assert( pair("a", "c") == 2 )
+    assert( pair("b", "c") == 1 )
+
+
+def test_propose_hierarchy():
+    m = make_matrix()
+    plan = m.propose_hierarchy(lambda tag, count: count >= 2)
+
+    assert( plan == [("a", 3, [("b", 2, [])])] )
+    assert( list(hierarchy_dirs(plan)) == ["a", "a/b"] )
+
+    # no room for a second level
+    assert( m.propose_hierarchy(lambda tag, count: count >= 2, memory=0) == [("a", 3, [])] )
+
+
+def test_scan_tags(tmp_path):
+    root = str(tmp_path)
+    open(os.path.join(root, ".tagdir"), "w").write("[tagdir]\nuse_dirs: True\n")
+    for f in ["a/b_c", "a/d/e", "f_g", "h/.hidden", "h/i/j_k"]:
+        path = os.path.join(root, f)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "w").close()
+
+    rows = scan_tags(root)
+    assert( [ os.path.relpath(f, root) for f, tags in rows ] == ["a/b_c", "a/d/e", "f_g", "h/i/j_k"] )
+    assert( all(set(tags) == Filename(f).get_tags() for f, tags in rows) )
+
+    # the same result, however the tree is split up
+    assert( scan_tags(root, jobs=3) == rows )
+    assert( scan_tags(root, jobs=3, threads=True) == rows )
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import io
+import json
+import shutil
+from tagtool import batch_retag, plan_retag, DirSnapshot, BatchSession
+
+
+def copy_tree(tmp_path):
+    root = str(tmp_path / "tree")
+    shutil.copytree("tree/", root)
+    return root
+
+
+def test_plan_retag(tmp_path):
+    root = copy_tree(tmp_path)
+    files = [ os.path.join(root, "a/a_b_c"), os.path.join(root, "f_g/a_b") ]
+
+    snapshot = DirSnapshot()
+    plan = plan_retag(files, [], ["c", "f"], snapshot=snapshot)
+    plan = [ (os.path.relpath(s, root), os.path.relpath(d, root)) for s, d in plan ]
+
+    assert( plan == [("a/a_b_c", "a/b/unknown"), ("f_g/a_b", "a/b/g")] )
+
+    # nothing was moved yet
+    assert( os.path.isfile(files[0]) )
+
+    # directories were only listed once
+    assert( os.path.normpath(root) in snapshot.dirs )
+
+
+def test_batch_retag(tmp_path):
+    root = copy_tree(tmp_path)
+    files = [ os.path.join(root, "a/a_b_c") ]
+
+    batch_retag(files, ["z"], ["a"])
+
+    assert( os.path.isfile(os.path.join(root, "z_b_c")) )
+    assert( not os.path.exists(files[0]) )
+
+
+def test_batch_session(tmp_path):
+    root = copy_tree(tmp_path)
+    src = os.path.join(root, "f_g/a_b")
+
+    requests = [
+        { "files": [src], "remove": ["f"] },
+        { "files": [src], "add": ["x"] },
+        "not json",
+    ]
+    infile = io.StringIO("".join((r if isinstance(r, str) else json.dumps(r)) + "\n" for r in requests))
+    outfile = io.StringIO()
+
+    session = BatchSession()
+    session.serve(infile, outfile)
+    responses = [ json.loads(line) for line in outfile.getvalue().splitlines() ]
+
+    assert( responses[0] == { "ok": True, "renames": [[src, os.path.join(root, "a/b/g")]] } )
+    assert( responses[1]["ok"] == False ) # the file was already moved
+    assert( responses[2]["ok"] == False )
+    assert( os.path.isfile(os.path.join(root, "a/b/g")) )
+
+
+def test_batch_session_errors(tmp_path, monkeypatch):
+    root = copy_tree(tmp_path)
+    a = os.path.join(root, "a/a_b_c")
+    b = os.path.join(root, "f_g/a_b")
+
+    session = BatchSession()
+
+    # malformed requests are refused, rather than being half carried out
+    assert( session.handle(["files"])["ok"] == False )
+    assert( session.handle({ "files": a })["ok"] == False )
+    assert( session.handle({ "files": [a], "add": [1] })["ok"] == False )
+    assert( os.path.isfile(a) )
+
+    # a failed rename is rolled back, and doesn't block later requests
+    rename = os.rename
+    def failing_rename(src, dst):
+        if src == b:
+            raise OSError("disk on fire")
+        rename(src, dst)
+
+    monkeypatch.setattr(os, "rename", failing_rename)
+    response = session.handle({ "files": [a, b], "add": ["z"] })
+    assert( response["ok"] == False )
+    assert( os.path.isfile(a) and os.path.isfile(b) )
+
+    monkeypatch.setattr(os, "rename", rename)
+    response = session.handle({ "files": [a, b], "add": ["z"] })
+    assert( response["ok"] == True )
+    assert( not os.path.exists(a) and not os.path.exists(b) )
@@ -1,4 +1,5 @@
 
+import os
 from tagtool import get_config
 
 
@@ -25,3 +26,25 @@ def test_tagdir_lookup():
     assert( c["default_delim"] == "_" )
     assert( c["no_tags_filename"] == "unknown" )
     assert( c["case_sensitive"] == True )
+
+
+def test_config_cache(tmp_path):
+    tagdir = tmp_path / ".tagdir"
+    tagdir.write_text("[tagdir]\ndefault_delim: _\n")
+    os.makedirs(str(tmp_path / "a" / "b"))
+
+    # configs for files under the same root are shared
+    c1 = get_config(str(tmp_path / "a"))
+    c2 = get_config(str(tmp_path / "a" / "b"))
+    assert( c1 is c2 )
+    assert( c1["root_dir"] == str(tmp_path) )
+
+    # overrides get their own config
+    c3 = get_config(str(tmp_path / "a"), { "case_sensitive": False })
+    assert( c3 is not c1 )
+    assert( c3["case_sensitive"] == False )
+
+    # changes to the .tagdir are picked up
+    tagdir.write_text("[tagdir]\ndefault_delim: -\n")
+    os.utime(str(tagdir), ns=(0, 0))
+    assert( get_config(str(tmp_path / "a"))["default_delim"] == "-" )
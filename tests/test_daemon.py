@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import threading
+import pytest
+from tagtool import get_config, TagState, TagDaemon, daemon_select, daemon_ping, Operation, \
+                    INTERSECTION, EXCLUSION
+
+
+def make_tree(root, files):
+    open(os.path.join(root, ".tagdir"), "w").write("[tagdir]\nuse_dirs: True\n")
+    for f in files:
+        path = os.path.join(root, f)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "w").close()
+
+
+def test_tag_state(tmp_path):
+    root = str(tmp_path)
+    make_tree(root, ["a/b_c", "a/d", "e/f_a", "g"])
+    config = get_config(root)
+
+    state = TagState(root, config["tag_delims"])
+    state.add_dir("")
+
+    a = [Operation("a", INTERSECTION)]
+    assert( sorted(state.select(a)) == ["a/b_c", "a/d", "e/f_a"] )
+    assert( sorted(state.select(a + [Operation("d", EXCLUSION)])) == ["a/b_c", "e/f_a"] )
+
+    # tags spanning delimiters are found in whole names and paths
+    assert( sorted(state.select([Operation("b_c", INTERSECTION)])) == ["a/b_c"] )
+    assert( sorted(state.select([Operation("B_C", INTERSECTION)], case_sensitive=False)) == ["a/b_c"] )
+    assert( sorted(state.select([Operation("A", INTERSECTION)], case_sensitive=False)) == \
+            ["a/b_c", "a/d", "e/f_a"] )
+
+    state.remove_file("a", "d")
+    state.add_file("a", "x")
+    state.remove_dir("e")
+    assert( sorted(state.select(a)) == ["a/b_c", "a/x"] )
+    assert( sorted(state.universe()) == ["a/b_c", "a/x", "g"] )
+    assert( sorted(state.universe("a")) == ["a/b_c", "a/x"] )
+    assert( sorted(state.universe(".")) == ["a/b_c", "a/x", "g"] )
+
+
+def wait_for(fn, expected, timeout=5):
+    end = time.time() + timeout
+    while time.time() < end:
+        if fn() == expected:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_daemon(tmp_path):
+    root = str(tmp_path)
+    make_tree(root, ["a/b", "c"])
+    config = get_config(root)
+
+    daemon = TagDaemon(config)
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        ops = [Operation("b", INTERSECTION)]
+        query = lambda: daemon_select(ops, config)
+
+        assert( wait_for(query, [os.path.join(root, "a/b")]) )
+        assert( daemon_ping(config) )
+
+        # a second daemon leaves the live one's socket alone
+        with pytest.raises(OSError):
+            TagDaemon(config).serve_forever()
+        assert( daemon_ping(config) )
+
+        if daemon.inotify is not None:
+            # pick up renames made by other processes
+            os.rename(os.path.join(root, "c"), os.path.join(root, "a", "c_b"))
+            os.makedirs(os.path.join(root, "b"))
+            open(os.path.join(root, "b", "x"), "w").close()
+
+            assert( wait_for(query, [ os.path.join(root, f) for f in ["a/b", "a/c_b", "b/x"] ]) )
+
+            # a .tagdir created below the root makes a new root of its own
+            nested = os.path.join(root, "b")
+            assert( get_config(nested)["root_dir"] == root )
+            open(os.path.join(nested, ".tagdir"), "w").close()
+            assert( wait_for(lambda: get_config(nested)["root_dir"], nested) )
+    finally:
+        daemon.shutdown()
+        thread.join()
+
+    # no daemon, no answer
+    assert( daemon_select(ops, config) is None )
+    assert( not daemon_ping(config) )
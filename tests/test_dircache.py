@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import time
+from tagtool import DirCache, DirSnapshot, get_config, plan_retag, batch_retag, \
+                    get_vocabulary, update_vocabularies
+
+
+DIRS = ["a/b", "a/c_d", "e", "f_g/h"]
+
+
+def make_tree(root, dirs):
+    open(os.path.join(root, ".tagdir"), "w").write("[tagdir]\nuse_dirs: True\nuse_dir_cache: True\n")
+    for d in dirs:
+        os.makedirs(os.path.join(root, d), exist_ok=True)
+    age_dirs(root)
+
+
+# backdates every directory, so that their mtimes are trusted
+def age_dirs(root, age=100):
+    then = time.time() - age
+    for path, dirs, files in os.walk(root):
+        os.utime(path, (then, then))
+
+
+def test_dir_cache(tmp_path):
+    root = str(tmp_path)
+    make_tree(root, DIRS)
+    config = get_config(root)
+
+    cache = DirCache(config)
+    assert( sorted(cache.dirs_at(os.path.join(root, "a"))) == ["b", "c_d"] )
+    assert( cache.listed == 1 )
+    cache.save()
+
+    # a new process finds the listing, and its tags, without listing again
+    cache = DirCache(config)
+    names = cache.dirs_at(os.path.join(root, "a"))
+    assert( sorted(names) == ["b", "c_d"] )
+    assert( cache.tags(os.path.join(root, "a"), names) == [ config["matcher"].tokenize(d) for d in names ] )
+    assert( cache.listed == 0 )
+
+    # only the directory that changed is listed again
+    os.rmdir(os.path.join(root, "a", "b"))
+    os.makedirs(os.path.join(root, "a", "x"))
+    age_dirs(root, 50)
+
+    assert( sorted(cache.dirs_at(os.path.join(root, "a"))) == ["c_d", "x"] )
+    assert( cache.dirs_at(root) and cache.listed == 2 )
+    assert( cache.dirs_at(os.path.join(root, "a")) and cache.listed == 2 )
+
+    # recently modified directories are listed every time
+    os.makedirs(os.path.join(root, "e", "y"))
+    cache.dirs_at(os.path.join(root, "e"))
+    cache.dirs_at(os.path.join(root, "e"))
+    assert( cache.listed == 4 )
+
+    # a different tokenization throws the cache away
+    cache.save()
+    assert( DirCache(get_config(root, { "case_sensitive": False })).entries == {} )
+
+
+def test_repeated_retag(tmp_path):
+    root = str(tmp_path)
+    make_tree(root, DIRS)
+    open(os.path.join(root, "a_c_d_z"), "w").close()
+    age_dirs(root)
+
+    listed = []
+
+    def list_dirs(path):
+        listed.append(os.path.relpath(path, root))
+        return DirSnapshot().dirs_at(path)
+
+    files = [os.path.join(root, "a_c_d_z")]
+
+    # plans with a fresh snapshot, and saves it (as apply_plan() would)
+    def plan_and_save():
+        snapshot = DirSnapshot(list_dirs)
+        plan = plan_retag(files, ["w"], [], snapshot=snapshot)
+        snapshot.save()
+        return plan
+
+    plan = plan_and_save()
+    assert( plan == [(files[0], os.path.join(root, "a", "c_d", "w_z"))] )
+    assert( "a" in listed )
+
+    # creating the .tagdircache file changed the root
+    then = time.time() - 50
+    os.utime(root, (then, then))
+    listed.clear()
+    assert( plan_and_save() == plan )
+    assert( listed == ["."] )
+
+    # the tree hasn't changed since, so the next run lists nothing
+    listed.clear()
+    assert( plan_and_save() == plan )
+    assert( listed == [] )
+
+
+def test_tag_run_keeps_root(tmp_path):
+    root = str(tmp_path)
+    make_tree(root, DIRS)
+    f = os.path.join(root, "a", "c_d", "z")
+    open(f, "w").close()
+    get_vocabulary(get_config(root))
+
+    renames = batch_retag([f], ["w"], [])
+    update_vocabularies(renames)
+
+    # the journal, and the tag counts with their lock, live in .tagtool,
+    # so renames within a directory leave the mtime of the root alone
+    age_dirs(root)
+    mtime = os.stat(root).st_mtime_ns
+
+    renames = batch_retag([renames[0][1]], [], ["w"])
+    update_vocabularies(renames)
+
+    assert( renames == [(os.path.join(root, "a", "c_d", "w_z"), f)] )
+    assert( os.stat(root).st_mtime_ns == mtime )
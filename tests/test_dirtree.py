@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+from tagtool import DirTree, DirSnapshot, get_config
+
+
+config = get_config("tree/")
+
+
+def try_find_best_path(tree, tags):
+    r = tree.find_best_path(tags)
+    return (os.path.relpath(r[0], "./"), r[1])
+
+
+def test_find_best_path():
+    tree = DirTree(config["root_dir"], config["matcher"])
+
+    assert( try_find_best_path(tree, ["a", "b"]) == ("tree/a/b", set()) )
+    assert( try_find_best_path(tree, ["b", "d"]) == ("tree/d",   {"b"}) )
+    assert( try_find_best_path(tree, ["f", "g"]) == ("tree/f_g", set()) )
+    assert( try_find_best_path(tree, ["f"])      == ("tree",     {"f"}) )
+
+
+def test_listings_shared():
+    listed = []
+
+    def list_dirs(path):
+        listed.append(path)
+        return DirSnapshot().dirs_at(path)
+
+    snapshot = DirSnapshot(list_dirs)
+    tree = snapshot.tree(config)
+
+    tree.find_best_path(["a", "b"])
+    n = len(listed)
+    tree.find_best_path(["a", "c"])
+    tree.find_best_path(["a", "b"])
+
+    # "tree" and "tree/a" were already listed
+    assert( len(listed) == n )
+    assert( snapshot.tree(config) is tree )
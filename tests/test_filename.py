@@ -60,6 +60,20 @@ def test_config_loading():
     assert(f.config["case_sensitive"]   == True)
 
 
+def test_given_config():
+    # a loaded config is used as-is, rather than applied again as overrides
+    g = Filename("tree/a/a_b_c", config=f.config)
+    assert( g.config is f.config )
+    assert( g.get_tags() == f.get_tags() )
+
+
+def test_normalized_path():
+    # absolute paths are normalized too
+    g = Filename(os.path.abspath("tree/a") + "//../a/a_b_c")
+    assert( g.filestr == os.path.abspath("tree/a/a_b_c") )
+    assert( g.dirs == "a" )
+
+
 def test_find_best_path():
 
     # simple finding of directories
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+from tagtool import TrigramIndex, TagVocabulary, edit_distance, merge_candidates, \
+                    fuzzy_aliases, get_config, get_trigram_index, walk_select, \
+                    Operation, INTERSECTION, EXCLUSION
+
+
+def levenshtein(a, b):
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        row = [i]
+        for j in range(1, len(b) + 1):
+            row.append(min(prev[j - 1] + (a[i - 1] != b[j - 1]), prev[j] + 1, row[j - 1] + 1))
+        prev = row
+    return prev[-1]
+
+
+WORDS = ["vacation", "vacaton", "Vacation", "vacations", "vocation", "beach", "beaches",
+         "bench", "2019", "2018", "cat", "car", "abcdefgh", "abcdfegh", "x"]
+
+
+def test_edit_distance():
+    for a in WORDS:
+        for b in WORDS:
+            for k in range(3):
+                assert( edit_distance(a, b, k) == min(levenshtein(a, b), k + 1) )
+
+
+def test_search():
+    index = TrigramIndex(WORDS)
+
+    assert( index.search("vacation") == [("Vacation", 0), ("vacation", 0),
+                                         ("vacations", 1), ("vacaton", 1), ("vocation", 1)] )
+    assert( index.search("beach") == [("beach", 0), ("bench", 1)] )
+    assert( index.search("beaches", 2) == [("beaches", 0), ("beach", 2)] )
+
+    # numbers and short tags only match themselves
+    assert( index.search("2019") == [("2019", 0)] )
+    assert( index.search("cat") == [("cat", 0)] )
+
+    # every match is found, for longer tags
+    for word in WORDS:
+        for k in [1, 2]:
+            if len(word) > 3 * k and not word.isdigit():
+                expected = [ w for w in WORDS if levenshtein(word.lower(), w.lower()) <= k ]
+                assert( sorted(t for t, d in index.search(word, k)) == sorted(expected) )
+
+
+def test_save_load(tmp_path):
+    path = str(tmp_path / "trigrams")
+    index = TrigramIndex(WORDS)
+    index.save(path)
+
+    loaded = TrigramIndex.load(path)
+    for word in WORDS:
+        assert( loaded.search(word, 2) == index.search(word, 2) )
+
+
+def test_merge_candidates():
+    vocab = TagVocabulary({ "vacation": 120, "vacaton": 3, "Vacation": 2, "beach": 40, "bech": 1 })
+    assert( merge_candidates(vocab) == [
+        ("Vacation", 2, [("vacation", 120, 0), ("vacaton", 3, 1)]),
+        ("vacaton",  3, [("vacation", 120, 1)]),
+        ("bech",     1, [("beach", 40, 1)]),
+    ] )
+
+
+def test_fuzzy_select(tmp_path):
+    root = str(tmp_path)
+    open(os.path.join(root, ".tagdir"), "w").close()
+    for name in ["vacation_1", "vacaton_2", "beach_vacation", "work"]:
+        open(os.path.join(root, name), "w").close()
+
+    config = get_config(root)
+    vocab, index = get_trigram_index(config)
+    ops = [Operation("vacation", INTERSECTION), Operation("beach", EXCLUSION)]
+    aliases = fuzzy_aliases(ops, index)
+
+    assert( aliases["vacation"] == ["vacation", "vacaton"] )
+    assert( sorted(os.path.basename(f) for f in walk_select(ops, config, aliases)) == \
+            ["vacation_1", "vacaton_2"] )
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+from collections import Counter
+from benchmarks.generate import generate_paths, generate_tree
+
+
+def test_generate_paths():
+    a = generate_paths(files=2000, seed=1)
+    b = generate_paths(files=2000, seed=1)
+
+    # deterministic
+    assert( a == b )
+    assert( a != generate_paths(files=2000, seed=2) )
+    assert( len(set(a)) == 2000 )
+
+    # Zipf distributed, t0 is the most common tag
+    counts = Counter(t for p in a for t in os.path.basename(p)[:-4].split("_")[:-1])
+    assert( counts.most_common(1)[0][0] == "t0" )
+    assert( counts["t0"] > counts["t9"] > counts["t99"] )
+
+
+def test_generate_tree(tmp_path):
+    paths = generate_tree(str(tmp_path), files=50, depth=2, fanout=2)
+    assert( len(paths) == 50 )
+    assert( all(os.path.isfile(p) for p in paths) )
+    assert( os.path.isfile(str(tmp_path / ".tagdir")) )
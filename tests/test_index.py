@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+from tagtool import get_config, select, Index, Operation, \
+                    INTERSECTION, INCLUSION, EXCLUSION
+
+
+"""
+Utils
+"""
+
+def make_tree(root, files):
+    open(os.path.join(root, ".tagdir"), "w").write("[tagdir]\nuse_dirs: True\n")
+    for f in files:
+        path = os.path.join(root, f)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "w").close()
+
+
+def try_select(root, *selectors, **overrides):
+    config = get_config(str(root), overrides)
+    ops = []
+    for s in selectors:
+        if s[0] == "+":
+            ops.append(Operation(s[1:], INCLUSION))
+        elif s[0] == "-":
+            ops.append(Operation(s[1:], EXCLUSION))
+        else:
+            ops.append(Operation(s, INTERSECTION))
+
+    with Index(config) as index:
+        index.update()
+        return [ os.path.relpath(f, str(root)) for f in index.select(ops) ]
+
+
+
+"""
+Index
+"""
+
+def test_index_select(tmp_path):
+    make_tree(str(tmp_path), ["a/b_c.txt", "a/c", "d/a_b", "cat"])
+
+    assert( try_select(tmp_path, "a")             == ["a/b_c.txt", "a/c", "d/a_b"] )
+    assert( try_select(tmp_path, "a", "b")        == ["a/b_c.txt", "d/a_b"] )
+    assert( try_select(tmp_path, "a", "-b")       == ["a/c"] )
+    assert( try_select(tmp_path, "b", "+cat")     == ["a/b_c.txt", "cat", "d/a_b"] )
+    assert( try_select(tmp_path, "-a")            == ["cat"] )
+    assert( try_select(tmp_path, "+d")            == ["d/a_b"] )
+    assert( try_select(tmp_path, "A", case_sensitive=False) == ["a/b_c.txt", "a/c", "d/a_b"] )
+    assert( try_select(tmp_path, "a", use_dirs=False) == ["d/a_b"] )
+
+
+def test_index_update(tmp_path):
+    make_tree(str(tmp_path), ["a/b", "a/c"])
+    assert( try_select(tmp_path, "b") == ["a/b"] )
+
+    os.rename(str(tmp_path / "a" / "b"), str(tmp_path / "a" / "x_b"))
+    os.makedirs(str(tmp_path / "e" / "b"))
+    open(str(tmp_path / "e" / "b" / "f"), "w").close()
+
+    assert( try_select(tmp_path, "b") == ["a/x_b", "e/b/f"] )
+    assert( try_select(tmp_path, "x") == ["a/x_b"] )
+
+
+def test_select_with_index(tmp_path):
+    make_tree(str(tmp_path), ["a/b", "a/c"])
+    config = get_config(str(tmp_path), { "use_index": True })
+    files = select([Operation("b", INTERSECTION)], config)
+    assert( [ str(f) for f in files ] == [ str(tmp_path / "a" / "b") ] )
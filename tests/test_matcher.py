@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from tagtool import TagMatcher, get_config
+
+
+m = TagMatcher(get_config("tree/")["tag_delims"])
+nocase = TagMatcher(get_config("tree/")["tag_delims"], case_sensitive=False)
+
+
+
+def test_tokenize():
+    assert( m.tokenize("a_b_c") == {"a", "b", "c"} )
+    assert( m.tokenize("_a__a_") == {"a"} )
+    assert( m.tokenize("A_b") == {"A", "b"} )
+    assert( nocase.tokenize("A_b") == {"a", "b"} )
+
+    # tokenized sets are cached
+    assert( m.tokenize("a_b_c") is m.tokenize("a_b_c") )
+
+
+def test_has_tag():
+    assert(     m.has_tag("a_b", "a") )
+    assert( not m.has_tag("a_b", "A") )
+    assert(     nocase.has_tag("a_b", "A") )
+    assert( not m.has_tag("ab", "a") )
+
+    # tags spanning delimiters
+    assert(     m.has_tag("x_a_b_y", "a_b") )
+
+    # regex metacharacters aren't interpreted
+    assert( not m.has_tag("ab", "a*") )
+    assert(     m.has_tag("a*_b", "a*") )
+
+
+def test_remove():
+    assert( m.remove("a_b_c", "a") == "b_c" )
+    assert( m.remove("a_b_c", "b") == "a_c" )
+    assert( m.remove("a_b_c", "c") == "a_b" )
+    assert( m.remove("a_a_b", "a") == "b" )
+    assert( m.remove("a_b_c", "A") == "a_b_c" )
+    assert( nocase.remove("A_b_c", "a") == "b_c" )
+    assert( m.remove("ab_a*", "a*") == "ab" )
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import pytest
+from tagtool import RenameExecutor, RenameError, find_collisions
+
+
+def make_files(root, names):
+    for n in names:
+        open(os.path.join(root, n), "w").close()
+    return [ os.path.join(root, n) for n in names ]
+
+
+def test_execute(tmp_path):
+    root = str(tmp_path)
+    a, b = make_files(root, ["a", "b"])
+    journal = os.path.join(root, ".tagjournal")
+
+    RenameExecutor(journal).execute([(a, a + "_x"), (b, b + "_x")])
+
+    assert( sorted(os.listdir(root)) == ["a_x", "b_x"] )
+
+
+def test_collisions(tmp_path):
+    root = str(tmp_path)
+    a, b, c = make_files(root, ["a", "b", "c"])
+    journal = os.path.join(root, ".tagjournal")
+
+    # existing destinations, and two files to the same destination
+    assert( find_collisions([(a, b)]) == [(a, b)] )
+    assert( find_collisions([(a, a + "_x"), (c, a + "_x")]) == [(c, a + "_x")] )
+
+    with pytest.raises(RenameError):
+        RenameExecutor(journal).execute([(a, a + "_x"), (b, c)])
+
+    # nothing was touched
+    assert( sorted(os.listdir(root)) == ["a", "b", "c"] )
+
+
+def write_journal(journal, plan, done):
+    with open(journal, "w") as f:
+        for src, dst in plan:
+            f.write(json.dumps({ "src": src, "dst": dst }) + "\n")
+        for i in done:
+            f.write(json.dumps({ "done": i }) + "\n")
+        f.write('{"do') # torn write
+
+
+def test_resume(tmp_path):
+    root = str(tmp_path)
+    a, b = make_files(root, ["a_x", "b"])
+    journal = os.path.join(root, ".tagjournal")
+
+    # "a" was renamed to "a_x" before the crash
+    write_journal(journal, [(root + "/a", a), (b, b + "_x")], [0])
+    RenameExecutor(journal).resume()
+
+    assert( sorted(os.listdir(root)) == ["a_x", "b_x"] )
+
+
+def test_resume_deleted(tmp_path):
+    root = str(tmp_path)
+    (b,) = make_files(root, ["b"])
+    journal = os.path.join(root, ".tagjournal")
+
+    # "a" was deleted after being journaled, and is skipped
+    a = root + "/a"
+    write_journal(journal, [(a, a + "_x"), (b, b + "_x")], [])
+    assert( RenameExecutor(journal).resume() == [(a, a + "_x")] )
+
+    assert( sorted(os.listdir(root)) == ["b_x"] )
+
+
+def test_rollback(tmp_path):
+    root = str(tmp_path)
+    a, b = make_files(root, ["a_x", "b"])
+    journal = os.path.join(root, ".tagjournal")
+
+    write_journal(journal, [(root + "/a", a), (b, b + "_x")], [0])
+    RenameExecutor(journal).rollback()
+
+    assert( sorted(os.listdir(root)) == ["a", "b"] )
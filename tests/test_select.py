@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+from tagtool import get_config, find_roots, walk_select, iter_select, select_roots, match_tags, \
+                    Index, Operation, QueryPlan, INTERSECTION, INCLUSION, EXCLUSION
+
+
+FILES = ["a/b_c.txt", "a/c", "a/b/x", "d/a_b", "cat", "f_g/a_b", ".hidden_a"]
+
+
+def make_tree(root, files):
+    open(os.path.join(root, ".tagdir"), "w").write("[tagdir]\nuse_dirs: True\n")
+    for f in files:
+        path = os.path.join(root, f)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "w").close()
+
+
+def parse(selectors):
+    ops = []
+    for s in selectors.split():
+        if s[0] == "+":
+            ops.append(Operation(s[1:], INCLUSION))
+        elif s[0] == "-":
+            ops.append(Operation(s[1:], EXCLUSION))
+        else:
+            ops.append(Operation(s, INTERSECTION))
+    return ops
+
+
+def try_walk(root, selectors, **overrides):
+    config = get_config(root, overrides)
+    return sorted(os.path.relpath(f, root) for f in walk_select(parse(selectors), config))
+
+
+def test_match_tags():
+    has = lambda tags: (lambda t: t in tags)
+
+    assert( match_tags(has({"a"}), parse("a"))           == True )
+    assert( match_tags(has({"a"}), parse("a -a"))        == False )
+    assert( match_tags(has({"a"}), parse("b +a"))        == True )
+    assert( match_tags(has({"a"}), parse("+b"))          == False )
+    assert( match_tags(has({"a"}), parse("-b"))          == True )
+
+    # partially known tagsets
+    unknown = lambda t: True if t == "a" else None
+    assert( match_tags(unknown, parse("a"))              == True )
+    assert( match_tags(unknown, parse("-a +b"))          == None )
+    assert( match_tags(unknown, parse("-a"))             == False )
+    assert( match_tags(unknown, parse("a -b"))           == None )
+
+
+def test_walk_select(tmp_path):
+    root = str(tmp_path)
+    make_tree(root, FILES)
+
+    assert( try_walk(root, "a")      == ["a/b/x", "a/b_c.txt", "a/c", "d/a_b", "f_g/a_b"] )
+    assert( try_walk(root, "a -b")   == ["a/c"] )
+    assert( try_walk(root, "-a")     == ["cat"] )
+    assert( try_walk(root, "g +cat") == ["cat", "f_g/a_b"] )
+    assert( try_walk(root, "A", case_sensitive=False) == try_walk(root, "a") )
+    assert( try_walk(root, "a", use_dirs=False) == ["d/a_b", "f_g/a_b"] )
+
+    # tags spanning delimiters
+    assert( try_walk(root, "f_g")    == ["f_g/a_b"] )
+
+
+def test_walk_matches_index(tmp_path):
+    root = str(tmp_path)
+    make_tree(root, FILES)
+    config = get_config(root)
+
+    with Index(config) as index:
+        index.update()
+        for selectors in ["a", "a b", "-a", "a -b +cat", "+x -b", "c +g -a", "f_g", "a -f_g", "b_c"]:
+            ops = parse(selectors)
+            assert( sorted(walk_select(ops, config)) == index.select(ops) )
+
+
+def test_iter_select(tmp_path):
+    root = str(tmp_path)
+    make_tree(root, FILES)
+    config = get_config(root)
+
+    files = iter_select(parse("a"), config)
+    first = next(files)
+
+    assert( os.path.relpath(str(first), root) in try_walk(root, "a") )
+    assert( len(list(files)) == 4 )
+
+
+# the plain left to right evaluation, which the QueryPlan must agree with
+def reference(tags, operations):
+    matched = True
+    for i, op in enumerate(operations):
+        h = op.tag in tags
+        if i == 0 and op.type != EXCLUSION:
+            matched = h
+        elif op.type == INTERSECTION:
+            matched = matched and h
+        elif op.type == INCLUSION:
+            matched = matched or h
+        else:
+            matched = matched and not h
+    return matched
+
+
+def test_query_plan():
+    files = { "f%d" % i: set(t for t in "abcd" if (i >> "abcd".index(t)) & 1) for i in range(16) }
+    frequency = lambda t: sum(1 for tags in files.values() if t in tags)
+    postings = lambda t: set(f for f, tags in files.items() if t in tags)
+
+    for selectors in ["a", "-a", "a b", "a +b", "+a b", "a -b +c d", "-a +b -c", "a b c d -a",
+                      "d +c +b -a", "a a", "a +a", "b -b", ""]:
+        ops = parse(selectors)
+        expected = set(f for f, tags in files.items() if reference(tags, ops))
+
+        for plan in [QueryPlan(ops), QueryPlan(ops, frequency, len(files))]:
+            assert( plan.evaluate(postings, lambda: set(files)) == expected )
+            assert( set(f for f, tags in files.items() if plan.matches(lambda t: t in tags)) == expected )
+
+
+def test_query_plan_order():
+    counts = { "rare": 1, "common": 100, "mid": 10 }
+    plan = QueryPlan(parse("common -rare mid"), counts.get, 1000)
+
+    assert( plan.explain() == [
+        "and  (~10 files)",
+        "    tag mid  (~10 files)",
+        "    tag common  (~100 files)",
+        "    not  (~999 files)",
+        "        tag rare  (~1 files)",
+    ] )
+
+    # the AND stops at the first term that rules a file out
+    asked = []
+    has = lambda t: asked.append(t) or False
+    assert( plan.matches(has) == False )
+    assert( asked == ["mid"] )
+
+
+def test_select_roots(tmp_path):
+    for name in ["one", "two", "one/nested"]:
+        os.makedirs(str(tmp_path / name))
+        make_tree(str(tmp_path / name), FILES)
+
+    roots = find_roots([str(tmp_path)])
+    assert( roots == [ str(tmp_path / name) for name in ["one", "one/nested", "two"] ] )
+    assert( find_roots([str(tmp_path / "one" / "a")]) == [str(tmp_path / "one")] )
+
+    for overrides in [{}, {"use_index": True}]:
+        timings = {}
+        found = select_roots(parse("a b"), roots, overrides, timings=timings, jobs=2)
+        found = sorted((os.path.relpath(r, str(tmp_path)), os.path.relpath(str(f), r)) for r, f in found)
+
+        # each nested root answers for its own files, and only once
+        assert( found == sorted((name, f) for name in ["one", "one/nested", "two"]
+                                          for f in ["a/b/x", "a/b_c.txt", "d/a_b", "f_g/a_b"]) )
+        assert( sorted(timings) == roots )
+        assert( all(n == 4 for seconds, n in timings.values()) )
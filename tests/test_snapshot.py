@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+from tagtool import TagSnapshot, diff_snapshots, snapshot_root, \
+                    FILE_ADDED, FILE_REMOVED, FILE_CHANGED, FILE_MOVED
+
+
+FILES = ["a/b_c.txt", "a/c", "d/a_b", "cat", "f_g/a_b", ".hidden_a"]
+
+
+def make_tree(root, files):
+    open(os.path.join(root, ".tagdir"), "w").write("[tagdir]\nuse_dirs: True\n")
+    for f in files:
+        path = os.path.join(root, f)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "w").close()
+
+
+def test_round_trip(tmp_path):
+    root = str(tmp_path)
+    make_tree(root, FILES)
+
+    path = str(tmp_path / "tree.snap")
+    snapshot_root(root).save(path)
+
+    with TagSnapshot.open(path) as snapshot:
+        assert( snapshot.root == root )
+        assert( len(snapshot) == 5 )
+
+        files = { snapshot.path(n): snapshot.tags(n) for n in range(len(snapshot)) }
+        assert( files["a/b_c.txt"] == ["a", "b", "c"] )
+        assert( files["f_g/a_b"]   == ["a", "b", "f", "g"] )
+        assert( files["cat"]       == ["cat"] )
+
+        # the tag IDs of each file are sorted, as the diff relies on
+        for n in range(len(snapshot)):
+            ids = snapshot.file_tags(n).tolist()
+            assert( ids == sorted(ids) )
+
+
+def test_diff(tmp_path):
+    root = str(tmp_path)
+    make_tree(root, FILES)
+    before = snapshot_root(root)
+
+    assert( list(diff_snapshots(before, snapshot_root(root))) == [] )
+
+    os.rename(os.path.join(root, "a/b_c.txt"), os.path.join(root, "a/b_d.txt"))
+    os.remove(os.path.join(root, "cat"))
+    open(os.path.join(root, "a/e"), "w").close()
+    os.utime(os.path.join(root, "a/e"), ns=(0, 0)) # in case it took the inode of cat
+
+    assert( list(diff_snapshots(before, snapshot_root(root))) == [
+        (FILE_MOVED, "a/b_c.txt", "a/b_d.txt", ["d"], ["c"]),
+        (FILE_REMOVED, "cat", None, [], ["cat"]),
+        (FILE_ADDED, None, "a/e", ["a", "e"], []),
+    ] )
+
+    # a different config changes the tags of files that stay put
+    open(os.path.join(root, ".tagdir"), "w").write("[tagdir]\nuse_dirs: False\n")
+    assert( (FILE_CHANGED, "d/a_b", "d/a_b", [], ["d"]) in
+            list(diff_snapshots(before, snapshot_root(root))) )
+
+
+def test_diff_replicas(tmp_path):
+    for name, files in [("one", FILES), ("two", FILES[1:] + ["new"])]:
+        os.makedirs(str(tmp_path / name))
+        make_tree(str(tmp_path / name), files)
+
+    one  = snapshot_root(str(tmp_path / "one"))
+    rows = [ (one.path(n), one.inodes[n], one.mtimes[n], one.tags(n)) for n in range(len(one)) ]
+    old  = TagSnapshot(TagSnapshot.build(rows, "one"))
+    new = snapshot_root(str(tmp_path / "two"))
+
+    # without inodes from the same device, files only match by path
+    assert( list(diff_snapshots(old, new)) == [
+        (FILE_REMOVED, "a/b_c.txt", None, [], ["a", "b", "c"]),
+        (FILE_ADDED, None, "new", ["new"], []),
+    ] )
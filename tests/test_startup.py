@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import subprocess
+
+
+# the most a command module may take to import, in microseconds
+# (measured around 20-40ms; the slack is for slow and busy machines)
+STARTUP_BUDGET = 150000
+
+# modules that only some commands need, and that none should import up front
+HEAVY = ["sqlite3", "ctypes", "subprocess", "socketserver", "concurrent.futures",
+         "multiprocessing", "tempfile", "gi", "configparser", "asyncio"]
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+# returns { module: cumulative import time in us } for a fresh interpreter
+def import_times(module):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module],
+                            cwd=ROOT, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            self_us, cumulative, name = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_package_is_lazy():
+    times = import_times("tagtool")
+    assert( [ m for m in times if m.startswith("tagtool.") ] == [] )
+
+
+def test_startup_budget():
+    for command in ["tag", "find", "list", "organize", "dialog", "daemon", "snapshot", "diff"]:
+        module = "tagtool.commands." + command
+        times = import_times(module)
+
+        assert( times[module] < STARTUP_BUDGET )
+        assert( [ m for m in HEAVY if m in times ] == [] )
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+from tagtool import stats, Filename
+
+
+def test_enable_disable(tmp_path):
+    open(str(tmp_path / ".tagdir"), "w").close()
+    original = os.stat
+
+    stats.enable()
+    try:
+        assert( os.stat is not original )
+        Filename(str(tmp_path / "a_b.txt")).get_tags()
+        assert( stats.counters["config load"][0] == 1 )
+        assert( stats.counters["tokenize"][0] >= 1 )
+    finally:
+        stats.disable()
+
+    assert( os.stat is original )
+    assert( stats.counters == {} )
+
+
+def test_run_strips_options(monkeypatch, capsys):
+    seen = []
+    monkeypatch.setattr(sys, "argv", ["tag-find", "a", "--stats=json", "b"])
+
+    stats.run(lambda: seen.append(list(sys.argv)))
+    stats.disable()
+
+    assert( seen == [["tag-find", "a", "b"]] )
+    assert( '"total"' in capsys.readouterr().err )
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import pytest
+from tagtool import sync_links_dir, find_all_files
+
+
+def links_in(path):
+    return { f: os.readlink(os.path.join(path, f)) for f in os.listdir(path) }
+
+
+def test_sync_links_dir(tmp_path):
+    path = str(tmp_path / "links")
+
+    assert( sync_links_dir(path, [("a", "/x/a"), ("b", "/x/b")]) == 2 )
+    assert( links_in(path) == { "a": "/x/a", "b": "/x/b" } )
+
+    # unchanged links are left in place
+    before = os.lstat(os.path.join(path, "a")).st_ino
+    sync_links_dir(path, [("a", "/x/a"), ("c", "/x/c"), ("b", "/y/b")])
+    assert( links_in(path) == { "a": "/x/a", "b": "/y/b", "c": "/x/c" } )
+    assert( os.lstat(os.path.join(path, "a")).st_ino == before )
+
+    # stale links are removed, other files are kept
+    open(os.path.join(path, "keep"), "w").close()
+    sync_links_dir(path, [("c", "/x/c")])
+    assert( sorted(os.listdir(path)) == ["c", "keep"] )
+
+
+def test_sync_links_dir_atomic(tmp_path):
+    path = str(tmp_path / "links")
+    os.makedirs(path)
+    os.symlink("/x/a", os.path.join(path, "a"))
+
+    sync_links_dir(path, [("b", "/x/b")], atomic=True)
+    assert( os.path.islink(path) )
+    assert( links_in(path) == { "b": "/x/b" } )
+
+    sync_links_dir(path, [("c", "/x/c")], atomic=True)
+    assert( links_in(path) == { "c": "/x/c" } )
+
+    # the old link directories were cleaned up
+    assert( len(os.listdir(str(tmp_path))) == 2 )
+
+    # a plain directory holding other files is left alone
+    other = str(tmp_path / "other")
+    os.makedirs(other)
+    open(os.path.join(other, "keep"), "w").close()
+
+    with pytest.raises(ValueError):
+        sync_links_dir(other, [("c", "/x/c")], atomic=True)
+    assert( os.listdir(other) == ["keep"] )
+
+
+def test_find_all_files_parallel(tmp_path):
+    for f in ["a", "b/c", "b/d/e", "f/g"]:
+        path = tmp_path / f
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+
+    files = find_all_files(str(tmp_path))
+    assert( len(files) == 4 )
+    assert( find_all_files(str(tmp_path), jobs=2) == files )
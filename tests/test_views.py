@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+from tagtool import get_config, clear_config_cache, save_view, get_views, update_views, \
+                    batch_retag, link_name, parse_operations, \
+                    Operation, INTERSECTION, INCLUSION, EXCLUSION
+
+
+def test_parse_operations():
+    assert( parse_operations(["a", "+b", "-c"]) == [ Operation("a", INTERSECTION),
+                                                     Operation("b", INCLUSION),
+                                                     Operation("c", EXCLUSION) ] )
+
+
+def test_views(tmp_path):
+    root = str(tmp_path / "tree")
+    shutil.copytree("tree/", root)
+    links = str(tmp_path / "links")
+
+    config = get_config(root)
+    view = save_view(config, "noc", ["a", "-c"])
+    view.link_dir = links
+
+    assert( view.refresh(config) == 1 )
+    assert( os.listdir(links) == ["f_g_a_b"] )
+
+    # the view is stored in the .tagdir
+    config = get_config(root)
+    assert( [ (v.name, v.selectors) for v in get_views(config) ] == [("noc", "a -c")] )
+
+    # renamed files are moved in and out of the view
+    renames = batch_retag([ os.path.join(root, "a/a_b_c") ], [], ["c"])
+    renames += batch_retag([ os.path.join(root, "f_g/a_b") ], ["c"], [])
+    for src, dst in renames:
+        view.update(src, dst, config)
+
+    assert( os.listdir(links) == ["a_b_unknown"] )
+
+
+def test_views_nocase(tmp_path):
+    root = str(tmp_path / "tree")
+    shutil.copytree("tree/", root)
+    links = str(tmp_path / "links")
+
+    # saved with --nocase, and used at once (without reloading the .tagdir)
+    view = save_view(get_config(root, { "case_sensitive": False }), "upper", ["G"])
+    assert( view.nocase and view.selectors == "G" )
+
+    open(os.path.join(root, ".tagdir"), "a").write("link_dir: %s\n" % links)
+    clear_config_cache()
+    assert( [ (v.name, v.nocase) for v in get_views(get_config(root)) ] == [("upper", True)] )
+
+    # kept case insensitive when refreshed without --nocase
+    renames = batch_retag([ os.path.join(root, "a/a_b_c") ], ["g"], [])
+    update_views(renames)
+    assert( os.listdir(links) == [ link_name(renames[0][1], get_config(root)) ] )
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+from tagtool import TagVocabulary, get_config, get_vocabulary, update_vocabularies, \
+                    batch_retag, TAGVOCAB_FILENAME, TAGSTATE_DIRNAME
+
+
+def test_complete():
+    vocab = TagVocabulary({ "cat": 3, "car": 10, "cart": 1, "dog": 5, "ca": 2 })
+
+    assert( vocab.complete("ca") == ["car", "cat", "ca", "cart"] )
+    assert( vocab.complete("ca", limit=2) == ["car", "cat"] )
+    assert( vocab.complete("d") == ["dog"] )
+    assert( vocab.complete("x") == [] )
+    assert( len(vocab.complete("")) == 5 )
+
+    vocab.add(["cart"], 20)
+    vocab.add(["car", "new"], -10)
+    assert( vocab.complete("ca") == ["cart", "cat", "ca"] )
+    assert( vocab.tags == ["ca", "cart", "cat", "dog"] )
+
+
+def test_vocabulary_file(tmp_path):
+    root = str(tmp_path)
+    open(os.path.join(root, ".tagdir"), "w").write("[tagdir]\nuse_dirs: False\n")
+    for name in ["a_b", "a_c", "b_c d"]:
+        open(os.path.join(root, name), "w").close()
+
+    config = get_config(root)
+    vocab = get_vocabulary(config)
+    assert( vocab.counts == { "a": 2, "b": 2, "c": 2, "d": 1 } )
+    assert( os.path.isfile(os.path.join(root, TAGSTATE_DIRNAME, TAGVOCAB_FILENAME)) )
+
+    # renamed files are counted again
+    renames = batch_retag([os.path.join(root, "a_b")], ["e"], ["a"])
+    update_vocabularies(renames)
+    assert( get_vocabulary(config).counts == { "a": 1, "b": 2, "c": 2, "d": 1, "e": 1 } )
+    assert( get_vocabulary(config).tags == ["a", "b", "c", "d", "e"] )
+
+
+def test_vocabulary_delims(tmp_path):
+    root = str(tmp_path)
+    open(os.path.join(root, ".tagdir"), "w").write("[tagdir]\nuse_dirs: False\ntag_delims: _\n")
+    open(os.path.join(root, "x[y_z"), "w").close()
+
+    # only "_" splits tags, as the .tagdir says
+    assert( get_vocabulary(get_config(root)).counts == { "x[y": 1, "z": 1 } )
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+from tagtool import walk, LatencyFS, DirSnapshot, find_all_files, scan_tags, get_config
+
+
+def make_tree(root, width, depth):
+    open(os.path.join(root, ".tagdir"), "w").write("[tagdir]\nuse_dirs: True\n")
+    for w in range(width):
+        path = root
+        for d in range(depth):
+            path = os.path.join(path, "d%d" % d if d else "w%d" % w)
+            os.makedirs(path, exist_ok=True)
+            open(os.path.join(path, "f%d_%d" % (w, d)), "w").close()
+
+
+def test_walk(tmp_path):
+    root = str(tmp_path)
+    make_tree(root, 3, 3)
+    os.symlink(os.path.join(root, "w0"), os.path.join(root, "link"))
+
+    expected = sorted((r, sorted(d), sorted(f)) for r, d, f in os.walk(root))
+    found    = sorted((r, sorted(d), sorted(f)) for r, d, f in walk(root, concurrency=4))
+
+    # the symlinked directory is listed, but not walked into
+    assert( found == expected )
+    assert( find_all_files(root, concurrency=4) == find_all_files(root) )
+
+
+class CountingFS(LatencyFS):
+    """ counts the most directory listings that were in flight at once """
+
+    def __init__(self, latency):
+        LatencyFS.__init__(self, latency)
+        self.lock      = threading.Lock()
+        self.in_flight = 0
+        self.most      = 0
+
+
+    def listdir(self, path):
+        with self.lock:
+            self.in_flight += 1
+            self.most = max(self.most, self.in_flight)
+        try:
+            return LatencyFS.listdir(self, path)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+def test_walk_latency(tmp_path):
+    root = str(tmp_path)
+    make_tree(root, 12, 2)
+    open(os.path.join(root, ".tagdir"), "a").write("walk_concurrency: 4\n")
+    expected = find_all_files(root, concurrency=1)
+
+    serial     = CountingFS(0.01)
+    concurrent = CountingFS(0.01)
+    configured = CountingFS(0.01)
+
+    assert( find_all_files(root, concurrency=1, fs=serial) == expected )
+    assert( find_all_files(root, concurrency=16, fs=concurrent) == expected )
+
+    # with no concurrency given, the .tagdir decides
+    assert( find_all_files(root, fs=configured) == expected )
+
+    # one listing at a time, or many of the 12 subtrees at once
+    assert( serial.most == 1 )
+    assert( 1 < concurrent.most <= 16 )
+    assert( 1 < configured.most <= 4 )
+
+    assert( scan_tags(root, fs=CountingFS(0.01)) == scan_tags(root) )
+
+
+def test_prefetch(tmp_path):
+    root = str(tmp_path)
+    make_tree(root, 6, 3)
+    open(os.path.join(root, ".tagdir"), "a").write("walk_concurrency: 8\n")
+
+    config = get_config(root)
+    tags = ["w1", "w2", "w3", "d1", "d2", "x"]
+
+    listed = []
+
+    def list_dirs(path):
+        listed.append(path)
+        return DirSnapshot().dirs_at(path)
+
+    lazy = DirSnapshot(list_dirs).tree(get_config(root, { "walk_concurrency": 1 }))
+    expected = lazy.find_best_path(tags)
+    assert( expected == (os.path.join(root, "w1", "d1", "d2"), {"w2", "w3", "x"}) )
+
+    # the three candidates under the root are read at once, ahead of list_dirs()
+    listed.clear()
+    snapshot = DirSnapshot(list_dirs)
+    assert( snapshot.tree(config).find_best_path(tags) == expected )
+    assert( [ os.path.join(root, w) for w in ["w1", "w2", "w3"] if os.path.join(root, w) in listed ] == [] )
+    assert( root in listed )